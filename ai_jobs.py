@@ -0,0 +1,187 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from utils import logger
+
+
+class AIJob:
+    """Handle passed to a job handler: its parameters, progress reporting and DB access."""
+
+    def __init__(self, queue, meta):
+        self._queue = queue
+        self.meta = meta
+
+    @property
+    def job_id(self):
+        return self.meta['job_id']
+
+    @property
+    def provider(self):
+        return self.meta['provider']
+
+    @property
+    def params(self):
+        return self.meta['params']
+
+    def progress(self, percent, message=None):
+        self.meta.update(progress=max(0, min(99, int(percent))), message=message, updated_at=time.time())
+        self._queue._write_meta(self.meta)
+
+    def item(self, key, **status):
+        """Record the status of one unit of a batch job (e.g. a submission) as soon as it changes."""
+        if self.meta['items'] is None:
+            self.meta['items'] = {}
+        self.meta['items'][str(key)] = status
+        self.meta['updated_at'] = time.time()
+        self._queue._write_meta(self.meta)
+
+    @contextmanager
+    def connection(self):
+        """A pooled connection for one read or write phase, committed when the block succeeds.
+
+        Handlers should not hold a connection across model calls; borrow one
+        to read their inputs, release it, and borrow again to persist.
+        """
+        from init_db import pool
+        conn = pool.acquire()
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            pool.release(conn, discard=not conn.open)
+
+
+class AIJobQueue:
+    """Runs AI generation jobs on one bounded thread pool per provider.
+
+    Each provider has its own executor sized by ``concurrency`` so the number
+    of in-flight model calls is capped per backend and a slow Bedrock queue
+    cannot hold up Ollama jobs (or request workers). As with export jobs,
+    metadata lives in ``directory`` so any gunicorn worker can answer status
+    requests for a job started by another.
+    """
+
+    def __init__(self, directory, concurrency, max_pending=100, ttl=3600):
+        self.directory = directory
+        self.concurrency = concurrency  # provider -> max concurrent jobs
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self._handlers = {}  # kind -> handler(job, params) -> JSON-serialisable result
+        self._executors = {}
+        self._executor_pid = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def register(self, kind, handler):
+        self._handlers[kind] = handler
+
+    @property
+    def kinds(self):
+        return sorted(self._handlers)
+
+    def _get_executor(self, provider):
+        # Threads do not survive a fork; build the pools lazily in each worker
+        if self._executor_pid != os.getpid():
+            self._executors = {}
+            self._executor_pid = os.getpid()
+            self._pending = 0
+        if provider not in self._executors:
+            self._executors[provider] = ThreadPoolExecutor(max_workers=self.concurrency.get(provider, 1),
+                                                           thread_name_prefix=f'ai-{provider}')
+        return self._executors[provider]
+
+    def _path(self, job_id):
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def _write_meta(self, meta):
+        tmp = f"{self._path(meta['job_id'])}.{os.getpid()}.{threading.get_ident()}"
+        with open(tmp, 'w') as f:
+            json.dump(meta, f, default=str)
+        os.replace(tmp, self._path(meta['job_id']))
+
+    def get(self, job_id):
+        if len(job_id) != 32 or not all(c in '0123456789abcdef' for c in job_id):
+            return None
+        try:
+            with open(self._path(job_id)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def submit(self, kind, params, provider, owner=None):
+        """Queue a job and return its metadata.
+
+        Raises KeyError for an unknown kind and OverflowError when too many
+        jobs are already waiting in this worker.
+        """
+        handler = self._handlers[kind]
+        os.makedirs(self.directory, exist_ok=True)
+        self.prune()
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise OverflowError('Too many AI jobs in progress, try again shortly')
+            now = time.time()
+            meta = {
+                'job_id': uuid.uuid4().hex, 'kind': kind, 'provider': provider, 'owner': owner,
+                'params': params, 'status': 'queued', 'progress': 0, 'message': None,
+                'result': None, 'error': None, 'items': None,
+                'created_at': now, 'updated_at': now, 'started_at': None, 'finished_at': None,
+            }
+            self._write_meta(meta)
+            executor = self._get_executor(provider)
+            self._pending += 1
+        executor.submit(self._run, dict(meta), handler)
+        return meta
+
+    def _run(self, meta, handler):
+        job = AIJob(self, meta)
+        try:
+            meta.update(status='running', started_at=time.time(), updated_at=time.time())
+            self._write_meta(meta)
+            result = handler(job, meta['params'])
+            meta.update(status='done', progress=100, message=None, result=result)
+        except Exception as e:
+            logger.error(f"AI job {meta['job_id']} ({meta['kind']}) failed: {e}")
+            meta.update(status='failed', error=str(e))
+        finally:
+            meta.update(updated_at=time.time(), finished_at=time.time())
+            self._write_meta(meta)
+            with self._lock:
+                self._pending -= 1
+
+    def prune(self):
+        """Delete finished jobs older than ``ttl`` seconds."""
+        cutoff = time.time() - self.ttl
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return 0
+        removed = 0
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            meta = self.get(name[:-5])
+            if meta and meta['status'] in ('done', 'failed') and meta['updated_at'] < cutoff:
+                try:
+                    os.remove(self._path(meta['job_id']))
+                except FileNotFoundError:
+                    pass
+                removed += 1
+        return removed
+
+
+ai_jobs = AIJobQueue(
+    directory=os.getenv('AI_JOB_DIR', os.path.join(tempfile.gettempdir(), 'lms_ai_jobs')),
+    concurrency={
+        'bedrock': int(os.getenv('AI_JOBS_BEDROCK_CONCURRENCY', 4)),
+        'ollama': int(os.getenv('AI_JOBS_OLLAMA_CONCURRENCY', 1)),
+    },
+    max_pending=int(os.getenv('AI_JOBS_MAX_PENDING', 100)),
+    ttl=int(os.getenv('AI_JOBS_TTL', 3600)),
+)
@@ -0,0 +1,422 @@
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from metrics import AI_CALLS, AI_ERRORS, AI_FIRST_TOKEN, AI_LATENCY
+from utils import logger
+
+
+class ProviderError(Exception):
+    """A model call failed; ``retryable`` says whether trying again may help."""
+
+    def __init__(self, message, retryable=False):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class CircuitOpenError(ProviderError):
+    """Raised without calling the backend while its circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Stops calling a backend after ``threshold`` consecutive failed calls.
+
+    While open every call fails fast; after ``reset_after`` seconds one trial
+    call is let through (half-open) and its outcome closes or re-opens the
+    circuit.
+    """
+
+    def __init__(self, threshold=5, reset_after=30):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            return 'half_open' if time.monotonic() - self._opened_at >= self.reset_after else 'open'
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_after or self._trial:
+                return False
+            self._trial = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial or self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+            self._trial = False
+
+
+class Provider:
+    """Base class for a model backend: one shared client per process, retries and a breaker.
+
+    At most ``max_in_flight`` calls run at once per worker, however many job
+    or grading threads ask; the rest wait for a slot.
+
+    Subclasses implement ``_connect()`` (build the pooled client),
+    ``_invoke(client, prompt, temperature, timeout)`` returning
+    ``(text, tokens)`` and ``_stream(..., usage)`` yielding text pieces and
+    setting ``usage['tokens']`` from the final event; they raise
+    ProviderError with ``retryable`` set for failures worth another attempt.
+    """
+
+    name = None
+
+    def __init__(self, deadline=120, max_attempts=3, backoff=0.5, max_backoff=8.0,
+                 breaker_threshold=5, breaker_reset=30, max_in_flight=4):
+        self.deadline = deadline
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_reset)
+        self._client = None
+        self._client_pid = None
+        self._lock = threading.Lock()
+        self.max_in_flight = max_in_flight
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._slots_pid = os.getpid()
+        self._in_flight = 0
+
+    def client(self):
+        # Sockets must not be shared across a fork; build the client lazily in each worker
+        if self._client is None or self._client_pid != os.getpid():
+            with self._lock:
+                if self._client is None or self._client_pid != os.getpid():
+                    self._client = self._connect()
+                    self._client_pid = os.getpid()
+        return self._client
+
+    def _connect(self):
+        raise NotImplementedError
+
+    def _invoke(self, client, prompt, temperature, timeout):
+        raise NotImplementedError
+
+    def _stream(self, client, prompt, temperature, timeout, usage):
+        raise NotImplementedError
+
+    @contextmanager
+    def _slot(self, wait):
+        """Hold one of the ``max_in_flight`` call slots, waiting at most ``wait`` seconds for it."""
+        if self._slots_pid != os.getpid():
+            with self._lock:
+                if self._slots_pid != os.getpid():
+                    self._slots = threading.BoundedSemaphore(self.max_in_flight)
+                    self._slots_pid = os.getpid()
+                    self._in_flight = 0
+        slots = self._slots
+        if not slots.acquire(timeout=wait):
+            AI_CALLS.inc(provider=self.name, outcome='saturated')
+            raise ProviderError(f"{self.name} already has {self.max_in_flight} calls in flight; "
+                                f"no slot freed up within {wait}s")
+        with self._lock:
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            slots.release()
+
+    def _sleep_before_retry(self, attempt, deadline_at):
+        # Full jitter keeps workers that failed together from retrying together
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+        if time.monotonic() + delay >= deadline_at:
+            return False
+        time.sleep(delay)
+        return True
+
+    def generate(self, prompt, temperature=0.7, deadline=None):
+        """Return ``(text, tokens, seconds)`` for the prompt or raise ProviderError.
+
+        ``deadline`` bounds the whole call, retries and backoff included; it
+        starts once a call slot is free.
+        """
+        with self._slot(deadline or self.deadline):
+            return self._generate(prompt, temperature, deadline)
+
+    def _generate(self, prompt, temperature, deadline):
+        if not self.breaker.allow():
+            AI_CALLS.inc(provider=self.name, outcome='circuit_open')
+            raise CircuitOpenError(f"{self.name} circuit is open, not calling the model")
+        started = time.monotonic()
+        deadline_at = started + (deadline or self.deadline)
+        attempt = 0
+        while True:
+            attempt += 1
+            attempt_started = time.perf_counter()
+            try:
+                text, tokens = self._invoke(self.client(), prompt, temperature,
+                                            max(1.0, deadline_at - time.monotonic()))
+            except ProviderError as e:
+                AI_LATENCY.observe(time.perf_counter() - attempt_started, provider=self.name, outcome='error')
+                retry = (e.retryable and attempt < self.max_attempts
+                         and self._sleep_before_retry(attempt, deadline_at))
+                AI_CALLS.inc(provider=self.name, outcome='retry' if retry else 'error')
+                if retry:
+                    logger.warning(f"{self.name} attempt {attempt} failed, retrying: {e}")
+                    continue
+                self.breaker.record_failure()
+                raise
+            except Exception as e:
+                # A bug or client setup failure still has to settle a half-open trial
+                AI_ERRORS.inc(provider=self.name, error=type(e).__name__)
+                AI_CALLS.inc(provider=self.name, outcome='error')
+                self.breaker.record_failure()
+                raise ProviderError(f"{self.name} call failed: {e}") from e
+            AI_LATENCY.observe(time.perf_counter() - attempt_started, provider=self.name, outcome='ok')
+            AI_CALLS.inc(provider=self.name, outcome='ok')
+            self.breaker.record_success()
+            return text, tokens, time.monotonic() - started
+
+    def stream(self, prompt, temperature=0.7, deadline=None, usage=None):
+        """Yield the completion in pieces as the model produces them, or raise ProviderError.
+
+        Only failures before the first piece are retried: text already
+        relayed to a client cannot be taken back. The call slot is held until
+        the stream is exhausted or closed. Pass a dict as ``usage`` to get the
+        call's token count in ``usage['tokens']`` once the stream ends.
+        """
+        with self._slot(deadline or self.deadline):
+            yield from self._stream_pieces(prompt, temperature, deadline, {} if usage is None else usage)
+
+    def _stream_pieces(self, prompt, temperature, deadline, usage):
+        if not self.breaker.allow():
+            AI_CALLS.inc(provider=self.name, outcome='circuit_open')
+            raise CircuitOpenError(f"{self.name} circuit is open, not calling the model")
+        deadline_at = time.monotonic() + (deadline or self.deadline)
+        attempt = 0
+        relayed = False
+        while True:
+            attempt += 1
+            attempt_started = time.perf_counter()
+            try:
+                for piece in self._stream(self.client(), prompt, temperature,
+                                          max(1.0, deadline_at - time.monotonic()), usage):
+                    if not relayed:
+                        AI_FIRST_TOKEN.observe(time.perf_counter() - attempt_started, provider=self.name)
+                        relayed = True
+                    yield piece
+                    if time.monotonic() > deadline_at:
+                        AI_ERRORS.inc(provider=self.name, error='deadline')
+                        raise ProviderError(f"{self.name} stream exceeded its {self.deadline}s deadline")
+            except ProviderError as e:
+                AI_LATENCY.observe(time.perf_counter() - attempt_started, provider=self.name, outcome='error')
+                retry = (not relayed and e.retryable and attempt < self.max_attempts
+                         and self._sleep_before_retry(attempt, deadline_at))
+                AI_CALLS.inc(provider=self.name, outcome='retry' if retry else 'error')
+                if retry:
+                    logger.warning(f"{self.name} stream attempt {attempt} failed, retrying: {e}")
+                    continue
+                self.breaker.record_failure()
+                raise
+            except GeneratorExit:
+                # The consumer went away mid-stream; the backend itself was answering
+                self.breaker.record_success()
+                raise
+            except Exception as e:
+                AI_ERRORS.inc(provider=self.name, error=type(e).__name__)
+                AI_CALLS.inc(provider=self.name, outcome='error')
+                self.breaker.record_failure()
+                raise ProviderError(f"{self.name} stream failed: {e}") from e
+            AI_LATENCY.observe(time.perf_counter() - attempt_started, provider=self.name, outcome='ok')
+            AI_CALLS.inc(provider=self.name, outcome='ok')
+            self.breaker.record_success()
+            return
+
+    def stats(self):
+        with self._lock:
+            in_flight = self._in_flight
+        return {'provider': self.name, 'circuit': self.breaker.state, 'deadline': self.deadline,
+                'max_attempts': self.max_attempts, 'max_in_flight': self.max_in_flight, 'in_flight': in_flight}
+
+
+class BedrockProvider(Provider):
+    name = 'bedrock'
+    _RETRYABLE = frozenset(('ThrottlingException', 'ServiceUnavailableException', 'ModelTimeoutException',
+                            'InternalServerException', 'ModelNotReadyException'))
+
+    def __init__(self, model_id, region, max_connections=10, **kwargs):
+        super().__init__(**kwargs)
+        self.model_id = model_id
+        self.region = region
+        self.max_connections = max_connections
+
+    def _connect(self):
+        import boto3
+        from botocore.config import Config
+        return boto3.client(
+            "bedrock-runtime",
+            region_name=self.region,
+            aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+            aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
+            config=Config(
+                max_pool_connections=self.max_connections,
+                connect_timeout=5,
+                read_timeout=self.deadline,
+                tcp_keepalive=True,
+                retries={'max_attempts': 0},  # retried here, with the breaker and deadline in the loop
+            ),
+        )
+
+    def _body(self, prompt, temperature):
+        return json.dumps({'prompt': prompt, 'max_gen_len': 4096, 'temperature': temperature, 'top_p': 0.9})
+
+    def _error(self, e):
+        from botocore.exceptions import BotoCoreError, ClientError
+        if isinstance(e, ClientError):
+            code = e.response.get('Error', {}).get('Code', 'ClientError')
+            AI_ERRORS.inc(provider=self.name, error=code)
+            return ProviderError(f"Bedrock {code}: {e}", retryable=code in self._RETRYABLE)
+        AI_ERRORS.inc(provider=self.name, error=type(e).__name__)
+        # BotoCoreError covers connection resets, endpoint and read timeouts; anything else is a bad response
+        return ProviderError(f"Bedrock {type(e).__name__}: {e}", retryable=isinstance(e, BotoCoreError))
+
+    def _invoke(self, client, prompt, temperature, timeout):
+        # ``timeout`` is unused: botocore applies read_timeout per client, the deadline still bounds retries
+        try:
+            response = client.invoke_model(modelId=self.model_id, body=self._body(prompt, temperature))
+            result = json.loads(response['body'].read())
+            text = result['generation']
+        except Exception as e:
+            raise self._error(e) from e
+        tokens = (result.get('prompt_token_count') or 0) + (result.get('generation_token_count') or 0)
+        return text, tokens
+
+    def _stream(self, client, prompt, temperature, timeout, usage):
+        try:
+            response = client.invoke_model_with_response_stream(modelId=self.model_id,
+                                                                body=self._body(prompt, temperature))
+            for event in response['body']:
+                if 'chunk' not in event:
+                    # Mid-stream failures arrive as events, e.g. {"throttlingException": {...}}
+                    name = next(iter(event), 'unknownException')
+                    code = name[:1].upper() + name[1:]
+                    AI_ERRORS.inc(provider=self.name, error=code)
+                    raise ProviderError(f"Bedrock stream {code}: {event.get(name)}",
+                                        retryable=code in self._RETRYABLE)
+                chunk = json.loads(event['chunk']['bytes'])
+                # The last chunk carries the totals for the whole invocation
+                metrics = chunk.get('amazon-bedrock-invocationMetrics')
+                if metrics:
+                    usage['tokens'] = (metrics.get('inputTokenCount') or 0) + (metrics.get('outputTokenCount') or 0)
+                if chunk.get('generation'):
+                    yield chunk['generation']
+        except ProviderError:
+            raise
+        except Exception as e:
+            raise self._error(e) from e
+
+
+class OllamaProvider(Provider):
+    name = 'ollama'
+
+    def __init__(self, url, model, max_connections=10, **kwargs):
+        super().__init__(**kwargs)
+        self.url = url
+        self.model = model
+        self.max_connections = max_connections
+
+    def _connect(self):
+        import requests
+        from requests.adapters import HTTPAdapter
+        session = requests.Session()  # keeps connections alive between calls
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_connections)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def _payload(self, prompt, temperature, stream=False):
+        return {'model': self.model, 'prompt': prompt, 'stream': stream, 'options': {'temperature': temperature}}
+
+    def _post(self, client, payload, timeout, stream=False):
+        import requests
+        try:
+            response = client.post(f"{self.url}/api/generate", json=payload, timeout=(5, timeout), stream=stream)
+        except requests.RequestException as e:
+            AI_ERRORS.inc(provider=self.name, error=type(e).__name__)
+            raise ProviderError(f"Ollama {type(e).__name__}: {e}", retryable=True) from e
+        if response.status_code != 200:
+            AI_ERRORS.inc(provider=self.name, error=f"http_{response.status_code}")
+            response.close()
+            raise ProviderError(f"Ollama API error: {response.status_code} - {response.text}",
+                                retryable=response.status_code == 429 or response.status_code >= 500)
+        return response
+
+    def _invoke(self, client, prompt, temperature, timeout):
+        response = self._post(client, self._payload(prompt, temperature), timeout)
+        try:
+            result = response.json()
+        except ValueError as e:
+            AI_ERRORS.inc(provider=self.name, error='bad_response')
+            raise ProviderError(f"Ollama returned invalid JSON: {e}") from e
+        tokens = (result.get('prompt_eval_count') or 0) + (result.get('eval_count') or 0)
+        return (result.get('response') or '').strip(), tokens
+
+    def _stream(self, client, prompt, temperature, timeout, usage):
+        import requests
+        # One JSON object per line: {"response": "<piece>", "done": false} ... {"done": true}
+        with self._post(client, self._payload(prompt, temperature, stream=True), timeout, stream=True) as response:
+            try:
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get('error'):
+                        AI_ERRORS.inc(provider=self.name, error='stream_error')
+                        raise ProviderError(f"Ollama stream error: {chunk['error']}")
+                    if chunk.get('response'):
+                        yield chunk['response']
+                    if chunk.get('done'):
+                        usage['tokens'] = (chunk.get('prompt_eval_count') or 0) + (chunk.get('eval_count') or 0)
+                        return
+            except requests.RequestException as e:
+                AI_ERRORS.inc(provider=self.name, error=type(e).__name__)
+                raise ProviderError(f"Ollama {type(e).__name__}: {e}", retryable=True) from e
+            except ValueError as e:
+                AI_ERRORS.inc(provider=self.name, error='bad_response')
+                raise ProviderError(f"Ollama returned invalid JSON: {e}") from e
+
+
+providers = {
+    'bedrock': BedrockProvider(
+        model_id=os.getenv('BEDROCK_MODEL_ID', 'meta.llama3-70b-instruct-v1:0'),
+        region=os.getenv('AWS_REGION', 'us-west-2'),
+        max_connections=int(os.getenv('AI_BEDROCK_MAX_CONNECTIONS', 10)),
+        deadline=float(os.getenv('AI_BEDROCK_DEADLINE', 120)),
+        max_attempts=int(os.getenv('AI_BEDROCK_MAX_ATTEMPTS', 3)),
+        max_in_flight=int(os.getenv('AI_BEDROCK_MAX_IN_FLIGHT', 4)),
+        breaker_threshold=int(os.getenv('AI_BREAKER_THRESHOLD', 5)),
+        breaker_reset=float(os.getenv('AI_BREAKER_RESET', 30)),
+    ),
+    'ollama': OllamaProvider(
+        url=os.getenv('OLLAMA_URL', 'http://localhost:11434'),
+        model=os.getenv('OLLAMA_MODEL', 'llama3'),
+        max_connections=int(os.getenv('AI_OLLAMA_MAX_CONNECTIONS', 10)),
+        deadline=float(os.getenv('AI_OLLAMA_DEADLINE', 300)),
+        max_attempts=int(os.getenv('AI_OLLAMA_MAX_ATTEMPTS', 3)),
+        max_in_flight=int(os.getenv('AI_OLLAMA_MAX_IN_FLIGHT', 1)),
+        breaker_threshold=int(os.getenv('AI_BREAKER_THRESHOLD', 5)),
+        breaker_reset=float(os.getenv('AI_BREAKER_RESET', 30)),
+    ),
+}
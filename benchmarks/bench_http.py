@@ -0,0 +1,294 @@
+"""HTTP load test for the busiest API endpoints.
+
+Boots ``create_app()`` on a local port against the MySQL/MariaDB database
+named by the usual DB_* variables, seeds a small synthetic dataset (an
+admin user with an API key, one course instance with enrolled students and
+an assessment scope), then drives concurrent traffic at each endpoint in
+turn and reports p50/p95/p99 latency and requests/sec.
+
+Point it at a throwaway database; it only adds rows, but it adds them:
+
+    DB_NAME=lms_bench python benchmarks/bench_http.py --requests 500 --concurrency 16 \\
+        --output bench_http.json
+"""
+import argparse
+import json
+import os
+import secrets
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timezone
+
+import requests
+from werkzeug.serving import make_server
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flasky import create_app  # noqa: E402
+from init_db import get_db  # noqa: E402
+from utils import api_key_digest, hash_password  # noqa: E402
+
+ADMIN_EXTERNAL_ID = 'bench-admin'
+ADMIN_PASSWORD = 'bench-password'
+COURSE_CODE = 'BENCH101'
+
+
+def _fetch_id(cursor, query, params, column):
+    cursor.execute(query, params)
+    row = cursor.fetchone()
+    return row[column] if row else None
+
+
+def seed(app, students, modules, sections_per_module, items_per_section):
+    """Create the benchmark dataset once; later runs reuse it and mint a fresh API key."""
+    with app.app_context():
+        db = get_db()
+        with db.cursor() as cursor:
+            admin_id = _fetch_id(cursor, "SELECT user_id FROM users WHERE external_id = %s",
+                                 (ADMIN_EXTERNAL_ID,), 'user_id')
+            if admin_id is None:
+                cursor.execute(
+                    "INSERT INTO users (external_id, password_hash, full_name, role) VALUES (%s, %s, %s, %s)",
+                    (ADMIN_EXTERNAL_ID, hash_password(ADMIN_PASSWORD), 'Bench Admin', 'admin')
+                )
+                admin_id = cursor.lastrowid
+
+            api_key = f"sk_{secrets.token_hex(32)}"
+            cursor.execute(
+                "INSERT INTO api_keys (user_id, api_key, key_digest, name, created_at) VALUES (%s, %s, %s, %s, %s)",
+                (admin_id, hash_password(api_key), api_key_digest(api_key), 'bench', datetime.now(timezone.utc))
+            )
+
+            course_id = _fetch_id(cursor, "SELECT course_id FROM courses_master WHERE course_code = %s",
+                                  (COURSE_CODE,), 'course_id')
+            if course_id is not None:
+                instance_id = _fetch_id(cursor, "SELECT instance_id FROM course_instances WHERE course_id = %s LIMIT 1",
+                                        (course_id,), 'instance_id')
+                exam_type_id = _fetch_id(
+                    cursor, "SELECT exam_type_id FROM assessment_scopes WHERE course_id = %s LIMIT 1",
+                    (course_id,), 'exam_type_id')
+                student_id = _fetch_id(
+                    cursor, "SELECT user_id FROM enrollments WHERE instance_id = %s LIMIT 1",
+                    (instance_id,), 'user_id')
+                db.commit()
+                return {'api_key': api_key, 'course_id': course_id, 'instance_id': instance_id,
+                        'exam_type_id': exam_type_id, 'student_id': student_id}
+
+            cursor.execute(
+                "INSERT INTO courses_master (course_code, course_title, description) VALUES (%s, %s, %s)",
+                (COURSE_CODE, 'Benchmark Course', 'Synthetic course for load testing')
+            )
+            course_id = cursor.lastrowid
+            cursor.execute(
+                "INSERT INTO course_instances (course_id, term_code, start_date, end_date) VALUES (%s, %s, %s, %s)",
+                (course_id, 'BENCH-T1', date(2025, 1, 6), date(2025, 5, 30))
+            )
+            instance_id = cursor.lastrowid
+
+            password_hash = hash_password('student-password')
+            cursor.executemany(
+                "INSERT INTO users (external_id, password_hash, full_name, role) VALUES (%s, %s, %s, %s)",
+                [(f"bench-student-{i:06d}", password_hash, f"Bench Student {i}", 'student') for i in range(students)]
+            )
+            cursor.execute("SELECT user_id FROM users WHERE external_id LIKE 'bench-student-%%'")
+            student_ids = [row['user_id'] for row in cursor.fetchall()]
+            cursor.executemany(
+                "INSERT INTO enrollments (instance_id, user_id) VALUES (%s, %s)",
+                [(instance_id, user_id) for user_id in student_ids]
+            )
+
+            cursor.execute(
+                "INSERT INTO exam_types (exam_name, category, exam_period, description, total_items) "
+                "VALUES (%s, %s, %s, %s, %s)",
+                ('Bench Prelim', 'exam', 'Prelim', 'Synthetic exam type', min(50, modules * sections_per_module * items_per_section))
+            )
+            exam_type_id = cursor.lastrowid
+
+            for m in range(1, modules + 1):
+                cursor.execute(
+                    "INSERT INTO modules_master (course_id, position, content_html, module_title, module_description) "
+                    "VALUES (%s, %s, %s, %s, %s)",
+                    (course_id, m, f"<h2>Module {m}</h2><div class=\"module-description\">Synthetic module {m}</div>",
+                     f"Module {m}", f"Synthetic module {m}")
+                )
+                module_id = cursor.lastrowid
+                cursor.execute(
+                    "INSERT INTO assessment_scopes (course_id, exam_type_id, module_id) VALUES (%s, %s, %s)",
+                    (course_id, exam_type_id, module_id)
+                )
+                for s in range(1, sections_per_module + 1):
+                    cursor.execute(
+                        "INSERT INTO module_sections (module_id, position, title, content) VALUES (%s, %s, %s, %s)",
+                        (module_id, s, f"Section {m}.{s}", f"<p>Content for section {m}.{s}</p>")
+                    )
+                    section_id = cursor.lastrowid
+                    cursor.executemany(
+                        "INSERT INTO exam_items (section_id, question, option_a, option_b, option_c, option_d, correct_answer) "
+                        "VALUES (%s, %s, %s, %s, %s, %s, %s)",
+                        [(section_id, f"Question {m}.{s}.{i}?", 'A', 'B', 'C', 'D', 'A')
+                         for i in range(1, items_per_section + 1)]
+                    )
+        db.commit()
+        return {'api_key': api_key, 'course_id': course_id, 'instance_id': instance_id,
+                'exam_type_id': exam_type_id, 'student_id': student_ids[0] if student_ids else None}
+
+
+class ServerThread(threading.Thread):
+    def __init__(self, app, host, port):
+        super().__init__(daemon=True)
+        self.server = make_server(host, port, app, threaded=True)
+        self.base_url = f"http://{host}:{self.server.server_port}"
+
+    def run(self):
+        self.server.serve_forever()
+
+    def shutdown(self):
+        self.server.shutdown()
+
+
+def endpoints(base_url, data, cookies):
+    headers = {'X-API-KEY': data['api_key']}
+    refresh_headers = {'X-CSRF-TOKEN': cookies.get('csrf_refresh_token', '')}
+    return [
+        ('enrollments', 'GET', f"{base_url}/api/enrollments/?page=1&per_page=20", {'headers': headers}),
+        ('student_enrollments', 'GET', f"{base_url}/api/enrollments/student/{data['student_id']}",
+         {'headers': headers}),
+        ('instances', 'GET', f"{base_url}/api/instances/?page=1&per_page=20", {'headers': headers}),
+        ('generate_preview', 'POST', f"{base_url}/api/assessment_preview/generate-preview",
+         {'headers': headers, 'json': {'course_id': data['course_id'], 'exam_type_id': data['exam_type_id']}}),
+        ('auth_refresh', 'POST', f"{base_url}/api/auth/refresh", {'headers': refresh_headers, 'cookies': cookies}),
+    ]
+
+
+def login(base_url):
+    resp = requests.post(f"{base_url}/api/auth/login",
+                         json={'external_id': ADMIN_EXTERNAL_ID, 'password': ADMIN_PASSWORD}, timeout=30)
+    resp.raise_for_status()
+    return resp.cookies.get_dict()
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def drive(method, url, kwargs, total, concurrency, warmup):
+    """Send ``total`` requests from ``concurrency`` threads; one Session per thread."""
+    local = threading.local()
+    remaining = iter(range(total))
+    remaining_lock = threading.Lock()
+    latencies = []
+    statuses = Counter()
+    record_lock = threading.Lock()
+
+    def session():
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        return local.session
+
+    def worker():
+        mine, codes = [], Counter()
+        while True:
+            with remaining_lock:
+                if next(remaining, None) is None:
+                    break
+            started = time.perf_counter()
+            try:
+                status = session().request(method, url, timeout=60, **kwargs).status_code
+            except requests.RequestException:
+                status = 'error'
+            mine.append(time.perf_counter() - started)
+            codes[status] += 1
+        with record_lock:
+            latencies.extend(mine)
+            statuses.update(codes)
+
+    for _ in range(warmup):
+        requests.request(method, url, timeout=60, **kwargs)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    ok = sum(n for code, n in statuses.items() if isinstance(code, int) and code < 400)
+    return {
+        'requests': total,
+        'ok': ok,
+        'errors': total - ok,
+        'statuses': {str(code): n for code, n in statuses.items()},
+        'seconds': round(elapsed, 3),
+        'requests_per_sec': round(total / elapsed, 2) if elapsed else None,
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 2) if latencies else None,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+        'max_ms': round(latencies[-1] * 1000, 2) if latencies else None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=500, help='requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--warmup', type=int, default=10, help='unmeasured requests per endpoint')
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--modules', type=int, default=10)
+    parser.add_argument('--sections', type=int, default=5, help='sections per module')
+    parser.add_argument('--items', type=int, default=10, help='exam items per section')
+    parser.add_argument('--only', action='append', help='run only this endpoint (repeatable)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=0, help='0 picks a free port')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+    started_at = datetime.now(timezone.utc).isoformat()
+
+    app = create_app()
+    # The harness talks plain HTTP to localhost, so the JWT cookies cannot be Secure-only
+    app.config['JWT_COOKIE_SECURE'] = False
+
+    data = seed(app, args.students, args.modules, args.sections, args.items)
+    server = ServerThread(app, args.host, args.port)
+    server.start()
+    try:
+        cookies = login(server.base_url)
+        results = {}
+        for name, method, url, kwargs in endpoints(server.base_url, data, cookies):
+            if args.only and name not in args.only:
+                continue
+            results[name] = drive(method, url, kwargs, args.requests, args.concurrency, args.warmup)
+            r = results[name]
+            print(f"{name:>20}: {r['requests_per_sec']:>8} req/s  p50 {r['p50_ms']}ms  "
+                  f"p95 {r['p95_ms']}ms  p99 {r['p99_ms']}ms  errors {r['errors']}")
+    finally:
+        server.shutdown()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'benchmark': 'http',
+                'commit': git_commit(),
+                'started_at': started_at,
+                'config': {k: v for k, v in vars(args).items() if k != 'output'},
+                'results': results,
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Throughput of the bulk password hashing stage used by the user CSV import.
+
+Hashes the same synthetic password list with 1..N worker processes and
+reports rows/sec for each core count.
+
+    python benchmarks/bench_password_hashing.py --rows 200 --output bench_hashing.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import hash_password, hash_passwords  # noqa: E402
+
+
+def run(rows, max_workers):
+    passwords = [f"Student#{i:05d}" for i in range(rows)]
+    results = []
+
+    started = time.perf_counter()
+    for password in passwords:
+        hash_password(password)
+    serial = time.perf_counter() - started
+    results.append({'workers': 0, 'mode': 'serial', 'seconds': round(serial, 3),
+                    'rows_per_sec': round(rows / serial, 2)})
+
+    for workers in range(1, max_workers + 1):
+        # Same start method as utils.get_hash_executor
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            # Warm the workers so process start-up is not counted
+            list(executor.map(hash_password, ['warmup'] * workers))
+            started = time.perf_counter()
+            hash_passwords(passwords, executor=executor)
+            elapsed = time.perf_counter() - started
+        results.append({'workers': workers, 'mode': 'process_pool', 'seconds': round(elapsed, 3),
+                        'rows_per_sec': round(rows / elapsed, 2),
+                        'speedup': round(serial / elapsed, 2)})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    results = run(args.rows, args.max_workers)
+    for r in results:
+        label = 'serial' if r['mode'] == 'serial' else f"{r['workers']} worker(s)"
+        print(f"{label:>12}: {r['rows_per_sec']:>8} rows/sec ({r['seconds']}s)")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'benchmark': 'password_hashing', 'rows': args.rows,
+                       'cpu_count': os.cpu_count(), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
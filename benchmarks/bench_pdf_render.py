@@ -0,0 +1,162 @@
+"""Render time and peak memory of the shared PDF exporter path.
+
+Builds a synthetic module (N sections of paragraphs, lists and code blocks)
+and lays it out three ways:
+
+- legacy: the single-module exporter as it was before pdf_render. It builds
+  the stylesheet per call and flattens each section with its own
+  BeautifulSoup loop into a full story list. The per-section page breaks are
+  left out so the page count matches the other modes.
+- list: the shared styles and converter, laid out from a materialised list.
+- streamed: the shared styles and converter fed to build_pdf by a generator.
+
+Reports seconds per render, seconds spent building the story alone (styles
+plus HTML conversion, before layout) and the tracemalloc peak for each.
+
+    python benchmarks/bench_pdf_render.py --sections 200 --output bench_pdf.json
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from bs4 import BeautifulSoup
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.platypus import SimpleDocTemplate
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_render import Paragraph, Spacer, build_pdf, escape, get_styles, html_to_flowables  # noqa: E402
+
+SECTION_HTML = (
+    '<p>This section introduces <b>loops</b> and <i>conditionals</i> with a worked example &amp; notes.</p>'
+    '<ul><li>Read the problem statement</li><li>Trace the loop by hand</li><li>Check edge cases</li></ul>'
+    '<pre>for i in range(10):\n    if i % 2:\n        print(i)\n</pre>'
+    '<p>' + 'Students should be able to explain each step of the trace. ' * 12 + '</p>'
+)
+
+
+def flowables(sections):
+    styles = get_styles()
+    yield Paragraph('Benchmark Module', styles['EnhancedTitleStyle'])
+    for i in range(sections):
+        yield Paragraph(escape(f'Section {i + 1}'), styles['EnhancedSectionHeaderStyle'])
+        yield from html_to_flowables(SECTION_HTML, styles['EnhancedContentStyle'], gap=6)
+        yield Spacer(1, 12)
+
+
+def legacy_story(sections):
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle('EnhancedTitleStyle', parent=styles['Title'], fontSize=24, spaceAfter=30,
+                                 alignment=1, textColor=colors.HexColor('#1a365d'), fontName='Helvetica-Bold')
+    section_header_style = ParagraphStyle('EnhancedSectionHeaderStyle', parent=styles['Heading2'], fontSize=16,
+                                          spaceAfter=15, spaceBefore=20, textColor=colors.HexColor('#2d3748'),
+                                          fontName='Helvetica-Bold', leftIndent=20, borderWidth=1,
+                                          borderColor=colors.HexColor('#e2e8f0'), borderPadding=8,
+                                          backColor=colors.HexColor('#f7fafc'))
+    content_style = ParagraphStyle('EnhancedContentStyle', parent=styles['Normal'], fontSize=11, spaceAfter=12,
+                                   leftIndent=30, rightIndent=20, textColor=colors.HexColor('#2d3748'),
+                                   fontName='Helvetica')
+
+    story = [Paragraph('Benchmark Module', title_style)]
+    for i in range(sections):
+        story.append(Paragraph(f'Section {i + 1}', section_header_style))
+        story.append(Spacer(1, 15))
+        soup = BeautifulSoup(SECTION_HTML, 'html.parser')
+        for br in soup.find_all('br'):
+            br.replace_with('\n')
+        for p in soup.find_all('p'):
+            p.insert_after('\n\n')
+        for div in soup.find_all('div'):
+            div.insert_after('\n')
+        for tag in soup.find_all(['strong', 'b']):
+            if tag.get_text():
+                tag.replace_with(f"<b>{tag.get_text()}</b>")
+        for tag in soup.find_all(['em', 'i']):
+            if tag.get_text():
+                tag.replace_with(f"<i>{tag.get_text()}</i>")
+        current = []
+        for line in soup.get_text().split('\n') + ['']:
+            line = line.strip()
+            if line:
+                current.append(line)
+            elif current:
+                story.append(Paragraph(' '.join(current), content_style))
+                story.append(Spacer(1, 8))
+                current = []
+    return story
+
+
+def render_legacy(sections):
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
+    doc.build(legacy_story(sections))
+    return buffer.getvalue()
+
+
+def render_list(sections):
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
+    doc.build(list(flowables(sections)))
+    return buffer.getvalue()
+
+
+def render_streamed(sections):
+    return build_pdf(flowables(sections), 'benchmark')
+
+
+def shared_story(sections):
+    return list(flowables(sections))
+
+
+def measure(render, story, sections, repeat):
+    render(sections)  # warm the style registry and font caches
+    started = time.perf_counter()
+    for _ in range(repeat):
+        size = len(render(sections))
+    elapsed = (time.perf_counter() - started) / repeat
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        story(sections)
+    story_elapsed = (time.perf_counter() - started) / repeat
+
+    tracemalloc.start()
+    render(sections)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'seconds': round(elapsed, 3), 'story_seconds': round(story_elapsed, 3),
+            'peak_kib': round(peak / 1024), 'pdf_bytes': size}
+
+
+def run(sections, repeat):
+    modes = (('legacy', render_legacy, legacy_story), ('list', render_list, shared_story),
+             ('streamed', render_streamed, shared_story))
+    return [dict(mode=name, **measure(render, story, sections, repeat)) for name, render, story in modes]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sections', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    results = run(args.sections, args.repeat)
+    for r in results:
+        print(f"{r['mode']:>9}: {r['seconds']:>7}s/render, {r['story_seconds']:>7}s story, "
+              f"peak {r['peak_kib']:>7} KiB ({r['pdf_bytes']} bytes)")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'benchmark': 'pdf_render', 'sections': args.sections, 'repeat': args.repeat,
+                       'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+import os
+import threading
+import time
+from collections import deque
+
+import pymysql
+
+from utils import logger
+
+
+class PoolTimeout(pymysql.MySQLError):
+    """Raised when no connection could be checked out before the timeout."""
+
+
+class ConnectionPool:
+    """Per-process pool of pymysql connections.
+
+    Keeps up to ``max_size`` connections open between requests and lets
+    ``overflow`` extra connections be opened under burst load; overflow
+    connections are closed as soon as they are returned.
+    """
+
+    def __init__(self, connect_kwargs, min_size=1, max_size=10, overflow=5,
+                 idle_timeout=300, checkout_timeout=10):
+        self.connect_kwargs = connect_kwargs
+        self.min_size = min_size
+        self.max_size = max_size
+        self.overflow = overflow
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+
+        self._idle = deque()  # (connection, returned_at)
+        self._cond = threading.Condition(threading.Lock())
+        self._in_use = 0
+        self._pid = os.getpid()
+
+        self._created = 0
+        self._closed = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._max_wait = 0.0
+        self._timeouts = 0
+
+    def _connect(self):
+        conn = pymysql.connect(**self.connect_kwargs)
+        with self._cond:
+            self._created += 1
+        return conn
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._closed += 1
+
+    def _check_fork(self):
+        # Connections must never be shared across a fork (e.g. gunicorn --preload).
+        if self._pid != os.getpid():
+            with self._cond:
+                self._idle.clear()
+                self._in_use = 0
+                self._pid = os.getpid()
+
+    def fill(self):
+        """Open connections until ``min_size`` are available."""
+        self._check_fork()
+        while True:
+            with self._cond:
+                if len(self._idle) + self._in_use >= self.min_size:
+                    return
+            conn = self._connect()
+            with self._cond:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    def acquire(self):
+        """Check out a live connection, waiting up to ``checkout_timeout``."""
+        self._check_fork()
+        limit = self.max_size + self.overflow
+        started = time.monotonic()
+        waited = False
+
+        with self._cond:
+            while not self._idle and self._in_use >= limit:
+                waited = True
+                remaining = self.checkout_timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(f"No database connection available after {self.checkout_timeout}s")
+                self._cond.wait(remaining)
+
+            item = self._idle.pop() if self._idle else None
+            self._in_use += 1
+            self._checkouts += 1
+            if waited:
+                elapsed = time.monotonic() - started
+                self._waits += 1
+                self._wait_time += elapsed
+                self._max_wait = max(self._max_wait, elapsed)
+
+        try:
+            conn = self._revive(item) if item else None
+            if conn is None:
+                conn = self._connect()
+            return conn
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    def _revive(self, item):
+        """Return the idle connection if it is still usable, otherwise None."""
+        conn, returned_at = item
+        if self.idle_timeout and time.monotonic() - returned_at > self.idle_timeout:
+            self._discard(conn)
+            return None
+        try:
+            conn.ping(reconnect=False)
+            return conn
+        except Exception as e:
+            logger.warning(f"Dropping dead pooled connection: {e}")
+            self._discard(conn)
+            return None
+
+    def release(self, conn, discard=False):
+        """Return a connection to the pool, resetting its session state."""
+        if self._pid != os.getpid():
+            return
+        if not discard:
+            try:
+                # Drop any open transaction so the next borrower starts clean
+                conn.rollback()
+                if conn.get_autocommit():
+                    conn.autocommit(False)
+                if self.connect_kwargs.get('database'):
+                    conn.select_db(self.connect_kwargs['database'])
+            except Exception as e:
+                logger.warning(f"Discarding pooled connection after reset failure: {e}")
+                discard = True
+
+        with self._cond:
+            self._in_use -= 1
+            keep = not discard and len(self._idle) + self._in_use < self.max_size
+            if keep:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+        if not keep:
+            self._discard(conn)
+        self._prune_idle()
+
+    def _prune_idle(self):
+        if not self.idle_timeout:
+            return
+        cutoff = time.monotonic() - self.idle_timeout
+        expired = []
+        with self._cond:
+            # Oldest connections sit at the left end of the deque
+            while (self._idle and self._idle[0][1] < cutoff
+                   and len(self._idle) + self._in_use > self.min_size):
+                expired.append(self._idle.popleft()[0])
+        for conn in expired:
+            self._discard(conn)
+
+    def close_all(self):
+        with self._cond:
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+        for conn in idle:
+            self._discard(conn)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'overflow': self.overflow,
+                'created': self._created,
+                'closed': self._closed,
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'timeouts': self._timeouts,
+                'total_wait_ms': round(self._wait_time * 1000, 3),
+                'avg_wait_ms': round(self._wait_time * 1000 / self._waits, 3) if self._waits else 0.0,
+                'max_wait_ms': round(self._max_wait * 1000, 3),
+            }
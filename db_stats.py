@@ -0,0 +1,90 @@
+import re
+import time
+from collections import Counter
+
+_WHITESPACE = re.compile(r'\s+')
+_IN_LIST = re.compile(r'IN\s*\(\s*%s(\s*,\s*%s)*\s*\)', re.IGNORECASE)
+
+
+def statement_shape(sql):
+    """Normalise a statement so repeated executions of one query compare equal."""
+    if isinstance(sql, bytes):
+        sql = sql.decode('utf-8', errors='replace')
+    sql = _WHITESPACE.sub(' ', sql).strip()
+    return _IN_LIST.sub('IN (...)', sql)
+
+
+class QueryStats:
+    """Query count, DB time and statement shapes recorded for one request."""
+
+    def __init__(self, n_plus_one_threshold=10):
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.count = 0
+        self.total_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_sql = None
+        self.shapes = Counter()
+
+    def record(self, sql, elapsed):
+        shape = statement_shape(sql)
+        self.count += 1
+        self.total_time += elapsed
+        self.shapes[shape] += 1
+        if elapsed > self.slowest_time:
+            self.slowest_time = elapsed
+            self.slowest_sql = shape
+
+    def n_plus_one(self):
+        """Statement shapes executed at least ``n_plus_one_threshold`` times."""
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= self.n_plus_one_threshold]
+
+    def header_value(self):
+        return f"count={self.count}; time_ms={self.total_time * 1000:.1f}; slowest_ms={self.slowest_time * 1000:.1f}"
+
+
+class InstrumentedCursor:
+    """Cursor proxy that times execute/executemany into a QueryStats."""
+
+    def __init__(self, cursor, stats):
+        self._cursor = cursor
+        self._stats = stats
+
+    def execute(self, query, args=None):
+        started = time.perf_counter()
+        try:
+            return self._cursor.execute(query, args)
+        finally:
+            self._stats.record(query, time.perf_counter() - started)
+
+    def executemany(self, query, args):
+        started = time.perf_counter()
+        try:
+            return self._cursor.executemany(query, args)
+        finally:
+            self._stats.record(query, time.perf_counter() - started)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._cursor.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class InstrumentedConnection:
+    """Connection proxy whose cursors feed the request's QueryStats."""
+
+    def __init__(self, connection, stats):
+        self.raw = connection
+        self.stats = stats
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self.raw.cursor(*args, **kwargs), self.stats)
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
@@ -0,0 +1,115 @@
+import os
+
+import pymysql
+from pymysql.constants import ER
+
+from cache import TTLCache
+from utils import logger
+
+# Dashboard key -> table whose rows it counts
+COUNTED_TABLES = {
+    'user_count': 'users',
+    'course_count': 'courses_master',
+    'instance_count': 'course_instances',
+    'enrollment_count': 'enrollments',
+}
+
+_counts_cache = TTLCache(maxsize=1, ttl=int(os.getenv('DASHBOARD_STATS_TTL', 30)))
+_missing_table_logged = False
+
+
+def _counters_missing(error):
+    """True (after logging once) if ``error`` is entity_counts not existing yet."""
+    global _missing_table_logged
+    if error.args[0] != ER.NO_SUCH_TABLE:
+        return False
+    if not _missing_table_logged:
+        _missing_table_logged = True
+        logger.error("entity_counts is missing (run `flask migrate-db`); "
+                     "dashboard counts fall back to COUNT(*) until it exists")
+    return True
+
+
+def adjust_count(cursor, table, delta):
+    """Move the maintained row count for ``table`` by ``delta``.
+
+    Call it on the same cursor/transaction as the INSERT or DELETE it
+    accounts for, so a rollback undoes both, and call invalidate_counts() once
+    that transaction has committed.
+    """
+    if not delta:
+        return
+    try:
+        cursor.execute("UPDATE entity_counts SET row_count = row_count + %s WHERE table_name = %s", (delta, table))
+    except pymysql.MySQLError as e:
+        if not _counters_missing(e):
+            raise
+
+
+def invalidate_counts():
+    """Forget the cached counts in this worker; call after committing adjust_count changes."""
+    _counts_cache.clear()
+
+
+def _count_rows(cursor):
+    selects = ', '.join(f"(SELECT COUNT(*) FROM {table}) AS {key}" for key, table in COUNTED_TABLES.items())
+    cursor.execute(f"SELECT {selects}")
+    return {key: int(value) for key, value in cursor.fetchone().items()}
+
+
+def recount(db):
+    """Count every table exactly in one round trip and resync ``entity_counts``.
+
+    Commits first, then locks the counter rows before counting: a writer
+    that already adjusted a counter commits before the counts are read (and
+    is included), and one that has not waits and applies its delta on top
+    of the new values, so no adjustment is lost.
+    """
+    db.commit()
+    with db.cursor() as cursor:
+        try:
+            cursor.execute(
+                f"SELECT table_name FROM entity_counts WHERE table_name IN ({', '.join(['%s'] * len(COUNTED_TABLES))}) "
+                "FOR UPDATE",
+                tuple(COUNTED_TABLES.values())
+            )
+        except pymysql.MySQLError as e:
+            if not _counters_missing(e):
+                raise
+            counts = _count_rows(cursor)
+        else:
+            counts = _count_rows(cursor)
+            cursor.executemany(
+                "INSERT INTO entity_counts (table_name, row_count) VALUES (%s, %s) "
+                "ON DUPLICATE KEY UPDATE row_count = VALUES(row_count)",
+                [(COUNTED_TABLES[key], value) for key, value in counts.items()]
+            )
+    db.commit()
+    _counts_cache.set('counts', counts)
+    return counts
+
+
+def get_counts(db, exact=False):
+    """Dashboard counts from the cache, the maintained counters, or (``exact``) a recount."""
+    if exact:
+        return recount(db)
+    counts = _counts_cache.get('counts')
+    if counts is not None:
+        return counts
+
+    with db.cursor() as cursor:
+        try:
+            cursor.execute("SELECT table_name, row_count FROM entity_counts")
+        except pymysql.MySQLError as e:
+            if not _counters_missing(e):
+                raise
+            by_table = {}
+        else:
+            by_table = {row['table_name']: int(row['row_count']) for row in cursor.fetchall()}
+    if any(table not in by_table for table in COUNTED_TABLES.values()):
+        # Counters were never initialised, or the table does not exist yet
+        return recount(db)
+
+    counts = {key: by_table[table] for key, table in COUNTED_TABLES.items()}
+    _counts_cache.set('counts', counts)
+    return counts
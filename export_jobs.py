@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import logger
+
+
+class ExportJobQueue:
+    """Renders exports on a bounded thread pool and keeps the results on disk.
+
+    A job id is derived from (kind, target id, content fingerprint), so a
+    second submission for unchanged content maps to the job that already
+    exists instead of rendering again. Job metadata and output live in
+    ``directory`` rather than in memory so that every gunicorn worker can
+    answer status and download requests for jobs started by another.
+    """
+
+    def __init__(self, directory, max_workers=2, max_pending=50, ttl=3600, stale_after=900):
+        self.directory = directory
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.stale_after = stale_after
+        self._exporters = {}  # kind -> (render(db, target_id), fingerprint(db, target_id))
+        self._executor = None
+        self._executor_pid = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def register(self, kind, render, fingerprint):
+        self._exporters[kind] = (render, fingerprint)
+
+    @property
+    def kinds(self):
+        return sorted(self._exporters)
+
+    def _get_executor(self):
+        # Threads do not survive a fork; build the pool lazily in each worker
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='pdf-export')
+            self._executor_pid = os.getpid()
+            self._pending = 0
+        return self._executor
+
+    def _path(self, job_id, suffix):
+        return os.path.join(self.directory, f"{job_id}{suffix}")
+
+    def _write_meta(self, meta):
+        tmp = self._path(meta['job_id'], f'.json.{os.getpid()}.{threading.get_ident()}')
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._path(meta['job_id'], '.json'))
+
+    def get(self, job_id):
+        if len(job_id) != 32 or not all(c in '0123456789abcdef' for c in job_id):
+            return None
+        try:
+            with open(self._path(job_id, '.json')) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def output_path(self, job_id):
+        return self._path(job_id, '.pdf')
+
+    def _reusable(self, meta):
+        if meta is None or meta['status'] == 'failed':
+            return False
+        if meta['status'] == 'done':
+            return os.path.exists(self.output_path(meta['job_id']))
+        # queued/running: reuse unless the worker that owned it went away
+        return time.time() - meta['updated_at'] < self.stale_after
+
+    def submit(self, db, kind, target_id):
+        """Queue an export, or attach to an existing job for the same content.
+
+        Returns (job metadata, attached). Raises KeyError for an unknown kind,
+        LookupError if the target does not exist and OverflowError when the
+        queue is full.
+        """
+        render, fingerprint = self._exporters[kind]
+        version = fingerprint(db, target_id)
+        if version is None:
+            raise LookupError(f"{kind} {target_id} not found")
+        job_id = hashlib.sha256(f"{kind}:{target_id}:{version}".encode('utf-8')).hexdigest()[:32]
+
+        os.makedirs(self.directory, exist_ok=True)
+        self.prune()
+        with self._lock:
+            meta = self.get(job_id)
+            if self._reusable(meta):
+                return meta, True
+            if self._pending >= self.max_pending:
+                raise OverflowError('Too many export jobs in progress, try again shortly')
+            now = time.time()
+            meta = {
+                'job_id': job_id, 'kind': kind, 'target_id': target_id, 'status': 'queued',
+                'progress': 0, 'filename': None, 'error': None, 'size': None,
+                'created_at': now, 'updated_at': now, 'finished_at': None,
+            }
+            self._write_meta(meta)
+            executor = self._get_executor()
+            self._pending += 1
+        executor.submit(self._run, dict(meta), render)
+        return meta, False
+
+    def _run(self, meta, render):
+        from init_db import pool
+        conn = None
+        try:
+            meta.update(status='running', progress=10, updated_at=time.time())
+            self._write_meta(meta)
+            conn = pool.acquire()
+            pdf, filename = render(conn, meta['target_id'])
+
+            tmp = self._path(meta['job_id'], f'.pdf.{os.getpid()}')
+            with open(tmp, 'wb') as f:
+                f.write(pdf)
+            os.replace(tmp, self.output_path(meta['job_id']))
+            meta.update(status='done', progress=100, filename=filename, size=len(pdf))
+        except Exception as e:
+            logger.error(f"Export job {meta['job_id']} ({meta['kind']} {meta['target_id']}) failed: {e}")
+            meta.update(status='failed', error=str(e))
+        finally:
+            if conn is not None:
+                pool.release(conn, discard=not conn.open)
+            meta.update(updated_at=time.time(), finished_at=time.time())
+            self._write_meta(meta)
+            with self._lock:
+                self._pending -= 1
+
+    def prune(self):
+        """Delete finished jobs (and their files) older than ``ttl`` seconds."""
+        cutoff = time.time() - self.ttl
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return 0
+        removed = 0
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            meta = self.get(name[:-5])
+            if meta and meta['status'] in ('done', 'failed') and meta['updated_at'] < cutoff:
+                for suffix in ('.pdf', '.json'):
+                    try:
+                        os.remove(self._path(meta['job_id'], suffix))
+                    except FileNotFoundError:
+                        pass
+                removed += 1
+        return removed
+
+
+export_jobs = ExportJobQueue(
+    directory=os.getenv('PDF_EXPORT_DIR', os.path.join(tempfile.gettempdir(), 'lms_pdf_exports')),
+    max_workers=int(os.getenv('PDF_EXPORT_WORKERS', 2)),
+    max_pending=int(os.getenv('PDF_EXPORT_MAX_PENDING', 50)),
+    ttl=int(os.getenv('PDF_EXPORT_TTL', 3600)),
+)
@@ -7,6 +7,8 @@ from dotenv import load_dotenv
 import os
 
 from init_db import get_db, init_app
+from metrics import init_metrics
+from token_blocklist import blocklist
 
 
 authorizations ={
@@ -27,6 +29,7 @@ def create_app():
 
     app.config["RESTX_MASK_SWAGGER"] = False
     init_app(app)
+    init_metrics(app)
     api = Api(app,
               doc='/docs' ,
               authorizations=authorizations,
@@ -109,34 +112,44 @@ For the API key generation and other endpoints, they uses cookie-based JWT authe
     app.config["JWT_REFRESH_CSRF_COOKIE_NAME"] = "csrf_refresh_token"
     app.config['JWT_ALGORITHM'] = 'HS256'
 
+    # Keys the API key lookup digest (utils.api_key_digest); deliberately not SECRET_KEY
+    if not os.getenv('API_KEY_PEPPER'):
+        raise RuntimeError("API_KEY_PEPPER is not set; generate a random secret for API key lookups")
+
     #ROUTES IMPORTS
     from routes.auth import auth_bp
     from routes.views import views
-    from routes.courses import courses_ns
+    from routes.courses import courses_bp
     from routes.assessment_scopes import assessment_scopes_ns
-    from routes.course_instructors import course_instructors_ns
-    from routes.exam_types import exam_types_ns
-    from routes.modules import modules_ns
+    from routes.course_instructors import course_instructors_bp
+    from routes.exam_types import exam_types_bp
+    from routes.instances import instances_bp
+    from routes.modules import modules_bp
+    from routes.modules_ai import modules_ai_bp
     from routes.assessment_preview import assessment_preview_ns
-    from routes.dashboard import dashboard_ns
-    from routes.enrollments import enrollments_ns
-    from routes.database import database_ns
-    from routes.users import users_ns
+    from routes.dashboard import dashboard_bp
+    from routes.enrollments import enrollments_bp
+    from routes.database import database_bp
+    from routes.users import users_bp
     from routes.api_key import api_key_ns
 
     #BLUEPRINTS & NAMESPACES
+    # Only assessment_scopes, assessment_preview and api_key have been ported to
+    # flask_restx namespaces; the other route modules still define blueprints.
     app.register_blueprint(views)
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
-    api.add_namespace(courses_ns, path='/api/courses')
+    app.register_blueprint(courses_bp, url_prefix='/api/courses')
     api.add_namespace(assessment_scopes_ns, path='/api/assessment_scopes')
-    api.add_namespace(course_instructors_ns, path='/api/course_instructors')
-    api.add_namespace(exam_types_ns, path='/api/exam_types')
-    api.add_namespace(modules_ns, path='/api/modules')
+    app.register_blueprint(course_instructors_bp, url_prefix='/api/course_instructors')
+    app.register_blueprint(exam_types_bp, url_prefix='/api/exam_types')
+    app.register_blueprint(instances_bp, url_prefix='/api/instances')
+    app.register_blueprint(modules_bp, url_prefix='/api/modules')
+    app.register_blueprint(modules_ai_bp, url_prefix='/api/modules')
     api.add_namespace(assessment_preview_ns, path='/api/assessment_preview')
-    api.add_namespace(dashboard_ns, path='/api/dashboard')
-    api.add_namespace(enrollments_ns, path='/api/enrollments')
-    api.add_namespace(database_ns, path='/api/database')
-    api.add_namespace(users_ns, path='/api/users')
+    app.register_blueprint(dashboard_bp, url_prefix='/api/dashboard')
+    app.register_blueprint(enrollments_bp, url_prefix='/api/enrollments')
+    app.register_blueprint(database_bp, url_prefix='/api/database')
+    app.register_blueprint(users_bp, url_prefix='/api/users')
     api.add_namespace(api_key_ns, path='/api/api_key')
 
     # Initialize JWT Manager
@@ -145,10 +158,7 @@ For the API key generation and other endpoints, they uses cookie-based JWT authe
     def check_if_token_revoked(jwt_header, jwt_payload):
         jti = jwt_payload.get("jti")
         try:
-            db = get_db()
-            with db.cursor() as cur:
-                cur.execute("SELECT 1 FROM token_blocklist WHERE jti = %s", (jti,))
-            return cur.fetchone() is not None
+            return blocklist.is_revoked(jti, get_db)
         except:
             return True  # fail-safe: block token if DB fails
 
@@ -1,8 +1,11 @@
 import os
+import click
 import pymysql
-from flask import g
+from flask import g, request
 from dotenv import load_dotenv
 from utils import logger
+from db_pool import ConnectionPool
+from db_stats import InstrumentedConnection, QueryStats
 # Load environment variables
 load_dotenv()
 
@@ -13,19 +16,44 @@ DB_USER = os.getenv("DB_USER")
 DB_PASSWORD = os.getenv("DB_PASSWORD")
 DB_NAME = os.getenv("DB_NAME")
 
+# Connection pool sizing (per worker process)
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", 1))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", 10))
+DB_POOL_OVERFLOW = int(os.getenv("DB_POOL_OVERFLOW", 5))
+DB_POOL_IDLE_TIMEOUT = int(os.getenv("DB_POOL_IDLE_TIMEOUT", 300))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 10))
+
+# Per-request query instrumentation (off by default)
+DB_QUERY_STATS = os.getenv("DB_QUERY_STATS", "0") == "1"
+DB_N_PLUS_ONE_THRESHOLD = int(os.getenv("DB_N_PLUS_ONE_THRESHOLD", 10))
+
+pool = ConnectionPool(
+    dict(
+        host=DB_HOST,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        database=DB_NAME,
+        port=DB_PORT,
+        cursorclass=pymysql.cursors.DictCursor,
+        charset='utf8mb4',
+    ),
+    min_size=DB_POOL_MIN,
+    max_size=DB_POOL_MAX,
+    overflow=DB_POOL_OVERFLOW,
+    idle_timeout=DB_POOL_IDLE_TIMEOUT,
+    checkout_timeout=DB_POOL_TIMEOUT,
+)
+
 # Make connection
 def get_db():
     if "db" not in g:
         try:
-            g.db = pymysql.connect(
-                host=DB_HOST,
-                user=DB_USER,
-                password=DB_PASSWORD,
-                database=DB_NAME,
-                port=DB_PORT,
-                cursorclass=pymysql.cursors.DictCursor,
-                charset='utf8mb4',
-            )
+            conn = pool.acquire()
+            if DB_QUERY_STATS:
+                if "query_stats" not in g:
+                    g.query_stats = QueryStats(DB_N_PLUS_ONE_THRESHOLD)
+                conn = InstrumentedConnection(conn, g.query_stats)
+            g.db = conn
         except pymysql.MySQLError as e:
             print(f"MySQL connection error: {e}")
             g.db = None
@@ -33,10 +61,31 @@ def get_db():
     return g.db
 
 def close_db(e=None):
-    """Close the database connection at the end of request if it exists."""
+    """Return the database connection to the pool at the end of request if it exists."""
     db = g.pop("db", None)
     if db is not None:
-        db.close()
+        db = getattr(db, "raw", db)
+        pool.release(db, discard=not db.open)
+
+def get_pool_stats():
+    """Snapshot of the connection pool counters for this worker."""
+    return pool.stats()
+
+def add_query_stats_header(response):
+    """Report this request's query count/time and any N+1 statement shapes."""
+    stats = g.get("query_stats")
+    if stats is None:
+        return response
+    response.headers["X-DB-Queries"] = stats.header_value()
+    suspects = stats.n_plus_one()
+    if suspects:
+        response.headers["X-DB-N-Plus-One"] = "; ".join(f"{n}x {shape[:80]}" for shape, n in suspects[:3])
+        for shape, n in suspects:
+            logger.warning(f"Possible N+1 on {request.method} {request.path}: {n}x {shape[:200]}")
+    logger.debug(
+        f"{request.method} {request.path} db {stats.header_value()} slowest_sql={(stats.slowest_sql or '')[:200]}"
+    )
+    return response
 
 def init_db():
     """Initialize the database using schema from db_init.sql."""
@@ -54,12 +103,189 @@ def init_db():
                 cursor.execute(stmt)
     db.commit()
 
+def _column_exists(cursor, table, column):
+    cursor.execute("""
+        SELECT COUNT(*) AS count FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+    """, (table, column))
+    return cursor.fetchone()['count'] > 0
+
+def _index_exists(cursor, table, index):
+    cursor.execute("""
+        SELECT COUNT(*) AS count FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+    """, (table, index))
+    return cursor.fetchone()['count'] > 0
+
+def migrate_api_keys(cursor):
+    """Add the indexed key_digest column used for direct API key lookup.
+
+    Existing keys keep a NULL digest. With API_KEY_LEGACY_SCAN=1,
+    api_key_required backfills it the first time each key is presented;
+    otherwise those keys are rejected until they are reissued.
+    """
+    if not _column_exists(cursor, 'api_keys', 'key_digest'):
+        cursor.execute("ALTER TABLE api_keys ADD COLUMN key_digest CHAR(64) NULL AFTER api_key")
+    if not _index_exists(cursor, 'api_keys', 'idx_api_keys_key_digest'):
+        cursor.execute("CREATE UNIQUE INDEX idx_api_keys_key_digest ON api_keys (key_digest)")
+    cursor.execute("SELECT COUNT(*) AS count FROM api_keys WHERE key_digest IS NULL")
+    legacy = cursor.fetchone()['count']
+    if legacy and os.getenv('API_KEY_LEGACY_SCAN', '0') != '1':
+        return f"{legacy} legacy API key(s) have no digest; set API_KEY_LEGACY_SCAN=1 to backfill them on first use"
+    return f"{legacy} legacy API key(s) will be backfilled on first use"
+
+def migrate_token_blocklist(cursor):
+    """Columns/indexes for the incremental blocklist sync and expiry prune."""
+    if not _column_exists(cursor, 'token_blocklist', 'created_at'):
+        cursor.execute("ALTER TABLE token_blocklist ADD COLUMN created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP")
+    if not _index_exists(cursor, 'token_blocklist', 'idx_token_blocklist_created_at'):
+        cursor.execute("CREATE INDEX idx_token_blocklist_created_at ON token_blocklist (created_at)")
+    if not _index_exists(cursor, 'token_blocklist', 'idx_token_blocklist_expires_at'):
+        cursor.execute("CREATE INDEX idx_token_blocklist_expires_at ON token_blocklist (expires_at)")
+    return "token_blocklist ready"
+
+def migrate_enrollments(cursor):
+    """Index backing keyset pagination of GET /api/enrollments by created_at."""
+    if not _index_exists(cursor, 'enrollments', 'idx_enrollments_created_at_id'):
+        cursor.execute("CREATE INDEX idx_enrollments_created_at_id ON enrollments (created_at, enrollment_id)")
+    return "enrollments ready"
+
+def migrate_entity_counts(cursor):
+    """Maintained row counts for the dashboard, initialised from COUNT(*)."""
+    from entity_counts import COUNTED_TABLES
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS entity_counts (
+            table_name VARCHAR(64) NOT NULL PRIMARY KEY,
+            row_count BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        )
+    """)
+    for table in COUNTED_TABLES.values():
+        cursor.execute(f"""
+            INSERT INTO entity_counts (table_name, row_count)
+            SELECT %s, COUNT(*) FROM {table}
+            ON DUPLICATE KEY UPDATE row_count = VALUES(row_count)
+        """, (table,))
+    return "entity_counts synced"
+
+def migrate_question_pool_versions(cursor):
+    """Per-course version counters checked before reusing a cached question pool."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS question_pool_versions (
+            course_id INT NOT NULL PRIMARY KEY,
+            version BIGINT UNSIGNED NOT NULL DEFAULT 0
+        )
+    """)
+    return "question_pool_versions ready"
+
+def migrate_module_meta(cursor, batch_size=500):
+    """Stored module title/description, backfilled by parsing existing content_html."""
+    from module_meta import parse_module_html
+    if not _column_exists(cursor, 'modules_master', 'module_title'):
+        cursor.execute("ALTER TABLE modules_master ADD COLUMN module_title VARCHAR(255) NULL AFTER position")
+    if not _column_exists(cursor, 'modules_master', 'module_description'):
+        cursor.execute("ALTER TABLE modules_master ADD COLUMN module_description TEXT NULL AFTER module_title")
+
+    backfilled = 0
+    last_id = 0
+    while True:
+        cursor.execute("""
+            SELECT module_id, content_html FROM modules_master
+            WHERE module_title IS NULL AND module_id > %s
+            ORDER BY module_id LIMIT %s
+        """, (last_id, batch_size))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        cursor.executemany(
+            "UPDATE modules_master SET module_title = %s, module_description = %s WHERE module_id = %s",
+            [(*parse_module_html(row['content_html']), row['module_id']) for row in rows]
+        )
+        backfilled += len(rows)
+        last_id = rows[-1]['module_id']
+    return f"module_title/module_description ready ({backfilled} backfilled)"
+
+def migrate_api_key_revocations(cursor):
+    """Log of API key deletions / user changes replayed into every worker's key cache."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS api_key_revocations (
+            revocation_id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+            api_key_id INT NULL,
+            user_id INT NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            INDEX idx_api_key_revocations_created_at (created_at)
+        )
+    """)
+    return "api_key_revocations ready"
+
+MIGRATIONS = [
+    migrate_api_keys,
+    migrate_token_blocklist,
+    migrate_enrollments,
+    migrate_entity_counts,
+    migrate_module_meta,
+    migrate_question_pool_versions,
+    migrate_api_key_revocations,
+]
+
+def migrate_db():
+    """Apply the idempotent schema migrations in order."""
+    db = get_db()
+    results = []
+    with db.cursor() as cursor:
+        for migration in MIGRATIONS:
+            results.append((migration.__name__, migration(cursor)))
+    db.commit()
+    return results
+
 def init_app(app):
     """Register database functions with the Flask app."""
     app.teardown_appcontext(close_db)
+    if DB_QUERY_STATS:
+        app.after_request(add_query_stats_header)
+
+    # Warm up the pool so the first requests skip the connect handshake
+    try:
+        pool.fill()
+    except pymysql.MySQLError as e:
+        logger.warning(f"Could not pre-fill database pool: {e}")
 
     @app.cli.command("init-db")
     def init_db_command():
         """Clear existing data and create new tables."""
         init_db()
         logger.info("MySQL database initialized successfully!")
+
+    @app.cli.command("migrate-db")
+    def migrate_db_command():
+        """Apply schema migrations (API key digests, token blocklist indexes, stored module titles)."""
+        for name, result in migrate_db():
+            logger.info(f"{name}: {result}")
+
+    @app.cli.command("seed-db")
+    @click.option("--scale", type=int, default=1, show_default=True,
+                  help="Dataset size; each unit is 1000 students and ~5000 enrollments.")
+    @click.option("--seed", type=int, default=42, show_default=True, help="Random seed for reproducible data.")
+    @click.option("--batch-size", type=int, default=5000, show_default=True, help="Rows per INSERT/LOAD DATA batch.")
+    @click.option("--load-data", is_flag=True, help="Use LOAD DATA LOCAL INFILE instead of multi-row INSERTs.")
+    def seed_db_command(scale, seed, batch_size, load_data):
+        """Bulk-generate synthetic users, courses, enrollments and activity data."""
+        from seed_db import LoadDataWriter, MultiRowWriter, open_load_data_connection, seed_db
+
+        if load_data:
+            conn = open_load_data_connection(pool.connect_kwargs)
+            try:
+                counts = seed_db(conn, LoadDataWriter(conn, batch_size), scale=scale, seed=seed)
+            finally:
+                conn.close()
+        else:
+            db = get_db()
+            counts = seed_db(db, MultiRowWriter(db, batch_size), scale=scale, seed=seed)
+        logger.info(f"seed-db finished: {counts}")
+
+        # Bulk rows bypass the maintained dashboard counters; resync them
+        from entity_counts import recount
+        try:
+            recount(get_db())
+        except pymysql.MySQLError as e:
+            logger.warning(f"Could not resync entity_counts (run migrate-db): {e}")
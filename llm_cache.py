@@ -0,0 +1,203 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+from cache import TTLCache
+from utils import logger
+
+
+def normalize_prompt(prompt):
+    """Collapse whitespace so prompts that differ only in indentation or line breaks share an entry."""
+    return ' '.join(prompt.split())
+
+
+class LLMCache:
+    """Two-tier cache of model completions keyed by (provider, model, normalized prompt, temperature).
+
+    The memory tier is a per-worker TTLCache; the disk tier is one JSON file
+    per key in ``directory``, shared by every gunicorn worker and surviving
+    restarts. Only calls at or below ``max_temperature`` are cached by default:
+    a sampled completion is not a property of the prompt, so callers must opt
+    in (``opt_in=True``) when any previous answer will do.
+
+    Each entry remembers the tokens and seconds its original call cost, so a
+    hit can be reported as tokens and latency saved.
+
+    The disk tier is swept every ``evict_every`` writes of this worker rather
+    than on each one, so it can briefly hold up to that many entries per
+    worker beyond ``max_disk_entries``.
+    """
+
+    def __init__(self, directory, maxsize=512, ttl=86400, max_disk_entries=5000, max_temperature=0.0,
+                 evict_every=100):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_disk_entries = max_disk_entries
+        self.max_temperature = max_temperature
+        self.evict_every = max(1, evict_every)
+        self._memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.tokens_saved = 0
+        self.seconds_saved = 0.0
+        self.evictions = 0
+
+    def enabled_for(self, temperature, opt_in=False):
+        return opt_in or temperature <= self.max_temperature
+
+    @staticmethod
+    def key(provider, model, prompt, temperature):
+        raw = json.dumps([provider, model, normalize_prompt(prompt), round(float(temperature), 3)])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _read_disk(self, key):
+        try:
+            with open(self._path(key)) as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if entry.get('created_at', 0) < time.time() - self.ttl:
+            return None
+        return entry
+
+    def _record_hit(self, entry, tier):
+        with self._lock:
+            if tier == 'memory':
+                self.memory_hits += 1
+            else:
+                self.disk_hits += 1
+            self.tokens_saved += entry.get('tokens') or 0
+            self.seconds_saved += entry.get('seconds') or 0.0
+
+    def get(self, provider, model, prompt, temperature, opt_in=False):
+        """The cached completion for this call, or None (also when the call is not cacheable)."""
+        if not self.enabled_for(temperature, opt_in):
+            with self._lock:
+                self.bypassed += 1
+            return None
+        key = self.key(provider, model, prompt, temperature)
+        entry = self._memory.get(key)
+        if entry is not None:
+            self._record_hit(entry, 'memory')
+            return entry['text']
+        entry = self._read_disk(key)
+        if entry is not None:
+            self._memory.set(key, entry)
+            self._record_hit(entry, 'disk')
+            return entry['text']
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, provider, model, prompt, temperature, text, tokens=None, seconds=None, opt_in=False):
+        """Remember a completion; ``tokens``/``seconds`` are what the call cost."""
+        if not text or not self.enabled_for(temperature, opt_in):
+            return
+        key = self.key(provider, model, prompt, temperature)
+        entry = {'text': text, 'tokens': tokens, 'seconds': seconds, 'created_at': time.time()}
+        self._memory.set(key, entry)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, 'w') as f:
+                json.dump(entry, f)
+            os.replace(tmp, self._path(key))
+            with self._lock:
+                self._writes += 1
+                due = self._writes >= self.evict_every
+                if due:
+                    self._writes = 0
+            if due:
+                self._evict()
+        except OSError as e:
+            # The disk tier is an optimisation; keep serving from memory
+            logger.warning(f"LLM cache disk write failed: {e}")
+
+    def _evict(self):
+        """Drop expired disk entries, then the oldest ones beyond ``max_disk_entries``."""
+        cutoff = time.time() - self.ttl
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith('.json'):
+                continue
+            try:
+                mtime = entry.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            entries.append((mtime, entry.path))
+        entries.sort()
+        excess = len(entries) - self.max_disk_entries
+        removed = 0
+        for i, (mtime, path) in enumerate(entries):
+            if mtime >= cutoff and i >= excess:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+        if removed:
+            with self._lock:
+                self.evictions += removed
+
+    def discard(self, provider, model, prompt, temperature):
+        """Forget one completion, e.g. an answer the caller could not use."""
+        key = self.key(provider, model, prompt, temperature)
+        self._memory.pop(key)
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        self._memory.clear()
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return
+        for name in names:
+            if name.endswith('.json'):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+
+    def stats(self):
+        memory = self._memory.stats()
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                'memory_entries': memory['size'],
+                'maxsize': memory['maxsize'],
+                'ttl': self.ttl,
+                'max_temperature': self.max_temperature,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'bypassed': self.bypassed,
+                'evictions': self.evictions,
+                'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+                'tokens_saved': self.tokens_saved,
+                'seconds_saved': round(self.seconds_saved, 3),
+            }
+
+
+llm_cache = LLMCache(
+    directory=os.getenv('LLM_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'lms_llm_cache')),
+    maxsize=int(os.getenv('LLM_CACHE_SIZE', 512)),
+    ttl=int(os.getenv('LLM_CACHE_TTL', 86400)),
+    max_disk_entries=int(os.getenv('LLM_CACHE_DISK_MAX_ENTRIES', 5000)),
+    max_temperature=float(os.getenv('LLM_CACHE_MAX_TEMPERATURE', 0.0)),
+    evict_every=int(os.getenv('LLM_CACHE_EVICT_EVERY', 100)),
+)
@@ -0,0 +1,254 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import Response, g, request
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{value}"' for name, value in extra]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Sharded:
+    """Per-thread storage so the hot path never takes a lock.
+
+    Each thread writes only to its own shard; the registry lock is taken once
+    per thread (to register the shard) and on scrape. Shards of threads that
+    have exited are folded into ``_retired`` so short-lived request threads
+    do not accumulate.
+    """
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards = []  # (thread, shard)
+        self._retired = {}
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def _snapshots(self):
+        with self._lock:
+            live = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    live.append((thread, shard))
+                else:
+                    self._merge(self._retired, shard.copy())
+            self._shards = live
+            snapshots = [self._retired.copy()]
+        # dict.copy() is atomic under the GIL, so owners can keep writing
+        snapshots += [shard.copy() for _, shard in live]
+        return snapshots
+
+
+class Counter(_Sharded):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    @staticmethod
+    def _merge(into, shard):
+        for key, value in shard.items():
+            into[key] = into.get(key, 0) + value
+
+    def collect(self):
+        totals = {}
+        for snapshot in self._snapshots():
+            self._merge(totals, snapshot)
+        for key, value in sorted(totals.items()):
+            yield f'{self.name}{_format_labels(self.labelnames, key)} {value}'
+
+
+class Histogram(_Sharded):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        entry = shard.get(key)
+        if entry is None:
+            # [per-bucket counts..., +Inf count, sum]
+            entry = shard[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        entry[bisect_left(self.buckets, value)] += 1
+        entry[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    @staticmethod
+    def _merge(into, shard):
+        for key, entry in shard.items():
+            total = into.get(key)
+            if total is None:
+                into[key] = list(entry)
+            else:
+                for i, value in enumerate(entry):
+                    total[i] += value
+
+    def collect(self):
+        totals = {}
+        for snapshot in self._snapshots():
+            self._merge(totals, snapshot)
+        for key, entry in sorted(totals.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), entry):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                yield f'{self.name}_bucket{_format_labels(self.labelnames, key, [("le", le)])} {cumulative}'
+            yield f'{self.name}_sum{_format_labels(self.labelnames, key)} {entry[-1]}'
+            yield f'{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}'
+
+
+class GaugeFunc:
+    """Gauge (or counter) whose samples are read from a callback at scrape time."""
+
+    def __init__(self, name, documentation, callback, labelnames=(), type='gauge'):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.labelnames = tuple(labelnames)
+        self.type = type
+
+    def collect(self):
+        for key, value in self.callback():
+            yield f'{self.name}{_format_labels(self.labelnames, key)} {value}'
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUEST_LATENCY = registry.register(Histogram(
+    'lms_http_request_duration_seconds', 'HTTP request latency by endpoint, method and status.',
+    ('endpoint', 'method', 'status'),
+))
+BCRYPT_VERIFY = registry.register(Histogram(
+    'lms_api_key_bcrypt_seconds', 'Time spent in bcrypt verification inside api_key_required.',
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.0),
+))
+PDF_RENDER = registry.register(Histogram(
+    'lms_pdf_render_seconds', 'Time spent building PDF exports.', ('exporter',),
+))
+AI_LATENCY = registry.register(Histogram(
+    'lms_ai_request_seconds', 'Latency of calls to AI providers.', ('provider', 'outcome'),
+    buckets=(0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0),
+))
+AI_FIRST_TOKEN = registry.register(Histogram(
+    'lms_ai_first_token_seconds', 'Time from a streaming AI call to its first piece of text.', ('provider',),
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0),
+))
+AI_CALLS = registry.register(Counter(
+    'lms_ai_calls_total', 'AI provider attempts by outcome (ok, retry, error, circuit_open).', ('provider', 'outcome'),
+))
+AI_ERRORS = registry.register(Counter(
+    'lms_ai_errors_total', 'AI provider failures by error code or exception type.', ('provider', 'error'),
+))
+
+
+def _pool_samples(*keys):
+    def collect():
+        from init_db import get_pool_stats
+        stats = get_pool_stats()
+        return [((key,), stats[key]) for key in keys]
+    return collect
+
+
+registry.register(GaugeFunc(
+    'lms_db_pool_connections', 'Database pool connections by state.',
+    _pool_samples('in_use', 'idle'), labelnames=('state',),
+))
+registry.register(GaugeFunc(
+    'lms_db_pool_events_total', 'Database pool lifecycle events.',
+    _pool_samples('created', 'closed', 'checkouts', 'waits', 'timeouts'), labelnames=('event',), type='counter',
+))
+
+
+def _circuit_samples():
+    from ai_providers import providers
+    return [((name,), int(provider.breaker.state != 'closed')) for name, provider in sorted(providers.items())]
+
+
+registry.register(GaugeFunc(
+    'lms_ai_circuit_open', 'Whether the circuit breaker of an AI provider is open (1) or closed (0).',
+    _circuit_samples, labelnames=('provider',),
+))
+
+
+def _start_timer():
+    g.metrics_started = time.perf_counter()
+
+
+def _record_request(response):
+    started = g.pop('metrics_started', None)
+    if started is not None:
+        REQUEST_LATENCY.observe(
+            time.perf_counter() - started,
+            # Unmatched URLs share one label so 404 scans cannot blow up cardinality
+            endpoint=request.endpoint or 'unmatched',
+            method=request.method,
+            status=response.status_code,
+        )
+    return response
+
+
+def metrics_view():
+    token = os.getenv('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
+def init_metrics(app):
+    """Time every request and expose the registry on ``/metrics``."""
+    app.before_request(_start_timer)
+    app.after_request(_record_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
@@ -0,0 +1,34 @@
+import re
+
+from bs4 import BeautifulSoup
+
+_WHITESPACE = re.compile(r'\s+')
+TITLE_MAX_LENGTH = 255
+
+
+def parse_module_html(content_html):
+    """(title, description) of a module from its ``content_html``; either may be ''.
+
+    The title is the <h2> text (or the first line of text when there is no
+    <h2>); the description is the text of ``div.module-description``. These
+    are stored in modules_master.module_title/module_description whenever
+    content_html is written, so readers never need to parse the HTML.
+    """
+    if not content_html:
+        return '', ''
+    soup = BeautifulSoup(content_html, 'html.parser')
+    title_elem = soup.find('h2')
+    if title_elem:
+        title = title_elem.get_text()
+    else:
+        text = soup.get_text().strip()
+        title = text.split('\n')[0] if text else ''
+    desc_elem = soup.find('div', class_='module-description')
+    description = desc_elem.get_text() if desc_elem else ''
+    title = _WHITESPACE.sub(' ', title).strip()[:TITLE_MAX_LENGTH]
+    return title, _WHITESPACE.sub(' ', description).strip()
+
+
+def display_title(title, position):
+    """Display title for a module, falling back to "Module <position>" when none is stored."""
+    return title or f"Module {position}"
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+from utils import logger
+
+
+class PdfCache:
+    """On-disk cache of rendered PDFs keyed by (kind, target id, content version).
+
+    Because the key carries the content version, an edited module can never
+    be served from a stale entry; ``invalidate`` only frees the disk early.
+    Entries are evicted least-recently-used first (by file mtime, which a hit
+    refreshes) once the directory exceeds ``max_bytes``.
+    """
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def etag(version):
+        return hashlib.sha256(version.encode('utf-8')).hexdigest()[:32]
+
+    def _path(self, kind, target_id, etag, suffix):
+        return os.path.join(self.directory, f"{kind}-{target_id}-{etag}{suffix}")
+
+    def get(self, kind, target_id, etag):
+        """Return (pdf_path, download_name) for a cached render, or None."""
+        path = self._path(kind, target_id, etag, '.pdf')
+        try:
+            with open(self._path(kind, target_id, etag, '.json')) as f:
+                filename = json.load(f)['filename']
+            os.utime(path)  # mark as recently used for LRU eviction
+        except (FileNotFoundError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path, filename
+
+    def put(self, kind, target_id, etag, pdf, filename):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(kind, target_id, etag, '.pdf')
+        suffix = f'.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(path + suffix, 'wb') as f:
+            f.write(pdf)
+        os.replace(path + suffix, path)
+        meta_path = self._path(kind, target_id, etag, '.json')
+        with open(meta_path + suffix, 'w') as f:
+            json.dump({'filename': filename}, f)
+        os.replace(meta_path + suffix, meta_path)
+        self._evict()
+        return path
+
+    def _remove(self, pdf_path):
+        for path in (pdf_path, pdf_path[:-4] + '.json'):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def invalidate(self, kind, target_id):
+        """Drop every cached version of one export target; returns the count removed."""
+        prefix = f"{kind}-{target_id}-"
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return 0
+        removed = 0
+        for name in names:
+            if name.startswith(prefix) and name.endswith('.pdf'):
+                self._remove(os.path.join(self.directory, name))
+                removed += 1
+        return removed
+
+    def _entries(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.pdf'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _evict(self):
+        with self._lock:
+            entries = self._entries()
+            total = sum(size for _, size, _ in entries)
+            if total <= self.max_bytes:
+                return
+            for _, size, path in sorted(entries):
+                self._remove(path)
+                self.evictions += 1
+                total -= size
+                if total <= self.max_bytes:
+                    break
+        logger.info(f"PDF cache evicted down to {total} bytes")
+
+    def stats(self):
+        try:
+            entries = self._entries()
+        except FileNotFoundError:
+            entries = []
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(entries),
+                'bytes': sum(size for _, size, _ in entries),
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+pdf_cache = PdfCache(
+    directory=os.getenv('PDF_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'lms_pdf_cache')),
+    max_bytes=int(os.getenv('PDF_CACHE_MAX_MB', 512)) * 1024 * 1024,
+)
@@ -0,0 +1,229 @@
+import io
+import re
+from functools import lru_cache
+from xml.sax.saxutils import escape
+
+from bs4 import BeautifulSoup, NavigableString
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Spacer
+
+from metrics import PDF_RENDER
+
+__all__ = ['PageBreak', 'Paragraph', 'Spacer', 'escape', 'get_styles', 'html_to_flowables',
+           'html_to_markup', 'build_pdf']
+
+_BLANK_LINE = re.compile(r'\n\s*\n')
+_WHITESPACE = re.compile(r'\s+')
+_HEADINGS = frozenset(('h1', 'h2', 'h3', 'h4', 'h5', 'h6'))
+_BLOCKS = frozenset(('p', 'div', 'section', 'article', 'blockquote', 'ul', 'ol', 'li', 'pre', 'table', 'tr')) | _HEADINGS
+_INLINE_TAGS = {'b': 'b', 'strong': 'b', 'i': 'i', 'em': 'i', 'u': 'u', 'sub': 'sub', 'sup': 'super'}
+
+
+@lru_cache(maxsize=None)
+def get_styles():
+    """The process-wide style registry: reportlab's sample sheet plus every exporter style."""
+    styles = getSampleStyleSheet()
+    add = styles.add
+
+    # Single-module export
+    add(ParagraphStyle('EnhancedTitleStyle', parent=styles['Title'], fontSize=24, spaceAfter=30, alignment=TA_CENTER,
+                       textColor=colors.HexColor('#1a365d'), fontName='Helvetica-Bold'))
+    add(ParagraphStyle('EnhancedCourseStyle', parent=styles['Heading1'], fontSize=18, spaceAfter=20,
+                       alignment=TA_CENTER, textColor=colors.HexColor('#2d3748'), fontName='Helvetica-Bold'))
+    add(ParagraphStyle('EnhancedModuleHeaderStyle', parent=styles['Heading1'], fontSize=20, spaceAfter=25,
+                       spaceBefore=15, textColor=colors.HexColor('#2b6cb0'), fontName='Helvetica-Bold',
+                       borderWidth=2, borderColor=colors.HexColor('#2b6cb0'), borderPadding=10,
+                       backColor=colors.HexColor('#ebf8ff')))
+    add(ParagraphStyle('EnhancedSectionHeaderStyle', parent=styles['Heading2'], fontSize=16, spaceAfter=15,
+                       spaceBefore=20, textColor=colors.HexColor('#2d3748'), fontName='Helvetica-Bold',
+                       leftIndent=20, borderWidth=1, borderColor=colors.HexColor('#e2e8f0'), borderPadding=8,
+                       backColor=colors.HexColor('#f7fafc')))
+    add(ParagraphStyle('EnhancedContentStyle', parent=styles['Normal'], fontSize=11, spaceAfter=12, leftIndent=30,
+                       rightIndent=20, textColor=colors.HexColor('#2d3748'), fontName='Helvetica'))
+    add(ParagraphStyle('EnhancedCodeStyle', parent=styles['Code'], fontName='Courier', fontSize=9, leftIndent=40,
+                       spaceAfter=2))
+    add(ParagraphStyle('EnhancedActivityStyle', parent=styles['Normal'], fontSize=11, spaceAfter=12, leftIndent=30,
+                       rightIndent=20, textColor=colors.HexColor('#2d3748'), fontName='Helvetica',
+                       backColor=colors.HexColor('#fffbeb'), borderWidth=1, borderColor=colors.HexColor('#f59e0b'),
+                       borderPadding=10))
+
+    # Course export
+    add(ParagraphStyle('CustomTitle', parent=styles['Heading1'], fontSize=24, spaceAfter=30))
+    add(ParagraphStyle('CustomHeading', parent=styles['Heading2'], fontSize=18, spaceAfter=20))
+    add(ParagraphStyle('CustomSubHeading', parent=styles['Heading3'], fontSize=14, spaceAfter=12))
+    add(ParagraphStyle('CodeBlock', parent=styles['Code'], fontName='Courier', fontSize=9, leftIndent=20,
+                       spaceAfter=2))
+
+    # Exam item exports (the all-modules variant uses the larger title sizes)
+    for suffix, title_size, course_size in (('', 18, 14), ('Large', 20, 16)):
+        add(ParagraphStyle(f'ExamTitle{suffix}', parent=styles['Heading1'], fontSize=title_size, spaceAfter=30,
+                           alignment=TA_CENTER, textColor=colors.HexColor('#2c3e50')))
+        add(ParagraphStyle(f'ExamCourse{suffix}', parent=styles['Heading2'], fontSize=course_size, spaceAfter=20,
+                           alignment=TA_CENTER, textColor=colors.HexColor('#34495e')))
+    add(ParagraphStyle('ExamModule', parent=styles['Heading1'], fontSize=16, spaceAfter=15,
+                       textColor=colors.HexColor('#e74c3c'), borderWidth=2, borderColor=colors.HexColor('#e74c3c'),
+                       borderPadding=10, backColor=colors.HexColor('#fdf2f2')))
+    add(ParagraphStyle('ExamSection', parent=styles['Heading2'], fontSize=14, spaceAfter=12,
+                       textColor=colors.HexColor('#2980b9')))
+    add(ParagraphStyle('ExamQuestion', parent=styles['Normal'], fontSize=11, spaceAfter=8, leftIndent=20,
+                       fontName='Helvetica-Bold'))
+    add(ParagraphStyle('ExamOption', parent=styles['Normal'], fontSize=10, spaceAfter=4, leftIndent=40))
+    add(ParagraphStyle('ExamAnswer', parent=styles['Normal'], fontSize=10, spaceAfter=15, leftIndent=40,
+                       textColor=colors.HexColor('#27ae60'), fontName='Helvetica-Bold'))
+    return styles
+
+
+def _inline(node):
+    """Paragraph markup for the inline content of ``node``; text is XML-escaped."""
+    if isinstance(node, NavigableString):
+        return escape(_WHITESPACE.sub(' ', str(node))) if type(node) is NavigableString else ''
+    if node.name == 'br':
+        return '<br/>'
+    inner = ''.join(_inline(child) for child in node.children)
+    if not inner.strip():
+        return inner
+    if node.name in _INLINE_TAGS:
+        tag = _INLINE_TAGS[node.name]
+        return f'<{tag}>{inner}</{tag}>'
+    if node.name == 'code':
+        return f'<font face="Courier">{inner}</font>'
+    return inner
+
+
+def _trim(markup):
+    markup = markup.strip()
+    while markup.startswith('<br/>'):
+        markup = markup[5:].lstrip()
+    while markup.endswith('<br/>'):
+        markup = markup[:-5].rstrip()
+    return markup
+
+
+class _Converter:
+    """Walks parsed HTML once, emitting (kind, markup) blocks.
+
+    ``kind`` is 'body', 'heading', 'item' or 'code'; callers map the kinds
+    to styles (or join them into one paragraph).
+    """
+
+    def __init__(self):
+        self.pending = []
+        self.blocks = []
+
+    def emit(self, kind, markup):
+        markup = _trim(markup)
+        if markup:
+            self.blocks.append((kind, markup))
+
+    def flush(self):
+        if self.pending:
+            self.emit('body', ''.join(self.pending))
+            self.pending = []
+
+    def text(self, node):
+        # Bare text keeps the "blank line starts a new paragraph" convention of plain-text content
+        for i, part in enumerate(_BLANK_LINE.split(str(node))):
+            if i:
+                self.flush()
+            self.pending.append(escape(_WHITESPACE.sub(' ', part)))
+
+    def walk(self, node):
+        for child in node.children:
+            if isinstance(child, NavigableString):
+                if type(child) is NavigableString:  # skip comments, doctypes, CDATA
+                    self.text(child)
+                continue
+            name = child.name
+            if name not in _BLOCKS:
+                self.pending.append(_inline(child))
+                continue
+            self.flush()
+            if name in _HEADINGS:
+                self.emit('heading', _inline(child))
+            elif name in ('ul', 'ol'):
+                for number, li in enumerate(child.find_all('li', recursive=False), 1):
+                    bullet = f'{number}.' if name == 'ol' else '•'
+                    self.emit('item', f'{bullet} {_inline(li)}')
+            elif name == 'pre':
+                lines = [escape(line).replace(' ', '&nbsp;') for line in child.get_text().split('\n') if line.strip()]
+                if lines:
+                    self.blocks.append(('code', lines))
+            else:
+                self.walk(child)
+                self.flush()
+        return self
+
+
+def html_to_flowables(html, body, heading=None, code=None, gap=0):
+    """Convert stored HTML (or plain text) into a list of flowables.
+
+    ``body``/``heading``/``code`` are ParagraphStyles for text, h1-h6 and
+    <pre> blocks; headings fall back to bold body text and code to the
+    shared ``CodeBlock`` style. ``gap`` adds a Spacer after each paragraph.
+    """
+    if not html:
+        return []
+    converter = _Converter().walk(BeautifulSoup(html, 'html.parser'))
+    converter.flush()
+    code = code or get_styles()['CodeBlock']
+    out = []
+    for kind, markup in converter.blocks:
+        if kind == 'code':
+            out.append(Spacer(1, 8))
+            out.extend(Paragraph(line, code) for line in markup)
+            out.append(Spacer(1, 8))
+            continue
+        if kind == 'heading' and heading is not None:
+            out.append(Paragraph(markup, heading))
+        else:
+            out.append(Paragraph(f'<b>{markup}</b>' if kind == 'heading' else markup, body))
+        if gap:
+            out.append(Spacer(1, gap))
+    return out
+
+
+def html_to_markup(html):
+    """Flatten an HTML fragment into markup for a single Paragraph, blocks separated by <br/>."""
+    if not html:
+        return ''
+    converter = _Converter().walk(BeautifulSoup(html, 'html.parser'))
+    converter.flush()
+    return '<br/>'.join('<br/>'.join(markup) if kind == 'code' else markup for kind, markup in converter.blocks)
+
+
+class _StreamedStory(list):
+    """A story list that pulls flowables from an iterator as the layout consumes them.
+
+    ``doc.build`` loops on ``len(story)`` and pops from the front, so topping
+    the buffer up in ``__len__`` keeps only a small window of flowables alive
+    at a time. The lookahead leaves room for keepWithNext grouping.
+    """
+
+    def __init__(self, flowables, lookahead=64):
+        super().__init__()
+        self._source = iter(flowables)
+        self._lookahead = lookahead
+
+    def __len__(self):
+        size = super().__len__()
+        if size < self._lookahead and self._source is not None:
+            for flowable in self._source:
+                self.append(flowable)
+                size += 1
+                if size >= self._lookahead * 2:
+                    break
+            else:
+                self._source = None
+        return size
+
+
+def build_pdf(flowables, exporter):
+    """Lay out ``flowables`` (any iterable, typically a generator) on A4 and return the PDF bytes."""
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
+    with PDF_RENDER.time(exporter=exporter):
+        doc.build(_StreamedStory(flowables))
+    return buffer.getvalue()
@@ -0,0 +1,190 @@
+import os
+import random
+
+import pymysql
+from pymysql.constants import ER
+
+from cache import TTLCache
+from module_meta import display_title
+from utils import logger
+
+# (course_id, exam_type_id) -> pool dict; see load_pool
+_pools = TTLCache(maxsize=int(os.getenv('QUESTION_POOL_CACHE_SIZE', 256)),
+                  ttl=int(os.getenv('QUESTION_POOL_TTL', 300)))
+
+ITEM_COLUMNS = ('question', 'option_a', 'option_b', 'option_c', 'option_d', 'correct_answer')
+
+_SCOPE_ROWS = '''
+        FROM assessment_scopes ascope
+        JOIN modules_master m ON ascope.module_id = m.module_id
+        JOIN module_sections ms ON m.module_id = ms.module_id
+        JOIN exam_items ei ON ms.section_id = ei.section_id
+        WHERE ascope.course_id = %s AND ascope.exam_type_id = %s
+'''
+
+
+_missing_table_logged = False
+
+
+def _versions_missing(error):
+    """True (after logging once) if ``error`` is question_pool_versions not existing yet."""
+    global _missing_table_logged
+    if error.args[0] != ER.NO_SUCH_TABLE:
+        return False
+    if not _missing_table_logged:
+        _missing_table_logged = True
+        logger.error("question_pool_versions is missing (run `flask migrate-db`); "
+                     "question pools are rebuilt on every preview until it exists")
+    return True
+
+
+def scope_version(cursor, course_id):
+    """The course's pool version: one primary-key read of question_pool_versions.
+
+    Every write that changes what a pool of the course holds bumps it through
+    invalidate_course. None when the table does not exist yet.
+    """
+    try:
+        cursor.execute("SELECT version FROM question_pool_versions WHERE course_id = %s", (int(course_id),))
+    except pymysql.MySQLError as e:
+        if _versions_missing(e):
+            return None
+        raise
+    row = cursor.fetchone()
+    return row['version'] if row else 0
+
+
+def load_pool(cursor, course_id, exam_type_id):
+    """The question pool for an assessment scope, from the cache or one id-only query.
+
+    A pool holds ``items`` as (item_id, module_id, section_id) tuples plus the
+    position/title of each module and section, so a preview can sample in
+    memory and fetch question text for the chosen items only. A cached pool
+    is only reused while the course's scope_version still matches, so writes
+    made through other workers are seen on the next read instead of after the
+    TTL. Writes made outside the app are only picked up when the TTL expires.
+    """
+    key = (int(course_id), int(exam_type_id))
+    version = scope_version(cursor, key[0])
+    pool = _pools.get(key)
+    if pool is not None and version is not None and pool['version'] == version:
+        return pool
+
+    cursor.execute(f'''
+        SELECT
+            m.module_id,
+            m.position as module_position,
+            m.module_title,
+            ms.section_id,
+            ms.title as section_title,
+            ms.position as section_position,
+            ei.item_id
+        {_SCOPE_ROWS}
+        ORDER BY m.position, ms.position
+    ''', key)
+    rows = cursor.fetchall()
+
+    modules, sections = {}, {}
+    for row in rows:
+        if row['module_id'] not in modules:
+            modules[row['module_id']] = (row['module_position'],
+                                         display_title(row['module_title'], row['module_position']))
+        sections.setdefault(row['section_id'], (row['section_position'], row['section_title']))
+
+    pool = {
+        'course_id': key[0],
+        'version': version,
+        'items': tuple((row['item_id'], row['module_id'], row['section_id']) for row in rows),
+        'modules': modules,
+        'sections': sections,
+    }
+    _pools.set(key, pool)
+    return pool
+
+
+def hydrate(cursor, pool, chosen):
+    """Question dicts for the chosen pool entries, in preview order; None if any item vanished."""
+    if not chosen:
+        return []
+    placeholders = ', '.join(['%s'] * len(chosen))
+    cursor.execute(f"SELECT item_id, {', '.join(ITEM_COLUMNS)} FROM exam_items WHERE item_id IN ({placeholders})",
+                   tuple(item_id for item_id, _, _ in chosen))
+    texts = {row['item_id']: row for row in cursor.fetchall()}
+    if len(texts) != len(chosen):
+        return None
+
+    questions = []
+    for item_id, module_id, section_id in chosen:
+        module_position, module_title = pool['modules'][module_id]
+        section_position, section_title = pool['sections'][section_id]
+        questions.append({
+            'module_id': module_id,
+            'module_position': module_position,
+            'module_title': module_title,
+            'section_id': section_id,
+            'section_title': section_title,
+            'section_position': section_position,
+            'item_id': item_id,
+            **{column: texts[item_id][column] for column in ITEM_COLUMNS},
+        })
+    questions.sort(key=lambda x: (x['module_position'], x['section_position']))
+    return questions
+
+
+def sample(pool, count):
+    return random.sample(pool['items'], count)
+
+
+def invalidate(course_id, exam_type_id):
+    """Drop one cached pool in this worker only."""
+    _pools.pop((int(course_id), int(exam_type_id)))
+
+
+def invalidate_course(cursor, course_id):
+    """Bump the course's pool version and drop its pools in this worker.
+
+    Call it on the same cursor/transaction as the write it accounts for,
+    before the commit, so no worker can cache the old rows under the new
+    version. Returns the count of local pools removed.
+    """
+    course_id = int(course_id)
+    try:
+        cursor.execute("""
+            INSERT INTO question_pool_versions (course_id, version) VALUES (%s, 1)
+            ON DUPLICATE KEY UPDATE version = version + 1
+        """, (course_id,))
+    except pymysql.MySQLError as e:
+        if not _versions_missing(e):
+            raise
+    return _pools.discard_where(lambda pool: pool['course_id'] == course_id)
+
+
+def invalidate_for_section(cursor, section_id):
+    """invalidate_course for the course that owns ``section_id``."""
+    cursor.execute("""
+        SELECT m.course_id
+        FROM module_sections s
+        JOIN modules_master m ON s.module_id = m.module_id
+        WHERE s.section_id = %s
+    """, (section_id,))
+    row = cursor.fetchone()
+    if row:
+        invalidate_course(cursor, row['course_id'])
+
+
+def invalidate_for_item(cursor, item_id):
+    """invalidate_course for the course that owns exam item ``item_id``."""
+    cursor.execute("""
+        SELECT m.course_id
+        FROM exam_items e
+        JOIN module_sections s ON e.section_id = s.section_id
+        JOIN modules_master m ON s.module_id = m.module_id
+        WHERE e.item_id = %s
+    """, (item_id,))
+    row = cursor.fetchone()
+    if row:
+        invalidate_course(cursor, row['course_id'])
+
+
+def stats():
+    return _pools.stats()
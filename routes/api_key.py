@@ -4,7 +4,7 @@ import bcrypt
 from flask import request
 from flask_restx import Namespace, Resource, fields
 from init_db import get_db
-from utils import logger
+from utils import logger, api_key_digest, api_key_cache_stats, invalidate_api_key_cache, record_api_key_revocation
 from flask_jwt_extended import get_jwt_identity, jwt_required
 
 api_key_ns = Namespace('api_key', description='API Key operations')
@@ -53,8 +53,8 @@ class GenerateApiKey(Resource):
                     api_key = f"{prefix}{secret_key}"
                     hashed = bcrypt.hashpw(api_key.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
                     cur.execute(
-                        "INSERT INTO api_keys (user_id, api_key, name, created_at) VALUES (%s, %s, %s, %s)",
-                        (user_id, hashed, name, datetime.now(timezone.utc))
+                        "INSERT INTO api_keys (user_id, api_key, key_digest, name, created_at) VALUES (%s, %s, %s, %s, %s)",
+                        (user_id, hashed, api_key_digest(api_key), name, datetime.now(timezone.utc))
                     )
                     db.commit()
                     return {'success': True, 'api_key': api_key, 'message': 'API key generated successfully'}, 200
@@ -116,12 +116,21 @@ class ApiKeyDelete(Resource):
                 if not existing:
                     return {'success': False, 'message': 'API key not found', 'error': 'API key not found'}, 404
                 cursor.execute("DELETE FROM api_keys WHERE api_key_id = %s", (api_key_id,))
+                record_api_key_revocation(cursor, api_key_id=api_key_id)
                 db.commit()
+                invalidate_api_key_cache(api_key_id=api_key_id)
                 return {'success': True, 'message': 'API key deleted successfully', 'error': None}, 200
         except Exception as e:
             logger.error(f"Error deleting API key: {e}")
             return {'success': False, 'message': 'Error deleting API key', 'error': str(e)}, 500
 
+@api_key_ns.route('/cache-stats')
+class ApiKeyCacheStats(Resource):
+    @api_key_ns.doc(description="Hit/miss counters for the verified API key cache of this worker and its revocation sync.")
+    @jwt_required()
+    def get(self):
+        return {'success': True, 'message': 'API key cache stats fetched successfully', 'data': api_key_cache_stats()}, 200
+
 @api_key_ns.route('/edit/<int:api_key_id>')
 class ApiKeyEdit(Resource):
     @api_key_ns.doc(description="Edit the name of an existing API key.",
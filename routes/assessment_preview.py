@@ -2,8 +2,7 @@ from flask import request
 from flask_restx import Namespace, Resource, fields
 from init_db import get_db
 from utils import logger,api_key_required
-from bs4 import BeautifulSoup
-import random
+import question_pool
 import traceback
 
 assessment_preview_ns = Namespace('assessment_preview', description='Assessment Preview Operations')
@@ -124,83 +123,22 @@ class GenerateAssessmentPreview(Resource):
                     return {'success': False, 'message': 'Invalid exam_type_id'}, 400
                 total_items_needed = assessment_info['total_items']
 
-                cursor.execute('''
-                    SELECT
-                        m.module_id,
-                        m.position as module_position,
-                        m.content_html,
-                        ms.section_id,
-                        ms_title as section_title,
-                        ms.position as section_position,
-                        ei.item_id,
-                        ei.question,
-                        ei.option_a,
-                        ei.option_b,
-                        ei.option_c,
-                        ei.option_d,
-                        ei.correct_answer
-                    FROM assessment_scopes ascope
-                    JOIN modules_master m ON ascope.module_id = m.module_id
-                    JOIN module_sections ms ON m.module_id = ms.module_id
-                    JOIN exam_items ei ON ms.section_id = ei.section_id
-                    WHERE ascope.course_id = %s AND ascope.exam_type_id = %s
-                    ORDER BY m.position, ms.position
-                ''', (course_id, exam_type_id))
-                all_questions = cursor.fetchall()
-                if not all_questions:
-                    return {'success': False, 'message': 'No questions found for the selected course and assessment type'}, 404
-                questions_by_module = {}
-                for q in all_questions:
-                    module_id = q['module_id']
-                    section_id = q['section_id']
-
-                    if module_id not in questions_by_module:
-                        content_text = BeautifulSoup(q['content_html'], 'html.parser').get_text() if q['content_html'] else ''
-                        module_title = content_text.split('\n')[0].strip() if content_text else f"Module {q['module_position']}"
-
-                        questions_by_module[module_id] = {
-                            'module_position': q['module_position'],
-                            'module_title': module_title,
-                            'sections': {}
-                        }
-                    if section_id not in questions_by_module[module_id]['sections']:
-                        questions_by_module[module_id]['sections'][section_id] = {
-                            'section_position': q['section_position'],
-                            'section_title': q['section_title'],
-                            'questions': []
-                        }
-
-                    questions_by_module[module_id]['sections'][section_id]['questions'].append({
-                        'item_id': q['item_id'],
-                        'question': q['question'],
-                        'option_a': q['option_a'],
-                        'option_b': q['option_b'],
-                        'option_c': q['option_c'],
-                        'option_d': q['option_d'],
-                        'correct_answer': q['correct_answer']
-                    })
-                selected_questions = []
-                all_available_questions = []
-
-                for module_id, module_data in questions_by_module.items():
-                    for section_id, section_data in module_data['sections'].items():
-                        for question in section_data['questions']:
-                            all_available_questions.append({
-                                'module_id': module_id,
-                                'module_position': module_data['module_position'],
-                                'module_title': module_data['module_title'],
-                                'section_id': section_id,
-                                'section_title': section_data['section_title'],
-                                'section_position': section_data['section_position'],
-                                **question
-                            })
-                if len(all_available_questions) < total_items_needed:
-                    return {'success': False,
-                            'error': 'Not enough questions available',
-                            'message': f'Not enough questions available ({len(all_available_questions)}) to generate the requested number of items ({total_items_needed})'}, 400
-                selected_questions = random.sample(all_available_questions, total_items_needed)
-
-                selected_questions.sort(key=lambda x: (x['module_position'], x['section_position']))
+                for _ in range(2):
+                    pool = question_pool.load_pool(cursor, course_id, exam_type_id)
+                    if not pool['items']:
+                        return {'success': False, 'message': 'No questions found for the selected course and assessment type'}, 404
+                    if len(pool['items']) < total_items_needed:
+                        return {'success': False,
+                                'error': 'Not enough questions available',
+                                'message': f'Not enough questions available ({len(pool["items"])}) to generate the requested number of items ({total_items_needed})'}, 400
+                    selected_questions = question_pool.hydrate(
+                        cursor, pool, question_pool.sample(pool, total_items_needed))
+                    if selected_questions is not None:
+                        break
+                    # An item was deleted since the pool was cached (possibly by another worker); reload it
+                    question_pool.invalidate(course_id, exam_type_id)
+                else:
+                    return {'success': False, 'message': 'Question pool changed while generating the preview, please retry'}, 409
 
                 module_stats = {}
                 section_stats = {}
@@ -223,10 +161,17 @@ class GenerateAssessmentPreview(Resource):
                     'statistics':{
                         'module_distribution': module_stats,
                         'section_distribution': section_stats,
-                        'total_available': len(all_available_questions)
+                        'total_available': len(pool['items'])
                     }
                 }, 200
         except Exception as e:
             logger.error(f"Error generating assessment preview: {str(e)}")
             traceback.print_exc()
-            return {'success': False, 'message': str(e)}, 500
\ No newline at end of file
+            return {'success': False, 'message': str(e)}, 500
+
+@assessment_preview_ns.route('/pool-cache-stats')
+class QuestionPoolCacheStats(Resource):
+    @assessment_preview_ns.doc(description="Hit/miss counters for the question pool cache of this worker.")
+    @api_key_required
+    def get(self):
+        return {'success': True, 'data': question_pool.stats()}, 200
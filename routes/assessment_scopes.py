@@ -2,6 +2,7 @@ from flask import Blueprint, request
 from flask_restx import Resource, Namespace, fields
 from init_db import get_db
 from utils import logger, api_key_required
+import question_pool
 
 assessment_scopes_ns = Namespace('assessment_scopes', description='Assessment Scopes Operations')
 
@@ -217,6 +218,7 @@ class SaveAssessmentScope(Resource):
                         VALUES (%s, %s, %s)
                     """, values)
 
+                question_pool.invalidate_course(cursor, course_id)
                 db.commit()
                 return {'success': True, 'message': 'Assessment scope saved successfully', 'error': None}, 200
         except Exception as e:
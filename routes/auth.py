@@ -6,6 +6,7 @@ from flask_jwt_extended import create_access_token, create_refresh_token,get_jwt
 import bcrypt
 
 from init_db import get_db
+from token_blocklist import blocklist
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -85,12 +86,14 @@ def logout():
     try:
         j = get_jwt()
         db = get_db()
+        expires_at = datetime.fromtimestamp(j['exp'], tz=timezone.utc)
         with db.cursor() as cur:
                 cur.execute(
                     "INSERT IGNORE INTO token_blocklist (jti, type, expires_at) VALUES (%s, %s, %s)",
-                    (j['jti'], j['type'], datetime.fromtimestamp(j['exp'], tz=timezone.utc))
+                    (j['jti'], j['type'], expires_at)
                 )
                 db.commit()
+        blocklist.add(j['jti'], expires_at)
         resp = jsonify({'success': True, 'message': 'Logout successful'})
         unset_jwt_cookies(resp)
         return resp, 200
@@ -3,6 +3,7 @@ import csv
 import io
 from init_db import get_db
 from utils import logger, api_key_required
+from entity_counts import adjust_count, invalidate_counts
 
 courses_bp = Blueprint('courses', __name__)
 
@@ -131,10 +132,23 @@ def delete_course(course_id):
             if not existing_course:
                 return jsonify({'success': False, 'message': 'Course not found', 'error': 'Course not found'}), 404
 
+            # Instances and their enrollments go with the course (ON DELETE CASCADE)
+            cursor.execute("""
+                SELECT COUNT(DISTINCT ci.instance_id) AS instance_count, COUNT(e.enrollment_id) AS enrollment_count
+                FROM course_instances ci
+                LEFT JOIN enrollments e ON e.instance_id = ci.instance_id
+                WHERE ci.course_id = %s
+            """, (course_id,))
+            dependents = cursor.fetchone()
+
             cursor.execute("""
                 DELETE FROM courses_master WHERE course_id = %s
             """, (course_id,))
+            adjust_count(cursor, 'courses_master', -cursor.rowcount)
+            adjust_count(cursor, 'course_instances', -dependents['instance_count'])
+            adjust_count(cursor, 'enrollments', -dependents['enrollment_count'])
             db.commit()
+            invalidate_counts()
 
             return jsonify({'success': True, 'message': 'Course deleted successfully'}), 200
     except Exception as e:
@@ -186,7 +200,9 @@ def upload_csv():
                     logger.error(f"Error processing row {row_num}: {e}")
                     errors.append(f"Row {row_num}: {str(e)}")
 
+            adjust_count(cursor, 'courses_master', created_count)
             db.commit()
+            invalidate_counts()
 
         return jsonify({
             'success': True,
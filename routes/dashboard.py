@@ -1,5 +1,6 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 from init_db import get_db
+from entity_counts import get_counts
 from utils import logger,api_key_required
 dashboard_bp = Blueprint('dashboard', __name__)
 
@@ -8,28 +9,18 @@ dashboard_bp = Blueprint('dashboard', __name__)
 @api_key_required
 def get_dashboard_stats():
     try:
-        db = get_db()
-        with db.cursor() as cursor:
-
-            cursor.execute("SELECT COUNT(*) as count FROM users")
-            user_count = cursor.fetchone()['count']
-
-            cursor.execute("SELECT COUNT(*) as count FROM courses_master")
-            course_count = cursor.fetchone()['count']
-
-            cursor.execute("SELECT COUNT(*) as count FROM course_instances")
-            instance_count = cursor.fetchone()['count']
-
-            cursor.execute("SELECT COUNT(*) as count FROM enrollments")
-            enrollment_count = cursor.fetchone()['count']
+        # ?exact=1 recounts every table in one query and resyncs the counters
+        exact = request.args.get('exact', '').lower() in ('1', 'true')
+        counts = get_counts(get_db(), exact=exact)
 
         return jsonify({
             'success': True,
             'message': 'Dashboard stats fetched successfully',
-            'user_count': user_count,
-            'course_count': course_count,
-            'instance_count': instance_count,
-            'enrollment_count': enrollment_count
+            'user_count': counts['user_count'],
+            'course_count': counts['course_count'],
+            'instance_count': counts['instance_count'],
+            'enrollment_count': counts['enrollment_count'],
+            'exact': exact
         })
     except Exception as e:
         logger.error(f"Error fetching dashboard stats: {str(e)}")
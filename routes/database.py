@@ -1,6 +1,6 @@
 from flask import Blueprint, request, jsonify
 
-from init_db import get_db
+from init_db import get_db, get_pool_stats
 from utils import api_key_required, logger
 
 
@@ -21,6 +21,16 @@ def list_tables():
         return jsonify({'error': str(e)}), 500
 
 
+@database_bp.route('/pool-stats', methods=['GET'])
+@api_key_required
+def pool_stats():
+    try:
+        return jsonify({'success': True, 'pool': get_pool_stats()}), 200
+    except Exception as e:
+        logger.error(f"Error fetching pool stats: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
 @database_bp.route('/table-data', methods=['GET'])
 @api_key_required
 def get_table_data():
@@ -1,11 +1,71 @@
+import base64
 import csv
 import io
-from flask import Blueprint, make_response, request, jsonify
+import itertools
+import json
+import os
+from datetime import datetime
+from flask import Blueprint, Response, make_response, request, jsonify, stream_with_context
+from pymysql.cursors import SSDictCursor
 from init_db import get_db
 from utils import logger, api_key_required
+from entity_counts import adjust_count, invalidate_counts
 
 enrollments_bp = Blueprint('enrollments', __name__)
 
+BULK_CHUNK_SIZE = 500
+CSV_CHUNK_SIZE = 1000
+CSV_MAX_BYTES = int(os.getenv('ENROLLMENT_CSV_MAX_MB', 50)) * 1024 * 1024
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _placeholders(values):
+    return ', '.join(['%s'] * len(values))
+
+
+def _usn_key(external_id):
+    """Match USNs the way the users.external_id collation does: ignoring case and surrounding spaces."""
+    return external_id.strip().casefold()
+
+
+def _existing_enrollments(cursor, instance_id, user_ids):
+    """user_ids (from the given list) already enrolled in the instance."""
+    if not user_ids:
+        return set()
+    cursor.execute(
+        f"SELECT user_id FROM enrollments WHERE instance_id = %s AND user_id IN ({_placeholders(user_ids)})",
+        [instance_id, *user_ids])
+    return {row['user_id'] for row in cursor.fetchall()}
+
+
+def _insert_enrollments(cursor, instance_id, user_ids):
+    """Enroll user_ids with one multi-row INSERT.
+
+    Returns (inserted_count, [(user_id, error_message), ...]). If the batch
+    is rejected it is retried row by row so failures are per user.
+    """
+    if not user_ids:
+        return 0, []
+    query = "INSERT INTO enrollments (instance_id, user_id) VALUES (%s, %s)"
+    try:
+        cursor.executemany(query, [(instance_id, user_id) for user_id in user_ids])
+        inserted, failures = len(user_ids), []
+    except Exception:
+        inserted = 0
+        failures = []
+        for user_id in user_ids:
+            try:
+                cursor.execute(query, (instance_id, user_id))
+                inserted += 1
+            except Exception as e:
+                failures.append((user_id, str(e)))
+    adjust_count(cursor, 'enrollments', inserted)
+    return inserted, failures
+
 
 @enrollments_bp.route('/student/<int:student_id>', methods=['GET'])
 @api_key_required
@@ -41,6 +101,120 @@ def get_student_enrollments(student_id):
                         'error': str(e)
                         }), 500
 
+def _encode_cursor(sort_by, sort_order, row):
+    value = row[sort_by]
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps([sort_by, sort_order, value, row['enrollment_id']], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def _decode_cursor(token, sort_by, sort_order):
+    """Return (last_sort_value, last_enrollment_id) or raise ValueError."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        cursor_sort_by, cursor_order, value, enrollment_id = json.loads(base64.urlsafe_b64decode(padded))
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if cursor_sort_by != sort_by or cursor_order != sort_order:
+        raise ValueError('Cursor does not match sort_by/sort_order')
+    if sort_by == 'created_at' and value is not None:
+        value = datetime.fromisoformat(value)
+    return value, int(enrollment_id)
+
+
+def _seek_condition(column, sort_order, last_value, last_id):
+    """WHERE clause (and params) for the rows after (last_value, last_id) in the page order.
+
+    MySQL sorts NULLs first ascending and last descending, and NULL never
+    compares equal or greater, so a NULL sort value needs its own predicate.
+    """
+    op = '<' if sort_order == 'desc' else '>'
+    if last_value is None:
+        if sort_order == 'desc':
+            return f"({column} IS NULL AND e.enrollment_id < %s)", [last_id]
+        return f"(({column} IS NULL AND e.enrollment_id > %s) OR {column} IS NOT NULL)", [last_id]
+    condition = f"{column} {op} %s OR ({column} = %s AND e.enrollment_id {op} %s)"
+    if sort_order == 'desc':
+        condition += f" OR {column} IS NULL"
+    return f"({condition})", [last_value, last_value, last_id]
+
+
+def _keyset_enrollments_page(cursor, where_conditions, params, page_cursor, per_page,
+                             sort_by, sort_order, sort_column_map):
+    """One page of enrollments seeked past the last row of the previous page.
+
+    Rows are ordered by (sort column, enrollment_id) so the cursor is unique.
+    Pass include_total=1 for an exact COUNT or include_total=approx for the
+    InnoDB row estimate (only available without filters).
+    """
+    conditions = list(where_conditions)
+    page_params = list(params)
+    column = sort_column_map[sort_by]
+
+    if page_cursor:
+        try:
+            last_value, last_id = _decode_cursor(page_cursor, sort_by, sort_order)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e), 'error': str(e)}), 400
+        condition, condition_params = _seek_condition(column, sort_order, last_value, last_id)
+        conditions.append(condition)
+        page_params.extend(condition_params)
+
+    where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+    query = f"""
+    SELECT
+    e.enrollment_id,e.instance_id, e.user_id, e.created_at,
+    u.external_id, u.full_name,
+    cm.course_code,cm.course_title,
+    ci.term_code, ci.start_date, ci.end_date
+    FROM enrollments e
+    JOIN course_instances ci ON e.instance_id = ci.instance_id
+    JOIN courses_master cm ON ci.course_id = cm.course_id
+    JOIN users u ON e.user_id = u.user_id
+    {where_clause}
+    ORDER BY {column} {sort_order}, e.enrollment_id {sort_order}
+    LIMIT %s
+    """
+    # One extra row tells us whether another page exists
+    cursor.execute(query, page_params + [per_page + 1])
+    enrollments = cursor.fetchall()
+    has_more = len(enrollments) > per_page
+    enrollments = enrollments[:per_page]
+
+    result = {
+        'success': True,
+        'enrollments': enrollments,
+        'per_page': per_page,
+        'has_more': has_more,
+        'next_cursor': _encode_cursor(sort_by, sort_order, enrollments[-1]) if has_more else None,
+    }
+
+    include_total = request.args.get('include_total', '').lower()
+    if include_total in ('1', 'true', 'exact'):
+        filter_clause = " WHERE " + " AND ".join(where_conditions) if where_conditions else ""
+        cursor.execute(f"""
+            SELECT COUNT(*) as total
+            FROM enrollments e
+            JOIN course_instances ci ON e.instance_id = ci.instance_id
+            JOIN courses_master cm ON ci.course_id = cm.course_id
+            JOIN users u ON e.user_id = u.user_id
+            {filter_clause}
+        """, params)
+        result['total'] = cursor.fetchone()['total']
+        result['total_is_estimate'] = False
+    elif include_total == 'approx' and not where_conditions:
+        cursor.execute("""
+            SELECT TABLE_ROWS as total FROM information_schema.TABLES
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'enrollments'
+        """)
+        row = cursor.fetchone()
+        result['total'] = row['total'] if row else None
+        result['total_is_estimate'] = True
+
+    return jsonify(result), 200
+
+
 @enrollments_bp.route('/', methods=['GET'])
 @api_key_required
 def get_enrollments():
@@ -72,19 +246,6 @@ def get_enrollments():
 
             where_clause = " WHERE " + " AND ".join(where_conditions) if where_conditions else ""
 
-            # Get total count
-            count_query = f"""
-                SELECT COUNT(*) as total
-                FROM enrollments e
-                JOIN course_instances ci ON e.instance_id = ci.instance_id
-                JOIN courses_master cm ON ci.course_id = cm.course_id
-                JOIN users u ON e.user_id = u.user_id
-                {where_clause}
-                """
-
-            cursor.execute(count_query, params)
-            total = cursor.fetchone()['total']
-
             valid_sort_columns = ['external_id', 'full_name',
                                   'course_code', 'course_title',
                                   'term_code', 'created_at']
@@ -101,6 +262,26 @@ def get_enrollments():
                 'term_code': 'ci.term_code',
                 'created_at': 'e.created_at'
             }
+
+            # Cursor (keyset) mode: no OFFSET scan and the total is opt-in
+            page_cursor = request.args.get('cursor')
+            if page_cursor is not None:
+                return _keyset_enrollments_page(cursor, where_conditions, params, page_cursor,
+                                                per_page, sort_by, sort_order, sort_column_map)
+
+            # Get total count
+            count_query = f"""
+                SELECT COUNT(*) as total
+                FROM enrollments e
+                JOIN course_instances ci ON e.instance_id = ci.instance_id
+                JOIN courses_master cm ON ci.course_id = cm.course_id
+                JOIN users u ON e.user_id = u.user_id
+                {where_clause}
+                """
+
+            cursor.execute(count_query, params)
+            total = cursor.fetchone()['total']
+
             query = f"""
             SELECT
             e.enrollment_id,e.instance_id, e.user_id, e.created_at,
@@ -286,9 +467,11 @@ def create_enrollment():
                 INSERT INTO enrollments (instance_id, user_id)
                 VALUES (%s, %s)
             """, (instance_id, user_id))
+            enrollment_id = cursor.lastrowid
 
+            adjust_count(cursor, 'enrollments', 1)
             db.commit()
-            enrollment_id = cursor.lastrowid
+            invalidate_counts()
             return jsonify({
                 'success': True,
                 'message': 'Enrollment created successfully',
@@ -342,43 +525,49 @@ def bulk_enroll_students():
                     'error': 'Invalid instance_id format'
                 }), 404
 
-            # Process each user
-            for user_id in user_ids:
-                try:
-                    # Validate user exists
+            # Process users in chunks: one lookup, one existence check and one
+            # multi-row insert per chunk, committed so locks are held briefly
+            seen = set()
+            for chunk in _chunks(user_ids, BULK_CHUNK_SIZE):
+                ids = []
+                for user_id in chunk:
+                    try:
+                        ids.append(int(user_id))
+                    except (TypeError, ValueError):
+                        pass
+
+                users = {}
+                existing = set()
+                if ids:
                     cursor.execute(
-                        "SELECT user_id, external_id FROM users WHERE user_id = %s",
-                        (user_id,))
-                    user = cursor.fetchone()
+                        f"SELECT user_id, external_id FROM users WHERE user_id IN ({_placeholders(ids)})",
+                        ids)
+                    users = {row['user_id']: row for row in cursor.fetchall()}
+                    existing = _existing_enrollments(cursor, instance_id, list(users))
+
+                to_insert = []
+                for user_id in chunk:
+                    try:
+                        user = users.get(int(user_id))
+                    except (TypeError, ValueError):
+                        user = None
 
                     if not user:
                         errors.append(f"User ID {user_id}: User not found")
                         continue
 
-                    # Check for existing enrollment
-                    cursor.execute("""
-                        SELECT enrollment_id FROM enrollments
-                        WHERE instance_id = %s AND user_id = %s
-                    """, (instance_id, user_id))
-
-                    if cursor.fetchone():
+                    if user['user_id'] in existing or user['user_id'] in seen:
                         errors.append(f"User {user['external_id']}: Already enrolled in this course")
                         continue
 
-                    # Create enrollment
-                    cursor.execute("""
-                        INSERT INTO enrollments (instance_id, user_id)
-                        VALUES (%s, %s)
-                    """, (instance_id, user_id))
-
-                    created_count += 1
-
-                except Exception as inner_e:
-                    # Handle individual user errors without stopping the entire process
-                    external_id = user['external_id'] if user else str(user_id)
-                    error_msg = str(inner_e)
+                    seen.add(user['user_id'])
+                    to_insert.append(user['user_id'])
 
+                inserted, failures = _insert_enrollments(cursor, instance_id, to_insert)
+                created_count += inserted
+                for user_id, error_msg in failures:
                     # Make error message more user-friendly
+                    external_id = users[user_id]['external_id']
                     if 'duplicate' in error_msg.lower():
                         errors.append(f"User {external_id}: Already enrolled in this course")
                     elif 'foreign key constraint' in error_msg.lower():
@@ -386,9 +575,8 @@ def bulk_enroll_students():
                     else:
                         errors.append(f"User {external_id}: {error_msg}")
 
-                    continue
-
-            db.commit()
+                db.commit()
+                invalidate_counts()
 
             return jsonify({
                 'success': True,
@@ -545,16 +733,17 @@ def upload_csv():
         if not file.filename.lower().endswith('.csv'):
             return jsonify({'success': False, 'message': 'Please select a CSV file', 'error': 'Invalid file type'}), 400
 
-        # Check file size (e.g., 5MB limit)
+        # Check file size
         file.seek(0, 2)  # Seek to end
         file_size = file.tell()
         file.seek(0)  # Reset to beginning
 
-        if file_size > 5 * 1024 * 1024:  # 5MB
-            return jsonify({'success': False, 'message': 'File too large (max 5MB)', 'error': 'File too large (max 5MB)'}), 400
+        if file_size > CSV_MAX_BYTES:
+            message = f'File too large (max {CSV_MAX_BYTES // (1024 * 1024)}MB)'
+            return jsonify({'success': False, 'message': message, 'error': message}), 400
 
-        # Process CSV
-        stream = io.StringIO(file.stream.read().decode("utf-8", errors="ignore"), newline=None)
+        # Process CSV as a stream of rows instead of decoding the whole upload up front
+        stream = io.TextIOWrapper(file.stream, encoding="utf-8-sig", errors="ignore", newline="")
         csv_input = csv.DictReader(stream)
 
         db = get_db()
@@ -576,47 +765,63 @@ def upload_csv():
 
             course_info = f"{instance['course_code']} - {instance['course_title']}"
 
-            # Process each row
-            for row_num, row in enumerate(csv_input, start=2):
-                try:
-                    external_id = row.get('external_id', '').strip()
+            # Resolve rows a chunk at a time: one USN lookup, one existence
+            # check and one multi-row insert per chunk, committed so locks are
+            # held briefly
+            rows = enumerate(csv_input, start=2)
+            seen = set()
+            while True:
+                chunk = list(itertools.islice(rows, CSV_CHUNK_SIZE))
+                if not chunk:
+                    break
+
+                usns = []
+                for row_num, row in chunk:
+                    external_id = (row.get('external_id') or '').strip()
+                    if external_id:
+                        usns.append(external_id)
+
+                students = {}
+                existing = set()
+                if usns:
+                    cursor.execute(
+                        f"""SELECT user_id, external_id, full_name FROM users
+                            WHERE role = 'student' AND external_id IN ({_placeholders(usns)})""",
+                        usns)
+                    students = {_usn_key(student['external_id']): student for student in cursor.fetchall()}
+                    existing = _existing_enrollments(
+                        cursor, instance_id, [student['user_id'] for student in students.values()])
+
+                to_insert = {}  # user_id -> (row_num, external_id)
+                for row_num, row in chunk:
+                    external_id = (row.get('external_id') or '').strip()
 
                     if not external_id:
                         errors.append(f"Row {row_num}: Missing student USN")
                         continue
 
-                    # Find student
-                    cursor.execute(
-                        "SELECT user_id, external_id, full_name FROM users WHERE external_id = %s AND role = 'student'",
-                        (external_id,)
-                    )
-                    student = cursor.fetchone()
-
+                    student = students.get(_usn_key(external_id))
                     if not student:
                         errors.append(f"Row {row_num}: Student with USN '{external_id}' not found")
                         continue
 
-                    # Check existing enrollment
-                    cursor.execute(
-                        "SELECT enrollment_id FROM enrollments WHERE instance_id = %s AND user_id = %s",
-                        (instance_id, student['user_id'])
-                    )
-                    if cursor.fetchone():
+                    if student['user_id'] in existing or student['user_id'] in seen:
                         errors.append(f"Row {row_num}: {student['full_name']} ({external_id}) already enrolled")
                         continue
 
-                    # Create enrollment
-                    cursor.execute(
-                        "INSERT INTO enrollments (instance_id, user_id) VALUES (%s, %s)",
-                        (instance_id, student['user_id'])
-                    )
-                    created_count += 1
+                    seen.add(student['user_id'])
+                    to_insert[student['user_id']] = (row_num, external_id)
 
-                except Exception as e:
-                    external_id = row.get('external_id', 'Unknown')
-                    errors.append(f"Row {row_num}: Error processing student '{external_id}' - {str(e)}")
+                inserted, failures = _insert_enrollments(cursor, instance_id, list(to_insert))
+                created_count += inserted
+                for user_id, error_msg in failures:
+                    row_num, external_id = to_insert[user_id]
+                    errors.append(f"Row {row_num}: Error processing student '{external_id}' - {error_msg}")
 
-            db.commit()
+                db.commit()
+                invalidate_counts()
+
+        errors.sort(key=lambda msg: int(msg.split(':', 1)[0].split()[1]))
 
         return jsonify({
             'success': True,
@@ -637,6 +842,60 @@ def upload_csv():
         }), 500
 
 
+EXPORT_HEADER = ['USN', 'Student Name', 'Course Code', 'Course Title', 'Term']
+EXPORT_FLUSH_ROWS = 500
+
+
+def _export_row(enrollment):
+    return [
+        enrollment['external_id'] or '',
+        enrollment['full_name'] or '',
+        enrollment['course_code'] or '',
+        enrollment['course_title'] or '',
+        enrollment['term_code'] or ''
+    ]
+
+
+def _stream_export_rows(db, query, params):
+    """Yield the export as CSV chunks read from an unbuffered server-side cursor.
+
+    Only EXPORT_FLUSH_ROWS rows are held in memory at a time, and the BOM and
+    header go out before the query has produced its first row.
+    """
+    output = io.StringIO()
+    writer = csv.writer(output)
+    output.write('\ufeff')
+    writer.writerow(EXPORT_HEADER)
+    yield output.getvalue()
+    output.seek(0)
+    output.truncate()
+
+    cursor = db.cursor(SSDictCursor)
+    try:
+        cursor.execute(query, params)
+        pending = 0
+        for enrollment in cursor:
+            writer.writerow(_export_row(enrollment))
+            pending += 1
+            if pending >= EXPORT_FLUSH_ROWS:
+                yield output.getvalue()
+                output.seek(0)
+                output.truncate()
+                pending = 0
+        if pending:
+            yield output.getvalue()
+        cursor.close()
+    except GeneratorExit:
+        # Client went away mid-stream: draining the rest of the result set
+        # would take as long as the export itself, so drop the connection.
+        db.close()
+        raise
+    except Exception as e:
+        logger.error(f"Error streaming enrollments CSV: {str(e)}")
+        db.close()
+        raise
+
+
 @enrollments_bp.route('/export-csv', methods=['GET'])
 @api_key_required
 def export_csv():
@@ -679,6 +938,18 @@ def export_csv():
                 ORDER BY ci.term_code DESC, cm.course_code, u.external_id
                 '''
                 params = []
+
+            if instance_id:
+                filename = f"enrollments_instance_{instance_id}.csv"
+            else:
+                filename = "all_enrollments.csv"
+
+            if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+                response = Response(stream_with_context(_stream_export_rows(db, query, params)),
+                                    content_type='text/csv; charset=utf-8')
+                response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+                return response
+
             cursor.execute(query, params)
             enrollments = cursor.fetchall()
 
@@ -688,28 +959,15 @@ def export_csv():
             output.write('\ufeff')
 
             # Write header
-            writer.writerow(['USN', 'Student Name',
-                             'Course Code',
-                             'Course Title', 'Term'])
+            writer.writerow(EXPORT_HEADER)
 
             for enrollment in enrollments:
-                writer.writerow([
-                    enrollment['external_id'] or '',
-                    enrollment['full_name'] or '',
-                    enrollment['course_code'] or '',
-                    enrollment['course_title'] or '',
-                    enrollment['term_code'] or ''
-                ])
+                writer.writerow(_export_row(enrollment))
 
             # Create response
             csv_data = output.getvalue()
             output.close()
 
-            if instance_id:
-                filename = f"enrollments_instance_{instance_id}.csv"
-            else:
-                filename = "all_enrollments.csv"
-
             response = make_response(csv_data)
             response.headers['Content-Type'] = 'text/csv; charset=utf-8'
             response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
@@ -4,6 +4,7 @@ import io
 from datetime import datetime
 from init_db import get_db
 from utils import logger, api_key_required
+from entity_counts import adjust_count, invalidate_counts
 
 instances_bp = Blueprint('instances', __name__)
 
@@ -164,7 +165,9 @@ def bulk_create_instances():
                         course_code = course['course_code'] if course else f"ID:{course_id}"
                         errors.append(f"{course_code}: {str(e)}")
 
+            adjust_count(cursor, 'course_instances', created_count)
             db.commit()
+            invalidate_counts()
 
 
         return jsonify({
@@ -229,12 +232,18 @@ def delete_instance(instance_id):
     try:
         db = get_db()
         with db.cursor() as cursor:
+            # Enrollments go with the instance (ON DELETE CASCADE)
+            cursor.execute("SELECT COUNT(*) AS count FROM enrollments WHERE instance_id = %s", (instance_id,))
+            enrollment_count = cursor.fetchone()['count']
             cursor.execute("DELETE FROM course_instances WHERE instance_id = %s", (instance_id,))
-            db.commit()
-
             if cursor.rowcount == 0:
                 return jsonify({'error': 'Course instance not found'}), 404
 
+            adjust_count(cursor, 'course_instances', -1)
+            adjust_count(cursor, 'enrollments', -enrollment_count)
+            db.commit()
+            invalidate_counts()
+
             return jsonify({'message': 'Course instance deleted successfully'})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1,19 +1,16 @@
-from flask import Blueprint, g, request, jsonify, make_response
+from flask import Blueprint, g, request, jsonify, make_response, url_for
 from flask_jwt_extended import get_jwt_identity
 from init_db import get_db
 from utils import logger, api_key_required
+from export_jobs import export_jobs
+from pdf_cache import pdf_cache
+import question_pool
+from module_meta import display_title, parse_module_html
+from pdf_render import (PageBreak, Paragraph, Spacer, build_pdf, escape, get_styles, html_to_flowables,
+                        html_to_markup)
 import json
 
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from reportlab.lib.enums import TA_CENTER
-from bs4 import BeautifulSoup
-
-import requests
 import os
-import boto3
 import re
 import traceback
 import io
@@ -99,6 +96,7 @@ def save_description():
                                UPDATE courses_master SET description = %s WHERE course_id = %s
                                ''', (description, course_id))
                 db.commit()
+                _invalidate_course_pdfs(cursor, course_id)
             return jsonify({'success': True, 'message': 'Course description updated successfully'}), 200
     except Exception as e:
         logger.error(f"Error saving course description: {str(e)}")
@@ -146,7 +144,7 @@ def update_module():
 
         db = get_db()
         with db.cursor() as cursor:
-            cursor.execute ('SELECT content_html FROM modules_master WHERE module_id = %s', (module_id,))
+            cursor.execute ('SELECT content_html, course_id FROM modules_master WHERE module_id = %s', (module_id,))
             module = cursor.fetchone()
 
             if not module:
@@ -172,10 +170,14 @@ def update_module():
                         r'\1\n<div class="module-description"><p>' + description + '</p></div>',
                         current_html
                     )
+            stored_title, stored_description = parse_module_html(current_html)
             cursor.execute('''
-                           UPDATE modules_master SET content_html = %s WHERE module_id = %s
-                           ''', (current_html, module_id))
+                           UPDATE modules_master SET content_html = %s, module_title = %s, module_description = %s
+                           WHERE module_id = %s
+                           ''', (current_html, stored_title, stored_description, module_id))
+            question_pool.invalidate_course(cursor, module['course_id'])
             db.commit()
+            _invalidate_module_pdfs(cursor, module_id)
             return jsonify({'success': True, 'message': 'Module updated successfully'}), 200
     except Exception as e:
         logger.error(f"Error updating module: {str(e)}")
@@ -187,11 +189,16 @@ def delete_module(module_id):
     try:
         db = get_db()
         with db.cursor() as cursor:
+            cursor.execute("SELECT course_id FROM modules_master WHERE module_id = %s", (module_id,))
+            module = cursor.fetchone()
             cursor.execute (' DELETE FROM modules_master WHERE module_id = %s', (module_id,))
-            db.commit()
-
             if cursor.rowcount == 0:
                 return jsonify({'success': False, 'message': 'Module not found'}), 404
+            question_pool.invalidate_course(cursor, module['course_id'])
+            db.commit()
+
+            pdf_cache.invalidate('single_module', module_id)
+            pdf_cache.invalidate('course', module['course_id'])
             return jsonify({'success': True, 'message': 'Module deleted successfully'}), 200
     except Exception as e:
         logger.error(f"Error deleting module: {str(e)}")
@@ -265,7 +272,11 @@ def reorder_module():
                            SET position = %s
                            WHERE module_id = %s
                            ''', (target_position, module_id))
+            question_pool.invalidate_course(cursor, course_id)
             db.commit()
+            pdf_cache.invalidate('single_module', module_id)
+            pdf_cache.invalidate('single_module', target_module_id)
+            pdf_cache.invalidate('course', course_id)
             print(f"Module {module_id} moved {direction} successfully.")
             logger.info(f"Module {module_id} moved {direction} successfully.")
             return jsonify({'success': True, 'message': f'Module moved {direction} successfully'}), 200
@@ -297,9 +308,15 @@ def update_section_full():
                 SET title = %s, content = %s, updated_at = CURRENT_TIMESTAMP
                 WHERE section_id = %s
             """, (title, content or '', section_id))
-            db.commit()
             if cursor.rowcount == 0:
                 return jsonify({'error': 'Section not found'}), 404
+            question_pool.invalidate_for_section(cursor, section_id)
+            db.commit()
+
+            cursor.execute("SELECT module_id FROM module_sections WHERE section_id = %s", (section_id,))
+            section = cursor.fetchone()
+            if section:
+                _invalidate_module_pdfs(cursor, section['module_id'])
 
             return jsonify({'message': 'Section updated successfully'})
     except Exception as e:
@@ -332,7 +349,7 @@ def update_section():
         db = get_db()
         with db.cursor() as cursor:
             # Check if section exists first
-            cursor.execute("SELECT section_id, title FROM module_sections WHERE section_id = %s", (section_id,))
+            cursor.execute("SELECT section_id, module_id, title FROM module_sections WHERE section_id = %s", (section_id,))
             existing = cursor.fetchone()
 
             if not existing:
@@ -352,6 +369,7 @@ def update_section():
             """, (content, section_id))
             db.commit()
             print(f"✅ Updated {cursor.rowcount} row(s)")
+            _invalidate_module_pdfs(cursor, existing['module_id'])
 
             # Verify the update
             cursor.execute("SELECT content FROM module_sections WHERE section_id = %s", (section_id,))
@@ -413,11 +431,13 @@ def insert_module():
     <p>{default_description}</p>
 </div>"""
             cursor.execute("""
-                INSERT INTO modules_master (course_id, position, content_html)
-                VALUES (%s, %s, %s)
-            """, (course_id, new_position, content_html))
-            db.commit()
+                INSERT INTO modules_master (course_id, position, content_html, module_title, module_description)
+                VALUES (%s, %s, %s, %s, %s)
+            """, (course_id, new_position, content_html, default_title, default_description))
             new_module_id = cursor.lastrowid
+            question_pool.invalidate_course(cursor, course_id)
+            db.commit()
+            _invalidate_course_pdfs(cursor, course_id)
 
             return jsonify({
                 'success': True,
@@ -452,8 +472,9 @@ def insert_section():
         db = get_db()
         with db.cursor() as cursor:
             # Verify module exists
-            cursor.execute("SELECT module_id FROM modules_master WHERE module_id = %s", (module_id,))
-            if not cursor.fetchone():
+            cursor.execute("SELECT module_id, course_id FROM modules_master WHERE module_id = %s", (module_id,))
+            module = cursor.fetchone()
+            if not module:
                 return jsonify({
                     'success': False,
                     'message': 'Module not found',
@@ -475,8 +496,10 @@ def insert_section():
                 INSERT INTO module_sections (module_id, position, title, content)
                 VALUES (%s, %s, %s, %s)
             """, (module_id, new_position, default_title, ""))
-            db.commit()
             new_section_id = cursor.lastrowid
+            question_pool.invalidate_course(cursor, module['course_id'])
+            db.commit()
+            _invalidate_module_pdfs(cursor, module_id)
 
             return jsonify({
                 'success': True,
@@ -549,6 +572,7 @@ def delete_section(section_id):
 
             module_id = section_info['module_id']
             deleted_position = section_info['position']
+            question_pool.invalidate_for_section(cursor, section_id)
 
             # Delete the section
             cursor.execute("DELETE FROM module_sections WHERE section_id = %s", (section_id,))
@@ -567,6 +591,7 @@ def delete_section(section_id):
                 WHERE module_id = %s AND position > %s
             """, (module_id, deleted_position))
             db.commit()
+            _invalidate_module_pdfs(cursor, module_id)
             return jsonify({
                 'success': True,
                 'message': 'Section deleted successfully'
@@ -581,408 +606,273 @@ def delete_section(section_id):
         }), 500
 
 
+def _pdf_response(pdf, filename):
+    return send_file(io.BytesIO(pdf), as_attachment=True, download_name=filename, mimetype='application/pdf')
+
+
+def _cached_pdf_response(kind, target_id, version, render):
+    """Serve a PDF from the content-versioned cache, rendering it on a miss.
+
+    The ETag is derived from the content version, so an unchanged export
+    answers If-None-Match with 304 without touching the renderer.
+    """
+    db = get_db()
+    content_version = version(db, target_id)
+    if content_version is None:
+        raise LookupError(f"{'Course' if kind == 'course' else 'Module'} not found")
+
+    etag = pdf_cache.etag(content_version)
+    cached = pdf_cache.get(kind, target_id, etag)
+    if cached:
+        path, filename = cached
+    else:
+        pdf, filename = render(db, target_id)
+        path = pdf_cache.put(kind, target_id, etag, pdf, filename)
+
+    response = send_file(path, as_attachment=True, download_name=filename, mimetype='application/pdf',
+                         etag=etag, conditional=True, max_age=0)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.headers['X-PDF-Cache'] = 'HIT' if cached else 'MISS'
+    return response
+
+
+def _invalidate_module_pdfs(cursor, module_id):
+    """Drop cached PDFs for one module and the course export that contains it."""
+    pdf_cache.invalidate('single_module', module_id)
+    cursor.execute("SELECT course_id FROM modules_master WHERE module_id = %s", (module_id,))
+    module = cursor.fetchone()
+    if module:
+        pdf_cache.invalidate('course', module['course_id'])
+
+
+def _invalidate_course_pdfs(cursor, course_id):
+    """Drop cached PDFs for a course and every module in it (e.g. after positions shift)."""
+    pdf_cache.invalidate('course', course_id)
+    cursor.execute("SELECT module_id FROM modules_master WHERE course_id = %s", (course_id,))
+    for module in cursor.fetchall():
+        pdf_cache.invalidate('single_module', module['module_id'])
+
+
+def _render_single_module_pdf(db, module_id):
+    """Build the enhanced single-module PDF; returns (pdf_bytes, filename)."""
+    with db.cursor() as cursor:
+        # Get module and course information
+        cursor.execute("""
+            SELECT m.module_title, m.module_description, c.course_code, c.course_title, c.description, m.position,
+                   m.learning_outcomes
+            FROM modules_master m
+            JOIN courses_master c ON m.course_id = c.course_id
+            WHERE m.module_id = %s
+        """, (module_id,))
+        module_info = cursor.fetchone()
+
+        if not module_info:
+            raise LookupError('Module not found')
+
+        # Get module sections
+        cursor.execute("""
+            SELECT section_id, title, content, position
+            FROM module_sections
+            WHERE module_id = %s
+            ORDER BY position
+        """, (module_id,))
+        sections = cursor.fetchall()
+
+        # Get module activities
+        cursor.execute("""
+            SELECT title, instructions, activity_type, position
+            FROM module_activities
+            WHERE module_id = %s
+            ORDER BY position
+        """, (module_id,))
+        activities = cursor.fetchall()
+
+    module_title = display_title(module_info['module_title'], module_info['position'])
+    module_description = module_info['module_description']
+    styles = get_styles()
+    content_style = styles['EnhancedContentStyle']
+    section_header_style = styles['EnhancedSectionHeaderStyle']
+    activity_style = styles['EnhancedActivityStyle']
+
+    def story():
+        # Enhanced title page
+        yield Paragraph("Learning Module", styles['EnhancedTitleStyle'])
+        yield Spacer(1, 20)
+        yield Paragraph(escape(f"{module_info['course_code']} - {module_info['course_title']}"),
+                        styles['EnhancedCourseStyle'])
+        yield Spacer(1, 30)
+        yield Paragraph(escape(module_title), styles['EnhancedModuleHeaderStyle'])
+        yield Spacer(1, 20)
+
+        if module_description:
+            yield Paragraph(f"<b>Module Overview:</b><br/>{escape(module_description)}", content_style)
+            yield Spacer(1, 15)
+
+        # Learning outcomes with enhanced styling
+        if module_info['learning_outcomes']:
+            try:
+                outcomes = json.loads(module_info['learning_outcomes'])
+            except ValueError:
+                outcomes = None
+            if outcomes:
+                yield Paragraph("<b>Learning Outcomes:</b>", section_header_style)
+                for outcome in outcomes:
+                    yield Paragraph(f"• {escape(str(outcome))}", content_style)
+                yield Spacer(1, 20)
+
+        yield PageBreak()
+
+        # Each section starts on a new page
+        for section in sections:
+            yield Paragraph(escape(f"Section {section['position']}: {section['title']}"), section_header_style)
+            yield Spacer(1, 15)
+            yield from html_to_flowables(section['content'], content_style, code=styles['EnhancedCodeStyle'], gap=8)
+            yield PageBreak()
+
+        # Enhanced activities section
+        if activities:
+            yield Paragraph("Module Activities", section_header_style)
+            yield Spacer(1, 15)
+
+            for activity in activities:
+                yield Paragraph(escape(f"Activity {activity['position']}: {activity['title']}"), section_header_style)
+                yield Spacer(1, 10)
+                yield Paragraph(f"<b>Type:</b> {escape(activity['activity_type'].replace('_', ' ').title())}",
+                                activity_style)
+                yield Spacer(1, 8)
+                if activity['instructions']:
+                    yield Paragraph(f"<b>Instructions:</b><br/>{html_to_markup(activity['instructions'])}",
+                                    activity_style)
+                yield Spacer(1, 15)
+
+    pdf = build_pdf(story(), 'single_module')
+
+    # Generate filename with course code, module number, and module name
+    safe_module_title = re.sub(r'[^\w\s-]', '', module_title).strip()
+    safe_module_title = re.sub(r'[-\s]+', ' ', safe_module_title)
+    filename = f"{module_info['course_code']}_Module {module_info['position']}_{safe_module_title}.pdf"
+
+    return pdf, filename
+
+
 @modules_bp.route('/export-single-module-pdf/<int:module_id>', methods=['GET'])
 @api_key_required
 def export_single_module_enhanced_pdf(module_id):
     try:
-        db = get_db()
-        with db.cursor() as cursor:
-            # Get module and course information
-            cursor.execute("""
-                SELECT m.content_html, c.course_code, c.course_title, c.description, m.position, m.learning_outcomes
-                FROM modules_master m
-                JOIN courses_master c ON m.course_id = c.course_id
-                WHERE m.module_id = %s
-            """, (module_id,))
-            module_info = cursor.fetchone()
+        return _cached_pdf_response('single_module', module_id, _single_module_version, _render_single_module_pdf)
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        print(f"Error generating enhanced module PDF: {str(e)}")
+        traceback.print_exc()
+        return jsonify({
+            'success': False,
+            'message': 'Error generating module PDF',
+            'error': str(e)
+        }), 500
 
-            if not module_info:
-                return jsonify({'error': 'Module not found'}), 404
+def _render_course_pdf(db, course_id):
+    """Build the full course PDF; returns (pdf_bytes, filename)."""
+    with db.cursor() as cursor:
+            # Get course info
+            cursor.execute("SELECT course_title, description FROM courses_master WHERE course_id = %s", (course_id,))
+            course = cursor.fetchone()
 
-            # Get module sections
+            if not course:
+                raise LookupError('Course not found')
+
+            # Get modules
             cursor.execute("""
-                SELECT section_id, title, content, position
-                FROM module_sections
-                WHERE module_id = %s
+                SELECT module_id, position, module_title, module_description, learning_outcomes
+                FROM modules_master
+                WHERE course_id = %s
                 ORDER BY position
-            """, (module_id,))
-            sections = cursor.fetchall()
+            """, (course_id,))
+            modules = cursor.fetchall()
 
-            # Get module activities
+            # Sections and activities for every module in one query each
             cursor.execute("""
-                SELECT title, instructions, activity_type, position
-                FROM module_activities
-                WHERE module_id = %s
-                ORDER BY position
-            """, (module_id,))
-            activities = cursor.fetchall()
-
-            # Create enhanced PDF
-            buffer = io.BytesIO()
-            doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
-
-            # Enhanced styles
-            styles = getSampleStyleSheet()
-
-            # Custom enhanced styles
-            title_style = ParagraphStyle(
-                'EnhancedTitleStyle',
-                parent=styles['Title'],
-                fontSize=24,
-                spaceAfter=30,
-                alignment=1,  # Center alignment
-                textColor=colors.HexColor('#1a365d'),
-                fontName='Helvetica-Bold'
-            )
-
-            course_style = ParagraphStyle(
-                'EnhancedCourseStyle',
-                parent=styles['Heading1'],
-                fontSize=18,
-                spaceAfter=20,
-                alignment=1,
-                textColor=colors.HexColor('#2d3748'),
-                fontName='Helvetica-Bold'
-            )
-
-            module_header_style = ParagraphStyle(
-                'EnhancedModuleHeaderStyle',
-                parent=styles['Heading1'],
-                fontSize=20,
-                spaceAfter=25,
-                spaceBefore=15,
-                textColor=colors.HexColor('#2b6cb0'),
-                fontName='Helvetica-Bold',
-                borderWidth=2,
-                borderColor=colors.HexColor('#2b6cb0'),
-                borderPadding=10,
-                backColor=colors.HexColor('#ebf8ff')
-            )
-
-            section_header_style = ParagraphStyle(
-                'EnhancedSectionHeaderStyle',
-                parent=styles['Heading2'],
-                fontSize=16,
-                spaceAfter=15,
-                spaceBefore=20,
-                textColor=colors.HexColor('#2d3748'),
-                fontName='Helvetica-Bold',
-                leftIndent=20,
-                borderWidth=1,
-                borderColor=colors.HexColor('#e2e8f0'),
-                borderPadding=8,
-                backColor=colors.HexColor('#f7fafc')
-            )
-
-            content_style = ParagraphStyle(
-                'EnhancedContentStyle',
-                parent=styles['Normal'],
-                fontSize=11,
-                spaceAfter=12,
-                leftIndent=30,
-                rightIndent=20,
-                textColor=colors.HexColor('#2d3748'),
-                fontName='Helvetica'
-            )
-
-            activity_style = ParagraphStyle(
-                'EnhancedActivityStyle',
-                parent=styles['Normal'],
-                fontSize=11,
-                spaceAfter=12,
-                leftIndent=30,
-                rightIndent=20,
-                textColor=colors.HexColor('#2d3748'),
-                fontName='Helvetica',
-                backColor=colors.HexColor('#fffbeb'),
-                borderWidth=1,
-                borderColor=colors.HexColor('#f59e0b'),
-                borderPadding=10
-            )
-
-            story = []
-
-            # Enhanced title page
-            story.append(Paragraph("Learning Module", title_style))
-            story.append(Spacer(1, 20))
-            story.append(Paragraph(f"{module_info['course_code']} - {module_info['course_title']}", course_style))
-            story.append(Spacer(1, 30))
-
-            # Extract module title from HTML
-            soup = BeautifulSoup(module_info['content_html'], 'html.parser')
-            module_title_elem = soup.find('h2')
-            module_title = module_title_elem.get_text() if module_title_elem else f"Module {module_info['position']}"
-
-            story.append(Paragraph(module_title, module_header_style))
-            story.append(Spacer(1, 20))
-
-            # Module description
-            desc_elem = soup.find('div', class_='module-description')
-            if desc_elem:
-                desc_text = desc_elem.get_text().strip()
-                if desc_text:
-                    story.append(Paragraph(f"<b>Module Overview:</b><br/>{desc_text}", content_style))
-                    story.append(Spacer(1, 15))
-
-            # Learning outcomes with enhanced styling
-            if module_info['learning_outcomes']:
-                try:
-                    outcomes = json.loads(module_info['learning_outcomes'])
-                    if outcomes:
-                        story.append(Paragraph("<b>Learning Outcomes:</b>", section_header_style))
-                        for outcome in outcomes:
-                            story.append(Paragraph(f"• {outcome}", content_style))
-                        story.append(Spacer(1, 20))
-                except:
-                    pass
-
-            story.append(PageBreak())
-
-            # Enhanced sections with page breaks
-            for section in sections:
-                story.append(Paragraph(f"Section {section['position']}: {section['title']}", section_header_style))
-                story.append(Spacer(1, 15))
-
-                if section['content']:
-                    # Use BeautifulSoup to clean HTML but preserve line breaks and paragraphs
-                    section_soup = BeautifulSoup(section['content'], 'html.parser')
-
-                    # Replace HTML elements with text equivalents while preserving structure
-                    for br in section_soup.find_all('br'):
-                        br.replace_with('\n')
-
-                    for p in section_soup.find_all('p'):
-                        p.insert_after('\n\n')
-
-                    for div in section_soup.find_all('div'):
-                        div.insert_after('\n')
-
-                    # Convert formatting tags
-                    for tag in section_soup.find_all(['strong', 'b']):
-                        if tag.get_text():
-                            tag.replace_with(f"<b>{tag.get_text()}</b>")
-
-                    for tag in section_soup.find_all(['em', 'i']):
-                        if tag.get_text():
-                            tag.replace_with(f"<i>{tag.get_text()}</i>")
-
-                    for tag in section_soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6']):
-                        if tag.get_text():
-                            tag.replace_with(f"<b>{tag.get_text()}</b>\n\n")
-
-                    # Get text with preserved line breaks
-                    clean_content = section_soup.get_text()
-
-                    # Split by single newlines to preserve line structure
-                    lines = clean_content.split('\n')
-                    current_paragraph = []
-
-                    for line in lines:
-                        line = line.strip()
-                        if line:
-                            current_paragraph.append(line)
-                        else:
-                            # Empty line indicates paragraph break
-                            if current_paragraph:
-                                para_text = ' '.join(current_paragraph)
-                                if para_text:
-                                    story.append(Paragraph(para_text, content_style))
-                                    story.append(Spacer(1, 8))
-                                current_paragraph = []
-
-                    # Handle any remaining content
-                    if current_paragraph:
-                        para_text = ' '.join(current_paragraph)
-                        if para_text:
-                            story.append(Paragraph(para_text, content_style))
-                            story.append(Spacer(1, 8))
-
-                story.append(PageBreak())  # Each section starts on new page
-
-            # Enhanced activities section
-            if activities:
-                story.append(Paragraph("Module Activities", section_header_style))
-                story.append(Spacer(1, 15))
+                SELECT s.module_id, s.title, s.content
+                FROM module_sections s
+                JOIN modules_master m ON s.module_id = m.module_id
+                WHERE m.course_id = %s
+                ORDER BY s.module_id, s.position
+            """, (course_id,))
+            sections_by_module = {}
+            for section in cursor.fetchall():
+                sections_by_module.setdefault(section['module_id'], []).append(section)
 
+            cursor.execute("""
+                SELECT a.module_id, a.title, a.instructions, a.activity_type
+                FROM module_activities a
+                JOIN modules_master m ON a.module_id = m.module_id
+                WHERE m.course_id = %s
+                ORDER BY a.module_id, a.position
+            """, (course_id,))
+            activities_by_module = {}
+            for activity in cursor.fetchall():
+                activities_by_module.setdefault(activity['module_id'], []).append(activity)
+
+    styles = get_styles()
+    normal = styles['Normal']
+    heading_style = styles['CustomHeading']
+    subheading_style = styles['CustomSubHeading']
+
+    def story():
+        # Course title page
+        yield Paragraph(escape(course['course_title']), styles['CustomTitle'])
+        yield Spacer(1, 20)
+        if course['description']:
+            yield Paragraph(escape(course['description']), normal)
+        yield PageBreak()
+
+        for i, module in enumerate(modules):
+            # Module header
+            yield Paragraph(escape(display_title(module['module_title'], module['position'])), heading_style)
+            if module['module_description']:
+                yield Paragraph(escape(module['module_description']), normal)
+                yield Spacer(1, 12)
+
+            # Learning outcomes
+            if module['learning_outcomes']:
+                outcomes = json.loads(module['learning_outcomes'])
+                yield Paragraph("Learning Outcomes:", subheading_style)
+                for outcome in outcomes:
+                    yield Paragraph(f"• {escape(str(outcome))}", normal)
+                yield Spacer(1, 12)
+
+            for section in sections_by_module.get(module['module_id'], ()):
+                if section['title'] and section['content']:
+                    yield Paragraph(escape(section['title']), subheading_style)
+                    yield from html_to_flowables(section['content'], normal, heading=subheading_style,
+                                                 code=styles['CodeBlock'])
+                    yield Spacer(1, 12)
+
+            # Add activities after sections
+            activities = activities_by_module.get(module['module_id'])
+            if activities:
+                yield Paragraph("Module Activities", subheading_style)
                 for activity in activities:
-                    activity_title = f"Activity {activity['position']}: {activity['title']}"
-                    story.append(Paragraph(activity_title, section_header_style))
-                    story.append(Spacer(1, 10))
-
-                    story.append(Paragraph(f"<b>Type:</b> {activity['activity_type'].replace('_', ' ').title()}", activity_style))
-                    story.append(Spacer(1, 8))
-
-                    if activity['instructions']:
-                        instructions_soup = BeautifulSoup(activity['instructions'], 'html.parser')
-                        clean_instructions = instructions_soup.get_text().strip()
-                        story.append(Paragraph(f"<b>Instructions:</b><br/>{clean_instructions}", activity_style))
-
-                    story.append(Spacer(1, 15))
-
-            # Build PDF
-            doc.build(story)
-            buffer.seek(0)
-
-            # Generate filename with course code, module number, and module name
-            safe_module_title = re.sub(r'[^\w\s-]', '', module_title).strip()
-            safe_module_title = re.sub(r'[-\s]+', ' ', safe_module_title)
-            filename = f"{module_info['course_code']}_Module {module_info['position']}_{safe_module_title}.pdf"
-
-            return send_file(
-                    buffer,
-                    as_attachment=True,
-                    download_name=filename,
-                    mimetype='application/pdf'
-                )
+                    # Activity title with type badge
+                    yield Paragraph(escape(f"{activity['title']} ({activity['activity_type'].title()})"),
+                                    styles['Heading4'])
+                    yield Paragraph(html_to_markup(activity['instructions']), normal)
+                    yield Spacer(1, 12)
+
+            # Add page break after each module (except the last one)
+            if i < len(modules) - 1:
+                yield PageBreak()
+
+    return build_pdf(story(), 'course'), f"{course['course_title']}.pdf"
 
-    except Exception as e:
-        print(f"Error generating enhanced module PDF: {str(e)}")
-        traceback.print_exc()
-        return jsonify({
-            'success': False,
-            'message': 'Error generating module PDF',
-            'error': str(e)
-        }), 500
 
 @modules_bp.route('/export-pdf/<int:course_id>', methods=['GET'])
 @api_key_required
 def export_course_pdf(course_id):
     try:
-        db = get_db()
-        with db.cursor() as cursor:
-                # Get course info
-                cursor.execute("SELECT course_title, description FROM courses_master WHERE course_id = %s", (course_id,))
-                course = cursor.fetchone()
-
-                if not course:
-                    return jsonify({'error': 'Course not found'}), 404
-
-                # Get modules
-                cursor.execute("""
-                    SELECT module_id, position, content_html, learning_outcomes
-                    FROM modules_master
-                    WHERE course_id = %s
-                    ORDER BY position
-                """, (course_id,))
-                modules = cursor.fetchall()
-
-                # Create PDF
-                buffer = io.BytesIO()
-                doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
-
-                # Styles
-                styles = getSampleStyleSheet()
-                title_style = ParagraphStyle('CustomTitle', parent=styles['Heading1'], fontSize=24, spaceAfter=30)
-                heading_style = ParagraphStyle('CustomHeading', parent=styles['Heading2'], fontSize=18, spaceAfter=20)
-                subheading_style = ParagraphStyle('CustomSubHeading', parent=styles['Heading3'], fontSize=14, spaceAfter=12)
-                code_style = ParagraphStyle('CodeBlock', parent=styles['Code'], fontName='Courier', fontSize=9, leftIndent=20, spaceAfter=2)
-
-                story = []
-
-                # Course title page
-                story.append(Paragraph(course['course_title'], title_style))
-                story.append(Spacer(1, 20))
-                if course['description']:
-                    story.append(Paragraph(course['description'], styles['Normal']))
-                story.append(PageBreak())
-
-                # Process each module
-                for i, module in enumerate(modules):
-                    # Extract module title and description
-                    title_match = re.search(r'<h2>(.*?)</h2>', module['content_html'])
-                    desc_match = re.search(r'<div class="module-description">\s*<p>(.*?)</p>', module['content_html'], re.DOTALL)
-
-                    module_title = title_match.group(1) if title_match else f"Module {module['position']}"
-                    module_description = desc_match.group(1).strip() if desc_match else ""
-
-                    # Module header
-                    story.append(Paragraph(module_title, heading_style))
-                    if module_description:
-                        story.append(Paragraph(module_description, styles['Normal']))
-                        story.append(Spacer(1, 12))
-
-                    # Learning outcomes
-                    if module['learning_outcomes']:
-                        outcomes = json.loads(module['learning_outcomes'])
-                        story.append(Paragraph("Learning Outcomes:", subheading_style))
-                        for outcome in outcomes:
-                            story.append(Paragraph(f"• {outcome}", styles['Normal']))
-                        story.append(Spacer(1, 12))
-
-                    # Get sections for this module
-                    cursor.execute("""
-                        SELECT title, content
-                        FROM module_sections
-                        WHERE module_id = %s
-                        ORDER BY position
-                    """, (module['module_id'],))
-                    sections = cursor.fetchall()
-
-                    # Add sections
-                    for section in sections:
-                        if section['title'] and section['content']:
-                            story.append(Paragraph(section['title'], subheading_style))
-
-                            # Parse HTML content
-                            soup = BeautifulSoup(section['content'], 'html.parser')
-                            for element in soup.find_all(['p', 'h4', 'ul', 'li', 'pre']):
-                                if element.name == 'h4':
-                                    story.append(Paragraph(element.get_text(), subheading_style))
-                                elif element.name == 'p':
-                                    story.append(Paragraph(element.get_text(), styles['Normal']))
-                                elif element.name == 'ul':
-                                    for li in element.find_all('li'):
-                                        story.append(Paragraph(f"• {li.get_text()}", styles['Normal']))
-                                elif element.name == 'pre':
-                                    code_text = element.get_text()
-                                    # Add space before code block
-                                    story.append(Spacer(1, 8))
-                                    # Split code into lines and create separate paragraphs for each line
-                                    code_lines = code_text.split('\n')
-                                    for line in code_lines:
-                                        if line.strip():  # Only add non-empty lines
-                                            story.append(Paragraph(line, code_style))
-                                    # Add space after code block
-                                    story.append(Spacer(1, 8))
-
-                            story.append(Spacer(1, 12))
-
-                    # Get activities for this module
-                    cursor.execute("""
-                        SELECT title, instructions, activity_type
-                        FROM module_activities
-                        WHERE module_id = %s
-                        ORDER BY position
-                    """, (module['module_id'],))
-                    activities = cursor.fetchall()
-
-                    # Add activities after sections
-                    if activities:
-                        story.append(Paragraph("Module Activities", subheading_style))
-                        for activity in activities:
-                            # Activity title with type badge
-                            activity_title = f"{activity['title']} ({activity['activity_type'].title()})"
-                            story.append(Paragraph(activity_title, styles['Heading4']))
-
-                            # Clean activity instructions for PDF
-                            clean_instructions = activity['instructions'].replace('<br><br>', '\n\n').replace('<br>', '\n')
-                            story.append(Paragraph(clean_instructions, styles['Normal']))
-                            story.append(Spacer(1, 12))
-
-                    # Add page break after each module (except the last one)
-                    if i < len(modules) - 1:
-                        story.append(PageBreak())
-
-                doc.build(story)
-                buffer.seek(0)
-
-                return send_file(
-                    buffer,
-                    as_attachment=True,
-                    download_name=f"{course['course_title']}.pdf",
-                    mimetype='application/pdf'
-                )
-
+        return _cached_pdf_response('course', course_id, _course_version, _render_course_pdf)
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
     except ImportError:
         return jsonify({
             'success': False,
@@ -1002,7 +892,6 @@ def export_course_pdf(course_id):
 
 
 
-
 def clean_json_string(s):
     # Remove BOM if present
     s = s.lstrip('\ufeff')
@@ -1057,6 +946,8 @@ def delete_activity(activity_id):
     try:
         db = get_db()
         with db.cursor() as cursor:
+                cursor.execute("SELECT module_id FROM module_activities WHERE activity_id = %s", (activity_id,))
+                activity = cursor.fetchone()
                 cursor.execute("DELETE FROM module_activities WHERE activity_id = %s", (activity_id,))
                 db.commit()
                 if cursor.rowcount == 0:
@@ -1066,6 +957,8 @@ def delete_activity(activity_id):
                         'error': 'Activity not found'
                     }), 404
 
+                _invalidate_module_pdfs(cursor, activity['module_id'])
+
                 return jsonify({
                     'success': True,
                     'message': 'Activity deleted successfully'
@@ -1103,6 +996,11 @@ def update_activity():
                     WHERE activity_id = %s
                 """, (title, instructions, activity_id))
                 db.commit()
+
+                cursor.execute("SELECT module_id FROM module_activities WHERE activity_id = %s", (activity_id,))
+                activity = cursor.fetchone()
+                if activity:
+                    _invalidate_module_pdfs(cursor, activity['module_id'])
                 return jsonify({
                     'success': True,
                     'message': 'Activity updated successfully'
@@ -1148,8 +1046,9 @@ def create_manual_exam_item():
                     VALUES (%s, %s, %s, %s, %s, %s, %s)
                 """, (section_id, question, option_a,
                       option_b, option_c, option_d, correct_answer))
-            db.commit()
             item_id = cursor.lastrowid
+            question_pool.invalidate_for_section(cursor, section_id)
+            db.commit()
 
             return jsonify({
                     'success': True,
@@ -1226,116 +1125,91 @@ def get_single_submission_for_grading(submission_id):
 @modules_bp.route('/submission-tracking', methods=['GET'])
 @api_key_required
 def get_submission_tracking():
-    """Get submission tracking data for all course instances"""
+    """Get submission tracking data for course instances.
+
+    Optional page/per_page paginate the instance list; counts are computed
+    in one grouped query for the instances on the current page only.
+    """
     try:
         search_term = request.args.get('search', '')
+        page = request.args.get('page', type=int)
+        per_page = request.args.get('per_page', type=int)
 
         db = get_db()
         with db.cursor() as cursor:
                 # Get course instances with basic info
-                query = """
-                SELECT ci.instance_id, ci.course_id, cm.course_code, cm.course_title, ci.term_code
-                FROM course_instances ci
-                JOIN courses_master cm ON ci.course_id = cm.course_id
-                WHERE 1=1
-                """
-
+                where_clause = "WHERE 1=1"
                 params = []
                 if search_term:
-                    query += " AND (cm.course_code LIKE %s OR cm.course_title LIKE %s)"
+                    where_clause += " AND (cm.course_code LIKE %s OR cm.course_title LIKE %s)"
                     search_pattern = f"%{search_term}%"
                     params.extend([search_pattern, search_pattern])
 
-                query += " ORDER BY cm.course_code, ci.term_code"
+                query = f"""
+                SELECT ci.instance_id, ci.course_id, cm.course_code, cm.course_title, ci.term_code
+                FROM course_instances ci
+                JOIN courses_master cm ON ci.course_id = cm.course_id
+                {where_clause}
+                ORDER BY cm.course_code, ci.term_code, ci.instance_id
+                """
+
+                pagination = None
+                if page and per_page:
+                    cursor.execute(f"""
+                        SELECT COUNT(*) as total
+                        FROM course_instances ci
+                        JOIN courses_master cm ON ci.course_id = cm.course_id
+                        {where_clause}
+                    """, params)
+                    total = cursor.fetchone()['total']
+                    pagination = {
+                        'page': page,
+                        'per_page': per_page,
+                        'total': total,
+                        'pages': (total + per_page - 1) // per_page
+                    }
+                    query += " LIMIT %s OFFSET %s"
+                    params.extend([per_page, (page - 1) * per_page])
 
                 cursor.execute(query, params)
-                results = cursor.fetchall()
+                instances = cursor.fetchall()
+
+                counts = _submission_tracking_counts(cursor, instances)
 
                 courses = []
-                for result in results:
-                    # Handle both tuple and dict results
-                    if isinstance(result, dict):
-                        instance_id = result['instance_id']
-                        course_id = result['course_id']
-                        course_code = result['course_code']
-                        course_title = result['course_title']
-                        term_code = result['term_code']
-                    else:
-                        instance_id = result[0]
-                        course_id = result[1]
-                        course_code = result[2]
-                        course_title = result[3]
-                        term_code = result[4]
-
-                    # Get enrolled students count
-                    cursor.execute("SELECT COUNT(*) FROM enrollments WHERE instance_id = %s", (instance_id,))
-                    enrolled_result = cursor.fetchone()
-                    enrolled_students = enrolled_result[0] if isinstance(enrolled_result, tuple) else enrolled_result['COUNT(*)']
-
-                    # Get total activities for this course
-                    cursor.execute("""
-                        SELECT COUNT(*) FROM module_activities ma
-                        JOIN modules_master mm ON ma.module_id = mm.module_id
-                        WHERE mm.course_id = %s
-                    """, (course_id,))
-                    activities_result = cursor.fetchone()
-                    total_activities = activities_result[0] if isinstance(activities_result, tuple) else activities_result['COUNT(*)']
-
-                    # Get submitted count for this instance
-                    cursor.execute("""
-                        SELECT COUNT(*) FROM activity_submissions asub
-                        JOIN enrollments e ON asub.user_id = e.user_id
-                        JOIN module_activities ma ON asub.activity_id = ma.activity_id
-                        JOIN modules_master mm ON ma.module_id = mm.module_id
-                        WHERE e.instance_id = %s AND mm.course_id = %s
-                    """, (instance_id, course_id))
-                    submitted_result = cursor.fetchone()
-                    submitted_count = submitted_result[0] if isinstance(submitted_result, tuple) else submitted_result['COUNT(*)']
-
-                    # Get total quizzes for this course
-                    cursor.execute("""
-                        SELECT COUNT(DISTINCT et.exam_type_id) FROM assessment_scopes a_scope
-                        JOIN exam_types et ON a_scope.exam_type_id = et.exam_type_id
-                        WHERE a_scope.course_id = %s AND et.category = 'quiz'
-                    """, (course_id,))
-                    quiz_result = cursor.fetchone()
-                    total_quizzes = quiz_result[0] if isinstance(quiz_result, tuple) else quiz_result['COUNT(DISTINCT et.exam_type_id)']
-
-                    # Get total exams for this course
-                    cursor.execute("""
-                        SELECT COUNT(DISTINCT et.exam_type_id) FROM assessment_scopes a_scope
-                        JOIN exam_types et ON a_scope.exam_type_id = et.exam_type_id
-                        WHERE a_scope.course_id = %s AND et.category = 'exam'
-                    """, (course_id,))
-                    exam_result = cursor.fetchone()
-                    total_exams = exam_result[0] if isinstance(exam_result, tuple) else exam_result['COUNT(DISTINCT et.exam_type_id)']
+                for instance in instances:
+                    instance_counts = counts.get(instance['instance_id'], {})
+                    enrolled_students = instance_counts.get('enrolled_students') or 0
+                    total_activities = instance_counts.get('total_activities') or 0
+                    submitted_count = instance_counts.get('submitted_count') or 0
+                    total_quizzes = instance_counts.get('total_quizzes') or 0
+                    total_exams = instance_counts.get('total_exams') or 0
 
                     # Get completed counts (placeholder until exam submission tracking is implemented)
                     completed_quizzes = 0
                     completed_exams = 0
 
-                    total_required = enrolled_students * total_activities
-                    total_quizzes_required = enrolled_students * total_quizzes
-                    total_exams_required = enrolled_students * total_exams
-
                     courses.append({
-                        'instance_id': instance_id,
-                        'course_code': course_code,
-                        'course_title': course_title,
-                        'term_code': term_code,
+                        'instance_id': instance['instance_id'],
+                        'course_code': instance['course_code'],
+                        'course_title': instance['course_title'],
+                        'term_code': instance['term_code'],
                         'enrolled_students': enrolled_students,
                         'total_activities': total_activities,
-                        'total_required': total_required,
+                        'total_required': enrolled_students * total_activities,
                         'submitted_count': submitted_count,
                         'total_quizzes': total_quizzes,
-                        'total_quizzes_required': total_quizzes_required,
+                        'total_quizzes_required': enrolled_students * total_quizzes,
                         'completed_quizzes': completed_quizzes,
                         'total_exams': total_exams,
-                        'total_exams_required': total_exams_required,
+                        'total_exams_required': enrolled_students * total_exams,
                         'completed_exams': completed_exams
                     })
 
-                return jsonify({'courses': courses})
+                result = {'courses': courses}
+                if pagination:
+                    result['pagination'] = pagination
+                return jsonify(result)
 
     except Exception as e:
         print(f"Error in submission tracking: {str(e)}")
@@ -1346,6 +1220,66 @@ def get_submission_tracking():
             'error': str(e)
         }), 500
 
+
+def _submission_tracking_counts(cursor, instances):
+    """Per-instance tracking counts for the given instances in a single query.
+
+    Each count is a derived table grouped once and restricted to the
+    requested instances/courses, then joined back to course_instances.
+    """
+    if not instances:
+        return {}
+    instance_ids = [row['instance_id'] for row in instances]
+    course_ids = list({row['course_id'] for row in instances})
+    instance_in = ', '.join(['%s'] * len(instance_ids))
+    course_in = ', '.join(['%s'] * len(course_ids))
+
+    cursor.execute(f"""
+        SELECT
+            ci.instance_id,
+            COALESCE(en.enrolled_students, 0) AS enrolled_students,
+            COALESCE(act.total_activities, 0) AS total_activities,
+            COALESCE(sub.submitted_count, 0) AS submitted_count,
+            COALESCE(asm.total_quizzes, 0) AS total_quizzes,
+            COALESCE(asm.total_exams, 0) AS total_exams
+        FROM course_instances ci
+        LEFT JOIN (
+            SELECT instance_id, COUNT(*) AS enrolled_students
+            FROM enrollments
+            WHERE instance_id IN ({instance_in})
+            GROUP BY instance_id
+        ) en ON en.instance_id = ci.instance_id
+        LEFT JOIN (
+            SELECT mm.course_id, COUNT(*) AS total_activities
+            FROM module_activities ma
+            JOIN modules_master mm ON ma.module_id = mm.module_id
+            WHERE mm.course_id IN ({course_in})
+            GROUP BY mm.course_id
+        ) act ON act.course_id = ci.course_id
+        LEFT JOIN (
+            SELECT e.instance_id, COUNT(*) AS submitted_count
+            FROM activity_submissions asub
+            JOIN enrollments e ON asub.user_id = e.user_id
+            JOIN course_instances sci ON e.instance_id = sci.instance_id
+            JOIN module_activities ma ON asub.activity_id = ma.activity_id
+            JOIN modules_master mm ON ma.module_id = mm.module_id AND mm.course_id = sci.course_id
+            WHERE e.instance_id IN ({instance_in})
+            GROUP BY e.instance_id
+        ) sub ON sub.instance_id = ci.instance_id
+        LEFT JOIN (
+            SELECT a_scope.course_id,
+                   COUNT(DISTINCT CASE WHEN et.category = 'quiz' THEN et.exam_type_id END) AS total_quizzes,
+                   COUNT(DISTINCT CASE WHEN et.category = 'exam' THEN et.exam_type_id END) AS total_exams
+            FROM assessment_scopes a_scope
+            JOIN exam_types et ON a_scope.exam_type_id = et.exam_type_id
+            WHERE a_scope.course_id IN ({course_in})
+            GROUP BY a_scope.course_id
+        ) asm ON asm.course_id = ci.course_id
+        WHERE ci.instance_id IN ({instance_in})
+    """, instance_ids + course_ids + instance_ids + course_ids + instance_ids)
+
+    return {row['instance_id']: row for row in cursor.fetchall()}
+
 @modules_bp.route('/activity-grading/courses-with-pending', methods=['GET'])
 @api_key_required
 def get_courses_with_pending_counts():
@@ -1451,7 +1385,7 @@ def get_course_activities_for_grading(instance_id):
                         ma.instructions,
                         ma.position,
                         mm.module_id,
-                        mm.content_html,
+                        mm.module_title,
                         COUNT(asub.submission_id) as pending_count
                     FROM module_activities ma
                     JOIN modules_master mm ON ma.module_id = mm.module_id
@@ -1463,24 +1397,15 @@ def get_course_activities_for_grading(instance_id):
                         WHERE e.instance_id = %s AND asub.status = 'submitted'
                     ) asub ON ma.activity_id = asub.activity_id
                     WHERE ci.instance_id = %s
-                    GROUP BY ma.activity_id, ma.title, ma.instructions, ma.position, mm.module_id, mm.content_html
+                    GROUP BY ma.activity_id, ma.title, ma.instructions, ma.position, mm.module_id, mm.module_title
                     HAVING COUNT(asub.submission_id) > 0
                     ORDER BY mm.position, ma.position
                 """, (instance_id, instance_id))
 
                 activities = cursor.fetchall()
 
-                # Extract module titles from content_html
                 for activity in activities:
-                    title_match = activity['content_html'].find('<h2>')
-                    if title_match != -1:
-                        end_match = activity['content_html'].find('</h2>', title_match)
-                        if end_match != -1:
-                            activity['module_title'] = activity['content_html'][title_match+4:end_match]
-                        else:
-                            activity['module_title'] = f"Module {activity['module_id']}"
-                    else:
-                        activity['module_title'] = f"Module {activity['module_id']}"
+                    activity['module_title'] = activity['module_title'] or f"Module {activity['module_id']}"
 
                 return jsonify({'activities': activities})
 
@@ -1607,6 +1532,7 @@ def update_exam_item():
                     SET question = %s, option_a = %s, option_b = %s, option_c = %s, option_d = %s, correct_answer = %s
                     WHERE item_id = %s
                 """, (question, option_a, option_b, option_c, option_d, correct_answer, item_id))
+                question_pool.invalidate_for_item(cursor, item_id)
                 db.commit()
                 return jsonify({'success': True})
 
@@ -1623,7 +1549,9 @@ def delete_exam_item(item_id):
     try:
         db = get_db()
         with db.cursor() as cursor:
+                question_pool.invalidate_for_item(cursor, item_id)
                 cursor.execute("DELETE FROM exam_items WHERE item_id = %s", (item_id,))
+                db.commit()
 
                 return jsonify({'success': True})
 
@@ -1634,401 +1562,378 @@ def delete_exam_item(item_id):
             'error': str(e)
             }), 500
 
-@modules_bp.route('/export-exam-items-pdf/<int:module_id>', methods=['GET'])
-@api_key_required
-def export_exam_items_pdf(module_id):
-    try:
-        from reportlab.lib.pagesizes import A4
-        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.lib import colors
-        from reportlab.lib.enums import TA_CENTER
-        import io
-        from flask import make_response
+def _exam_item_flowables(item, number, styles):
+    yield Paragraph(f"{number}. {escape(str(item['question']))}", styles['ExamQuestion'])
+    for letter in 'abcd':
+        yield Paragraph(f"{letter.upper()}. {escape(str(item['option_' + letter]))}", styles['ExamOption'])
+    yield Paragraph(f"Correct Answer: {escape(str(item['correct_answer']))}", styles['ExamAnswer'])
 
-        db = get_db()
-        with db.cursor() as cursor:
-                # Get module and course information
-                cursor.execute("""
-                    SELECT m.content_html, c.course_code, c.course_title, m.position
-                    FROM modules_master m
-                    JOIN courses_master c ON m.course_id = c.course_id
-                    WHERE m.module_id = %s
-                """, (module_id,))
-                module_info = cursor.fetchone()
-
-                if not module_info:
-                    return jsonify({'error': 'Module not found'}), 404
 
-                # Extract module title from HTML content
-                from html import unescape
-                content_text = re.sub('<[^<]+?>', '', module_info['content_html'])
-                content_text = unescape(content_text)
-                module_title = content_text.split('\n')[0].strip() if content_text else f"Module {module_info['position']}"
-
-                # Get sections and their exam items
-                cursor.execute("""
-                    SELECT s.section_id, s.title, s.position,
-                           e.item_id, e.question, e.option_a, e.option_b, e.option_c, e.option_d, e.correct_answer
-                    FROM module_sections s
-                    LEFT JOIN exam_items e ON s.section_id = e.section_id
-                    WHERE s.module_id = %s
-                    ORDER BY s.position, e.item_id
-                """, (module_id,))
-                results = cursor.fetchall()
-
-                # Organize data by sections
-                sections_data = {}
-                for row in results:
-                    section_id = row['section_id']
-                    if section_id not in sections_data:
-                        sections_data[section_id] = {
-                            'title': row['title'],
-                            'position': row['position'],
-                            'items': []
-                        }
-
-                    if row['item_id']:  # Only add if there's an exam item
-                        sections_data[section_id]['items'].append({
-                            'question': row['question'],
-                            'option_a': row['option_a'],
-                            'option_b': row['option_b'],
-                            'option_c': row['option_c'],
-                            'option_d': row['option_d'],
-                            'correct_answer': row['correct_answer']
-                        })
-
-                # Create PDF
-                buffer = io.BytesIO()
-                doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
-
-                # Styles
-                styles = getSampleStyleSheet()
-                title_style = ParagraphStyle(
-                    'CustomTitle',
-                    parent=styles['Heading1'],
-                    fontSize=18,
-                    spaceAfter=30,
-                    alignment=TA_CENTER,
-                    textColor=colors.HexColor('#2c3e50')
-                )
+def _render_exam_items_pdf(db, module_id):
+    """Build the exam items PDF for one module; returns (pdf_bytes, filename)."""
+    with db.cursor() as cursor:
+            # Get module and course information
+            cursor.execute("""
+                SELECT m.module_title, c.course_code, c.course_title, m.position
+                FROM modules_master m
+                JOIN courses_master c ON m.course_id = c.course_id
+                WHERE m.module_id = %s
+            """, (module_id,))
+            module_info = cursor.fetchone()
 
-                course_style = ParagraphStyle(
-                    'CourseStyle',
-                    parent=styles['Heading2'],
-                    fontSize=14,
-                    spaceAfter=20,
-                    alignment=TA_CENTER,
-                    textColor=colors.HexColor('#34495e')
-                )
+            if not module_info:
+                raise LookupError('Module not found')
 
-                section_style = ParagraphStyle(
-                    'SectionStyle',
-                    parent=styles['Heading2'],
-                    fontSize=14,
-                    spaceAfter=12,
-                    textColor=colors.HexColor('#2980b9')
-                )
+            module_title = display_title(module_info['module_title'], module_info['position'])
 
-                question_style = ParagraphStyle(
-                    'QuestionStyle',
-                    parent=styles['Normal'],
-                    fontSize=11,
-                    spaceAfter=8,
-                    leftIndent=20,
-                    fontName='Helvetica-Bold'
-                )
+            # Get sections and their exam items
+            cursor.execute("""
+                SELECT s.section_id, s.title, s.position,
+                       e.item_id, e.question, e.option_a, e.option_b, e.option_c, e.option_d, e.correct_answer
+                FROM module_sections s
+                LEFT JOIN exam_items e ON s.section_id = e.section_id
+                WHERE s.module_id = %s
+                ORDER BY s.position, e.item_id
+            """, (module_id,))
+            results = cursor.fetchall()
 
-                option_style = ParagraphStyle(
-                    'OptionStyle',
-                    parent=styles['Normal'],
-                    fontSize=10,
-                    spaceAfter=4,
-                    leftIndent=40
-                )
+            # Organize data by sections
+            sections_data = {}
+            for row in results:
+                section_id = row['section_id']
+                if section_id not in sections_data:
+                    sections_data[section_id] = {
+                        'title': row['title'],
+                        'position': row['position'],
+                        'items': []
+                    }
 
-                answer_style = ParagraphStyle(
-                    'AnswerStyle',
-                    parent=styles['Normal'],
-                    fontSize=10,
-                    spaceAfter=15,
-                    leftIndent=40,
-                    textColor=colors.HexColor('#27ae60'),
-                    fontName='Helvetica-Bold'
-                )
+                if row['item_id']:  # Only add if there's an exam item
+                    sections_data[section_id]['items'].append(row)
 
-                # Build PDF content
-                story = []
+    styles = get_styles()
 
-                # Title page
-                story.append(Paragraph("EXAM ITEMS", title_style))
-                story.append(Paragraph(f"{module_info['course_code']} - {module_info['course_title']}", course_style))
-                story.append(Paragraph(f"{module_title}", course_style))
-                story.append(Spacer(1, 30))
+    def story():
+        # Title page
+        yield Paragraph("EXAM ITEMS", styles['ExamTitle'])
+        yield Paragraph(escape(f"{module_info['course_code']} - {module_info['course_title']}"), styles['ExamCourse'])
+        yield Paragraph(escape(module_title), styles['ExamCourse'])
+        yield Spacer(1, 30)
 
-                # Add sections and questions
-                question_number = 1
-                for section_id in sorted(sections_data.keys(), key=lambda x: sections_data[x]['position']):
-                    section = sections_data[section_id]
+        # Add sections and questions
+        question_number = 1
+        for section in sorted(sections_data.values(), key=lambda s: s['position']):
+            if section['items']:  # Only show sections with exam items
+                yield Paragraph(escape(f"Section {section['position']}: {section['title']}"), styles['ExamSection'])
+                yield Spacer(1, 12)
 
-                    if section['items']:  # Only show sections with exam items
-                        story.append(Paragraph(f"Section {section['position']}: {section['title']}", section_style))
-                        story.append(Spacer(1, 12))
+                for item in section['items']:
+                    yield from _exam_item_flowables(item, question_number, styles)
+                    question_number += 1
 
-                        for item in section['items']:
-                            # Question
-                            story.append(Paragraph(f"{question_number}. {item['question']}", question_style))
+                yield Spacer(1, 20)
 
-                            # Options
-                            story.append(Paragraph(f"A. {item['option_a']}", option_style))
-                            story.append(Paragraph(f"B. {item['option_b']}", option_style))
-                            story.append(Paragraph(f"C. {item['option_c']}", option_style))
-                            story.append(Paragraph(f"D. {item['option_d']}", option_style))
+        if question_number == 1:  # No questions found
+            yield Paragraph("No exam items found for this module.", styles['Normal'])
 
-                            # Correct answer
-                            story.append(Paragraph(f"Correct Answer: {item['correct_answer']}", answer_style))
+    pdf = build_pdf(story(), 'exam_items')
+    return pdf, f"{module_info['course_code']}_Module_{module_info['position']}_Exam_Items.pdf"
 
-                            question_number += 1
 
-                        story.append(Spacer(1, 20))
+@modules_bp.route('/export-exam-items-pdf/<int:module_id>', methods=['GET'])
+@api_key_required
+def export_exam_items_pdf(module_id):
+    try:
+        pdf, filename = _render_exam_items_pdf(get_db(), module_id)
+        return _pdf_response(pdf, filename)
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    except ImportError:
+        return jsonify({'error': 'PDF generation library not available. Please install reportlab.'}), 500
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': 'Error exporting exam items to PDF',
+            'error': str(e)
+            }), 500
 
-                if question_number == 1:  # No questions found
-                    story.append(Paragraph("No exam items found for this module.", styles['Normal']))
+def _render_all_exam_items_pdf(db, course_id):
+    """Build the exam items PDF for every module of a course; returns (pdf_bytes, filename)."""
+    with db.cursor() as cursor:
+            # Get course information
+            cursor.execute("""
+                SELECT course_code, course_title, description
+                FROM courses_master
+                WHERE course_id = %s
+            """, (course_id,))
+            course_info = cursor.fetchone()
 
-                # Build PDF
-                doc.build(story)
+            if not course_info:
+                raise LookupError('Course not found')
 
-                # Prepare response
-                buffer.seek(0)
-                response = make_response(buffer.getvalue())
-                response.headers['Content-Type'] = 'application/pdf'
-                response.headers['Content-Disposition'] = f'attachment; filename="{module_info["course_code"]}_Module_{module_info["position"]}_Exam_Items.pdf"'
+            # Get all modules with their sections and exam items
+            cursor.execute("""
+                SELECT m.module_id, m.module_title, m.position as module_position,
+                       s.section_id, s.title as section_title, s.position as section_position,
+                       e.item_id, e.question, e.option_a, e.option_b, e.option_c, e.option_d, e.correct_answer
+                FROM modules_master m
+                LEFT JOIN module_sections s ON m.module_id = s.module_id
+                LEFT JOIN exam_items e ON s.section_id = e.section_id
+                WHERE m.course_id = %s
+                ORDER BY m.position, s.position, e.item_id
+            """, (course_id,))
+            results = cursor.fetchall()
+
+            # Organize data by modules and sections
+            modules_data = {}
+            for row in results:
+                module_id = row['module_id']
+                if module_id not in modules_data:
+                    modules_data[module_id] = {
+                        'title': display_title(row['module_title'], row['module_position']),
+                        'position': row['module_position'],
+                        'sections': {}
+                    }
+
+                section_id = row['section_id']
+                if section_id and section_id not in modules_data[module_id]['sections']:
+                    modules_data[module_id]['sections'][section_id] = {
+                        'title': row['section_title'],
+                        'position': row['section_position'],
+                        'items': []
+                    }
+
+                if row['item_id'] and section_id:  # Only add if there's an exam item
+                    modules_data[module_id]['sections'][section_id]['items'].append(row)
+
+    styles = get_styles()
+
+    def story():
+        # Title page
+        yield Paragraph("EXAM ITEMS - ALL MODULES", styles['ExamTitleLarge'])
+        yield Paragraph(escape(f"{course_info['course_code']} - {course_info['course_title']}"),
+                        styles['ExamCourseLarge'])
+        yield Spacer(1, 30)
+
+        # Add modules, sections and questions
+        question_number = 1
+        for module in sorted(modules_data.values(), key=lambda m: m['position']):
+            # Skip modules without any exam items
+            if not any(section['items'] for section in module['sections'].values()):
+                continue
+
+            # Add page break before each module (except first)
+            if question_number > 1:
+                yield PageBreak()
+
+            yield Paragraph(escape(f"Module {module['position']}: {module['title']}"), styles['ExamModule'])
+            yield Spacer(1, 20)
+
+            for section in sorted(module['sections'].values(), key=lambda s: s['position']):
+                if section['items']:  # Only show sections with exam items
+                    yield Paragraph(escape(f"Section {section['position']}: {section['title']}"),
+                                    styles['ExamSection'])
+                    yield Spacer(1, 12)
+
+                    for item in section['items']:
+                        yield from _exam_item_flowables(item, question_number, styles)
+                        question_number += 1
+
+                    yield Spacer(1, 20)
+
+        if question_number == 1:  # No questions found
+            yield Paragraph("No exam items found for this course.", styles['Normal'])
+
+    pdf = build_pdf(story(), 'all_exam_items')
+    return pdf, f"{course_info['course_code']}_All_Modules_Exam_Items.pdf"
 
-                return response
 
+@modules_bp.route('/export-all-exam-items-pdf/<int:course_id>', methods=['GET'])
+@api_key_required
+def export_all_exam_items_pdf(course_id):
+    try:
+        pdf, filename = _render_all_exam_items_pdf(get_db(), course_id)
+        return _pdf_response(pdf, filename)
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
     except ImportError:
         return jsonify({'error': 'PDF generation library not available. Please install reportlab.'}), 500
     except Exception as e:
         return jsonify({
             'success': False,
-            'message': 'Error exporting exam items to PDF',
+            'message': 'Error exporting all exam items to PDF',
             'error': str(e)
             }), 500
 
-@modules_bp.route('/export-all-exam-items-pdf/<int:course_id>', methods=['GET'])
+@modules_bp.route('/pdf-cache-stats', methods=['GET'])
 @api_key_required
-def export_all_exam_items_pdf(course_id):
+def get_pdf_cache_stats():
+    return jsonify({'success': True, 'cache': pdf_cache.stats()})
+
+
+def _content_version(db, parts):
+    """Fingerprint the rows behind an export in one round trip.
+
+    ``parts`` is a list of (FROM ... WHERE clause, column list, params). Each
+    part contributes its row count and an order-independent 64-bit hash of
+    its rows; None is returned when the first part (the export target
+    itself) has no rows.
+    """
+    selects = []
+    params = []
+    for from_where, columns, part_params in parts:
+        # CONCAT_WS skips NULLs, which would let ('a', NULL) and (NULL, 'a') hash alike
+        columns = ', '.join(f"COALESCE({column.strip()}, 0x00)" for column in columns.split(','))
+        selects.append(f"""
+            (SELECT CONCAT(COUNT(*), ':', COALESCE(BIT_XOR(
+                CAST(CONV(LEFT(SHA1(CONCAT_WS(0x1f, {columns})), 16), 16, 10) AS UNSIGNED)), 0))
+             FROM {from_where})
+        """)
+        params.extend(part_params)
+    with db.cursor() as cursor:
+        cursor.execute("SELECT " + " , ".join(f"{sql} AS p{i}" for i, sql in enumerate(selects)), params)
+        row = cursor.fetchone()
+    versions = [row[f"p{i}"] for i in range(len(parts))]
+    if versions[0].startswith('0:'):
+        return None
+    return '|'.join(versions)
+
+
+def _single_module_version(db, module_id):
+    return _content_version(db, [
+        ("modules_master m JOIN courses_master c ON m.course_id = c.course_id WHERE m.module_id = %s",
+         "m.module_id, m.position, m.module_title, m.module_description, m.learning_outcomes, "
+         "c.course_code, c.course_title, c.description",
+         (module_id,)),
+        ("module_sections WHERE module_id = %s", "section_id, position, title, content", (module_id,)),
+        ("module_activities WHERE module_id = %s", "activity_id, position, title, instructions, activity_type",
+         (module_id,)),
+    ])
+
+
+def _course_version(db, course_id):
+    return _content_version(db, [
+        ("courses_master WHERE course_id = %s", "course_id, course_title, description", (course_id,)),
+        ("modules_master WHERE course_id = %s", "module_id, position, module_title, module_description, learning_outcomes", (course_id,)),
+        ("module_sections s JOIN modules_master m ON s.module_id = m.module_id WHERE m.course_id = %s",
+         "s.section_id, s.module_id, s.position, s.title, s.content", (course_id,)),
+        ("module_activities a JOIN modules_master m ON a.module_id = m.module_id WHERE m.course_id = %s",
+         "a.activity_id, a.module_id, a.position, a.title, a.instructions, a.activity_type", (course_id,)),
+    ])
+
+
+EXAM_ITEM_COLUMNS = "e.item_id, e.section_id, e.question, e.option_a, e.option_b, e.option_c, e.option_d, e.correct_answer"
+
+
+def _exam_items_version(db, module_id):
+    return _content_version(db, [
+        ("modules_master m JOIN courses_master c ON m.course_id = c.course_id WHERE m.module_id = %s",
+         "m.module_id, m.position, m.module_title, c.course_code, c.course_title", (module_id,)),
+        ("module_sections WHERE module_id = %s", "section_id, position, title", (module_id,)),
+        ("exam_items e JOIN module_sections s ON e.section_id = s.section_id WHERE s.module_id = %s",
+         EXAM_ITEM_COLUMNS, (module_id,)),
+    ])
+
+
+def _all_exam_items_version(db, course_id):
+    return _content_version(db, [
+        ("courses_master WHERE course_id = %s", "course_id, course_code, course_title, description", (course_id,)),
+        ("modules_master WHERE course_id = %s", "module_id, position, module_title", (course_id,)),
+        ("module_sections s JOIN modules_master m ON s.module_id = m.module_id WHERE m.course_id = %s",
+         "s.section_id, s.module_id, s.position, s.title", (course_id,)),
+        ("exam_items e JOIN module_sections s ON e.section_id = s.section_id "
+         "JOIN modules_master m ON s.module_id = m.module_id WHERE m.course_id = %s",
+         EXAM_ITEM_COLUMNS, (course_id,)),
+    ])
+
+
+export_jobs.register('single_module', _render_single_module_pdf, _single_module_version)
+export_jobs.register('course', _render_course_pdf, _course_version)
+export_jobs.register('exam_items', _render_exam_items_pdf, _exam_items_version)
+export_jobs.register('all_exam_items', _render_all_exam_items_pdf, _all_exam_items_version)
+
+
+def _export_job_payload(job, attached=False):
+    return {
+        'job_id': job['job_id'],
+        'kind': job['kind'],
+        'target_id': job['target_id'],
+        'status': job['status'],
+        'progress': job['progress'],
+        'filename': job['filename'],
+        'size': job['size'],
+        'error': job['error'],
+        'attached': attached,
+        'status_url': url_for('modules.get_export_job', job_id=job['job_id']),
+        'download_url': url_for('modules.download_export_job', job_id=job['job_id']),
+    }
+
+
+@modules_bp.route('/export-jobs', methods=['POST'])
+@api_key_required
+def submit_export_job():
+    """Queue a PDF export. Body: {"kind": "course" | "single_module" | "exam_items" | "all_exam_items", "id": <int>}"""
     try:
-        from reportlab.lib.pagesizes import A4
-        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.lib import colors
-        from reportlab.lib.enums import TA_CENTER
-        import io
-        from flask import make_response
-
-        db = get_db()
-        with db.cursor() as cursor:
-                # Get course information
-                cursor.execute("""
-                    SELECT course_code, course_title, description
-                    FROM courses_master
-                    WHERE course_id = %s
-                """, (course_id,))
-                course_info = cursor.fetchone()
-
-                if not course_info:
-                    return jsonify({'error': 'Course not found'}), 404
+        data = request.get_json() or {}
+        kind = data.get('kind')
+        target_id = data.get('id')
 
-                # Get all modules with their sections and exam items
-                cursor.execute("""
-                    SELECT m.module_id, m.content_html, m.position as module_position,
-                           s.section_id, s.title as section_title, s.position as section_position,
-                           e.item_id, e.question, e.option_a, e.option_b, e.option_c, e.option_d, e.correct_answer
-                    FROM modules_master m
-                    LEFT JOIN module_sections s ON m.module_id = s.module_id
-                    LEFT JOIN exam_items e ON s.section_id = e.section_id
-                    WHERE m.course_id = %s
-                    ORDER BY m.position, s.position, e.item_id
-                """, (course_id,))
-                results = cursor.fetchall()
-
-                # Organize data by modules and sections
-                modules_data = {}
-                for row in results:
-                    module_id = row['module_id']
-                    if module_id not in modules_data:
-                        # Extract module title from HTML content
-                        from html import unescape
-                        content_text = re.sub('<[^<]+?>', '', row['content_html'] or '')
-                        content_text = unescape(content_text)
-                        module_title = content_text.split('\n')[0].strip() if content_text else f"Module {row['module_position']}"
-
-                        modules_data[module_id] = {
-                            'title': module_title,
-                            'position': row['module_position'],
-                            'sections': {}
-                        }
-
-                    section_id = row['section_id']
-                    if section_id and section_id not in modules_data[module_id]['sections']:
-                        modules_data[module_id]['sections'][section_id] = {
-                            'title': row['section_title'],
-                            'position': row['section_position'],
-                            'items': []
-                        }
-
-                    if row['item_id'] and section_id:  # Only add if there's an exam item
-                        modules_data[module_id]['sections'][section_id]['items'].append({
-                            'question': row['question'],
-                            'option_a': row['option_a'],
-                            'option_b': row['option_b'],
-                            'option_c': row['option_c'],
-                            'option_d': row['option_d'],
-                            'correct_answer': row['correct_answer']
-                        })
-
-                # Create PDF
-                buffer = io.BytesIO()
-                doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
-
-                # Styles
-                styles = getSampleStyleSheet()
-                title_style = ParagraphStyle(
-                    'CustomTitle',
-                    parent=styles['Heading1'],
-                    fontSize=20,
-                    spaceAfter=30,
-                    alignment=TA_CENTER,
-                    textColor=colors.HexColor('#2c3e50')
-                )
-
-                course_style = ParagraphStyle(
-                    'CourseStyle',
-                    parent=styles['Heading2'],
-                    fontSize=16,
-                    spaceAfter=20,
-                    alignment=TA_CENTER,
-                    textColor=colors.HexColor('#34495e')
-                )
-
-                module_style = ParagraphStyle(
-                    'ModuleStyle',
-                    parent=styles['Heading1'],
-                    fontSize=16,
-                    spaceAfter=15,
-                    textColor=colors.HexColor('#e74c3c'),
-                    borderWidth=2,
-                    borderColor=colors.HexColor('#e74c3c'),
-                    borderPadding=10,
-                    backColor=colors.HexColor('#fdf2f2')
-                )
-
-                section_style = ParagraphStyle(
-                    'SectionStyle',
-                    parent=styles['Heading2'],
-                    fontSize=14,
-                    spaceAfter=12,
-                    textColor=colors.HexColor('#2980b9')
-                )
-
-                question_style = ParagraphStyle(
-                    'QuestionStyle',
-                    parent=styles['Normal'],
-                    fontSize=11,
-                    spaceAfter=8,
-                    leftIndent=20,
-                    fontName='Helvetica-Bold'
-                )
-
-                option_style = ParagraphStyle(
-                    'OptionStyle',
-                    parent=styles['Normal'],
-                    fontSize=10,
-                    spaceAfter=4,
-                    leftIndent=40
-                )
-
-                answer_style = ParagraphStyle(
-                    'AnswerStyle',
-                    parent=styles['Normal'],
-                    fontSize=10,
-                    spaceAfter=15,
-                    leftIndent=40,
-                    textColor=colors.HexColor('#27ae60'),
-                    fontName='Helvetica-Bold'
-                )
-
-                # Build PDF content
-                story = []
-
-                # Title page
-                story.append(Paragraph("EXAM ITEMS - ALL MODULES", title_style))
-                story.append(Paragraph(f"{course_info['course_code']} - {course_info['course_title']}", course_style))
-                story.append(Spacer(1, 30))
-
-                # Add modules, sections and questions
-                question_number = 1
-                for module_id in sorted(modules_data.keys(), key=lambda x: modules_data[x]['position']):
-                    module = modules_data[module_id]
-
-                    # Check if module has any exam items
-                    has_items = any(section['items'] for section in module['sections'].values())
-
-                    if has_items:
-                        # Add page break before each module (except first)
-                        if question_number > 1:
-                            story.append(PageBreak())
-
-                        story.append(Paragraph(f"Module {module['position']}: {module['title']}", module_style))
-                        story.append(Spacer(1, 20))
-
-                        for section_id in sorted(module['sections'].keys(), key=lambda x: module['sections'][x]['position']):
-                            section = module['sections'][section_id]
-
-                            if section['items']:  # Only show sections with exam items
-                                story.append(Paragraph(f"Section {section['position']}: {section['title']}", section_style))
-                                story.append(Spacer(1, 12))
-
-                                for item in section['items']:
-                                    # Question
-                                    story.append(Paragraph(f"{question_number}. {item['question']}", question_style))
-
-                                    # Options
-                                    story.append(Paragraph(f"A. {item['option_a']}", option_style))
-                                    story.append(Paragraph(f"B. {item['option_b']}", option_style))
-                                    story.append(Paragraph(f"C. {item['option_c']}", option_style))
-                                    story.append(Paragraph(f"D. {item['option_d']}", option_style))
-
-                                    # Correct answer
-                                    story.append(Paragraph(f"Correct Answer: {item['correct_answer']}", answer_style))
-
-                                    question_number += 1
-
-                                story.append(Spacer(1, 20))
+        if kind not in export_jobs.kinds:
+            return jsonify({
+                'success': False,
+                'message': f"kind must be one of: {', '.join(export_jobs.kinds)}",
+                'error': 'Invalid export kind'
+            }), 400
+        try:
+            target_id = int(target_id)
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'message': 'id must be an integer', 'error': 'Invalid id'}), 400
 
-                if question_number == 1:  # No questions found
-                    story.append(Paragraph("No exam items found for this course.", styles['Normal']))
+        job, attached = export_jobs.submit(get_db(), kind, target_id)
+        return jsonify({
+            'success': True,
+            'message': 'Attached to existing export job' if attached else 'Export job queued',
+            'job': _export_job_payload(job, attached)
+        }), 200 if attached else 202
+
+    except LookupError as e:
+        return jsonify({'success': False, 'message': str(e), 'error': str(e)}), 404
+    except OverflowError as e:
+        return jsonify({'success': False, 'message': str(e), 'error': str(e)}), 503
+    except Exception as e:
+        logger.error(f"Error submitting export job: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': 'Error submitting export job',
+            'error': str(e)
+        }), 500
 
-                # Build PDF
-                doc.build(story)
 
-                # Prepare response
-                buffer.seek(0)
-                response = make_response(buffer.getvalue())
-                response.headers['Content-Type'] = 'application/pdf'
-                response.headers['Content-Disposition'] = f'attachment; filename="{course_info["course_code"]}_All_Modules_Exam_Items.pdf"'
+@modules_bp.route('/export-jobs/<job_id>', methods=['GET'])
+@api_key_required
+def get_export_job(job_id):
+    job = export_jobs.get(job_id)
+    if not job:
+        return jsonify({'success': False, 'message': 'Export job not found', 'error': 'Export job not found'}), 404
+    return jsonify({'success': True, 'job': _export_job_payload(job)})
 
-                return response
 
-    except ImportError:
-        return jsonify({'error': 'PDF generation library not available. Please install reportlab.'}), 500
-    except Exception as e:
+@modules_bp.route('/export-jobs/<job_id>/download', methods=['GET'])
+@api_key_required
+def download_export_job(job_id):
+    job = export_jobs.get(job_id)
+    if not job:
+        return jsonify({'success': False, 'message': 'Export job not found', 'error': 'Export job not found'}), 404
+    if job['status'] != 'done':
         return jsonify({
             'success': False,
-            'message': 'Error exporting all exam items to PDF',
-            'error': str(e)
-            }), 500
+            'message': f"Export job is {job['status']}",
+            'error': job['error'] or 'Export not ready',
+            'job': _export_job_payload(job)
+        }), 409
+    return send_file(export_jobs.output_path(job_id), as_attachment=True,
+                     download_name=job['filename'], mimetype='application/pdf')
+
 
 # Aiken Format TXT Export Routes
 @modules_bp.route('/export-aiken-txt-single-module/<int:module_id>', methods=['GET'])
@@ -2039,7 +1944,7 @@ def export_aiken_txt_single_module(module_id):
         with db.cursor() as cursor:
                 # Get module and course info
                 cursor.execute("""
-                    SELECT m.content_html, m.position, c.course_code, c.course_title
+                    SELECT m.module_title, m.position, c.course_code, c.course_title
                     FROM modules_master m
                     JOIN courses_master c ON m.course_id = c.course_id
                     WHERE m.module_id = %s
@@ -2049,10 +1954,6 @@ def export_aiken_txt_single_module(module_id):
                 if not module_info:
                     return jsonify({'error': 'Module not found'}), 404
 
-                # Extract module title from content_html
-                content_text = BeautifulSoup(module_info['content_html'], 'html.parser').get_text() if module_info['content_html'] else ""
-                module_title = content_text.split('\n')[0].strip() if content_text else f"Module {module_info['position']}"
-
                 # Get sections and their exam items
                 cursor.execute("""
                     SELECT s.section_id, s.title, s.position,
@@ -2129,7 +2030,7 @@ def export_aiken_txt_all_modules(course_id):
 
                 # Get all modules with their sections and exam items
                 cursor.execute("""
-                    SELECT m.module_id, m.content_html, m.position as module_position,
+                    SELECT m.module_id, m.module_title, m.position as module_position,
                            s.section_id, s.title as section_title, s.position as section_position,
                            e.question, e.option_a, e.option_b, e.option_c, e.option_d, e.correct_answer
                     FROM modules_master m
@@ -2150,16 +2051,12 @@ def export_aiken_txt_all_modules(course_id):
                     if current_module_id != row['module_id']:
                         current_module_id = row['module_id']
 
-                        # Extract module title from content_html
-                        content_text = BeautifulSoup(row['content_html'], 'html.parser').get_text() if row['content_html'] else ""
-                        module_title = content_text.split('\n')[0].strip() if content_text else f"Module {row['module_position']}"
-
                         # Add module separator (but not for the first module)
                         if len(aiken_content_lines) > 0:
                             aiken_content_lines.append("")
                             aiken_content_lines.append("=" * 50)
 
-                        aiken_content_lines.append(f"MODULE {row['module_position']}: {module_title}")
+                        aiken_content_lines.append(f"MODULE {row['module_position']}: {display_title(row['module_title'], row['module_position'])}")
                         aiken_content_lines.append("=" * 50)
                         aiken_content_lines.append("")
 
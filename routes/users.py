@@ -4,10 +4,38 @@ import csv
 import io
 
 from init_db import get_db
-from utils import logger, api_key_required
+from utils import logger, api_key_required, invalidate_api_key_cache, record_api_key_revocation, get_hash_executor, hash_password, hash_passwords
+from entity_counts import adjust_count, invalidate_counts
 
 users_bp = Blueprint('users', __name__)
 
+CSV_BATCH_SIZE = 500
+
+
+def _insert_user_batch(cursor, batch, hashes, errors):
+    """Insert one batch with a single multi-row INSERT.
+
+    If the batch is rejected (e.g. a duplicate external_id), retry it row by
+    row so the error is reported against the offending CSV row only.
+    """
+    values = [
+        (external_id, password_hash, full_name, role)
+        for (_, external_id, full_name, role, _), password_hash in zip(batch, hashes)
+    ]
+    query = "INSERT INTO users (external_id, password_hash, full_name, role) VALUES (%s, %s, %s, %s)"
+    try:
+        cursor.executemany(query, values)
+        return len(values)
+    except Exception:
+        created = 0
+        for (row_num, *_), params in zip(batch, values):
+            try:
+                cursor.execute(query, params)
+                created += 1
+            except Exception as e:
+                errors.append(f"Row {row_num}: {str(e)}")
+        return created
+
 @users_bp.route('/', methods=['GET'])
 @api_key_required
 def get_users():
@@ -47,7 +75,9 @@ def create_user():
                 "INSERT INTO users (external_id, password_hash, full_name, role) VALUES (%s, %s, %s, %s)",
                 (external_id, password_hash, full_name, role)
             )
+            adjust_count(cursor, 'users', 1)
             db.commit()
+            invalidate_counts()
             logger.info("User created successfully")
             return jsonify({'message': 'User created successfully'}), 201
     except Exception as e:
@@ -108,8 +138,12 @@ def update_user(user_id):
             logger.info(f"Update params: {params}")
 
             cursor.execute(query, params)
+            record_api_key_revocation(cursor, user_id=user_id)
             db.commit()
 
+            # Cached API key identities carry role/external_id/full_name
+            invalidate_api_key_cache(user_id=user_id)
+
             logger.info(f"Rows affected: {cursor.rowcount}")
             return jsonify({'message': 'User updated successfully'})
 
@@ -125,12 +159,20 @@ def delete_user(user_id):
     try:
         db = get_db()
         with db.cursor() as cursor:
+            # Enrollments go with the user (ON DELETE CASCADE)
+            cursor.execute("SELECT COUNT(*) AS count FROM enrollments WHERE user_id = %s", (user_id,))
+            enrollment_count = cursor.fetchone()['count']
             cursor.execute("DELETE FROM users WHERE user_id = %s", (user_id,))
-            db.commit()
-
             if cursor.rowcount == 0:
                 return jsonify({'error': 'User not found'}), 404
 
+            adjust_count(cursor, 'users', -1)
+            adjust_count(cursor, 'enrollments', -enrollment_count)
+            record_api_key_revocation(cursor, user_id=user_id)
+            db.commit()
+            invalidate_counts()
+
+            invalidate_api_key_cache(user_id=user_id)
             return jsonify({'message': 'User deleted successfully'}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -157,31 +199,44 @@ def upload_csv():
         created_count = 0
         errors = []
 
-        with db.cursor() as cursor:
-                for row_num, row in enumerate(csv_input, start=2):
-                    try:
-                        external_id = row.get('external_id', '').strip()
-                        full_name = row.get('full_name', '').strip()
-                        role = row.get('role', 'student').strip()
-                        password = row.get('password', '1234').strip()
+        # Validate rows first; only valid rows go through the hashing stage
+        pending = []
+        for row_num, row in enumerate(csv_input, start=2):
+            try:
+                external_id = row.get('external_id', '').strip()
+                full_name = row.get('full_name', '').strip()
+                role = row.get('role', 'student').strip()
+                password = row.get('password', '1234').strip()
 
-                        if not external_id or not full_name:
-                            errors.append(f"Row {row_num}: Missing external_id or full_name")
-                            continue
+                if not external_id or not full_name:
+                    errors.append(f"Row {row_num}: Missing external_id or full_name")
+                    continue
 
-                        password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-
-                        cursor.execute(
-                            "INSERT INTO users (external_id, password_hash, full_name, role) VALUES (%s, %s, %s, %s)",
-                            (external_id, password_hash, full_name, role)
-                        )
-                        created_count += 1
-
-                    except Exception as e:
-                        errors.append(f"Row {row_num}: {str(e)}")
+                pending.append((row_num, external_id, full_name, role, password))
+            except Exception as e:
+                errors.append(f"Row {row_num}: {str(e)}")
 
+        with db.cursor() as cursor:
+                # Hash the next batch on the process pool while the current one is inserted
+                batches = [pending[i:i + CSV_BATCH_SIZE] for i in range(0, len(pending), CSV_BATCH_SIZE)]
+                executor = get_hash_executor() if len(pending) > CSV_BATCH_SIZE else None
+                next_hashes = None
+                for index, batch in enumerate(batches):
+                    if next_hashes is not None:
+                        hashes = [future.result() for future in next_hashes]
+                    else:
+                        hashes = hash_passwords([item[4] for item in batch])
+                    next_hashes = None
+                    if executor and index + 1 < len(batches):
+                        next_hashes = [executor.submit(hash_password, item[4]) for item in batches[index + 1]]
+
+                    created_count += _insert_user_batch(cursor, batch, hashes, errors)
+
+                adjust_count(cursor, 'users', created_count)
                 db.commit()
+                invalidate_counts()
 
+        errors.sort(key=lambda msg: int(msg.split(':', 1)[0].split()[1]))
 
         return jsonify({
             'success': True,
@@ -0,0 +1,260 @@
+import os
+import random
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from itertools import islice
+
+import pymysql
+
+from utils import hash_password, logger
+
+# Rows generated per unit of --scale; --scale 200 gives ~1M enrollments.
+SCALE_UNIT = {
+    'students': 1000,
+    'teachers': 10,
+    'courses': 5,
+}
+INSTANCES_PER_COURSE = 2
+COURSES_PER_STUDENT = 5
+MODULES_PER_COURSE = 8
+SECTIONS_PER_MODULE = 5
+ITEMS_PER_SECTION = 5
+ACTIVITIES_PER_MODULE = 2
+SUBMISSIONS_PER_ENROLLMENT = 3
+PROGRESS_PER_ENROLLMENT = 5
+
+TERMS = ['2024-T1', '2024-T2', '2024-T3', '2025-T1']
+TOPICS = ['Programming', 'Networks', 'Databases', 'Algorithms', 'Operating Systems', 'Security',
+          'Web Development', 'Data Science', 'Software Engineering', 'Discrete Math']
+FIRST_NAMES = ['Juan', 'Maria', 'Jose', 'Ana', 'Mark', 'Grace', 'Paolo', 'Bea', 'Carlo', 'Liza']
+LAST_NAMES = ['Santos', 'Reyes', 'Cruz', 'Bautista', 'Garcia', 'Mendoza', 'Torres', 'Flores', 'Ramos', 'Aquino']
+EPOCH = datetime(2024, 1, 8)
+
+
+def _chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+class MultiRowWriter:
+    """Writes rows with executemany, which pymysql sends as multi-row INSERTs."""
+
+    def __init__(self, db, batch_size=5000):
+        self.db = db
+        self.batch_size = batch_size
+
+    def insert(self, table, columns, rows):
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+        written = 0
+        with self.db.cursor() as cursor:
+            for batch in _chunks(rows, self.batch_size):
+                cursor.executemany(sql, batch)
+                self.db.commit()
+                written += len(batch)
+        return written
+
+
+class LoadDataWriter:
+    """Writes rows to a temp TSV file per batch and loads it with LOAD DATA LOCAL INFILE.
+
+    Needs ``local_infile`` enabled on the server; the connection passed in
+    must have been opened with ``local_infile=True``.
+    """
+
+    def __init__(self, db, batch_size=100000):
+        self.db = db
+        self.batch_size = batch_size
+
+    @staticmethod
+    def _field(value):
+        if value is None:
+            return '\\N'
+        if isinstance(value, bool):
+            return '1' if value else '0'
+        return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+                .replace('\n', '\\n').replace('\r', '\\r'))
+
+    def insert(self, table, columns, rows):
+        written = 0
+        with self.db.cursor() as cursor:
+            for batch in _chunks(rows, self.batch_size):
+                with tempfile.NamedTemporaryFile('w', suffix='.tsv', encoding='utf-8', delete=False) as f:
+                    for row in batch:
+                        f.write('\t'.join(self._field(v) for v in row))
+                        f.write('\n')
+                    path = f.name
+                try:
+                    cursor.execute(
+                        f"LOAD DATA LOCAL INFILE %s INTO TABLE {table} CHARACTER SET utf8mb4 "
+                        f"FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' ({', '.join(columns)})",
+                        (path,)
+                    )
+                    self.db.commit()
+                finally:
+                    os.unlink(path)
+                written += len(batch)
+        return written
+
+
+def _next_id(cursor, table, column):
+    cursor.execute(f"SELECT COALESCE(MAX({column}), 0) + 1 AS next_id FROM {table}")
+    return cursor.fetchone()['next_id']
+
+
+def _name(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def _timestamp(rng, days=365):
+    return EPOCH + timedelta(seconds=rng.randrange(days * 86400))
+
+
+def seed_db(db, writer, scale=1, seed=42):
+    """Generate a synthetic dataset ``scale`` units large; returns row counts per table.
+
+    Primary keys are assigned here, starting after the current MAX(id) of each
+    table, so related rows can be generated without reading ids back. Run it
+    against a database nobody else is writing to. The same seed on the same
+    starting state produces the same rows.
+    """
+    rng = random.Random(seed)
+    students = SCALE_UNIT['students'] * scale
+    teachers = SCALE_UNIT['teachers'] * scale
+    courses = SCALE_UNIT['courses'] * scale
+    instances = courses * INSTANCES_PER_COURSE
+    modules = courses * MODULES_PER_COURSE
+    sections = modules * SECTIONS_PER_MODULE
+    activities = modules * ACTIVITIES_PER_MODULE
+
+    with db.cursor() as cursor:
+        user_base = _next_id(cursor, 'users', 'user_id')
+        course_base = _next_id(cursor, 'courses_master', 'course_id')
+        instance_base = _next_id(cursor, 'course_instances', 'instance_id')
+        module_base = _next_id(cursor, 'modules_master', 'module_id')
+        section_base = _next_id(cursor, 'module_sections', 'section_id')
+        activity_base = _next_id(cursor, 'module_activities', 'activity_id')
+
+    # One bcrypt hash shared by every generated account keeps seeding I/O-bound
+    password_hash = hash_password('password123')
+    counts = {}
+
+    def write(table, columns, rows):
+        started = time.perf_counter()
+        counts[table] = counts.get(table, 0) + writer.insert(table, columns, rows)
+        logger.info(f"seed-db: {table} {counts[table]} rows ({time.perf_counter() - started:.1f}s)")
+
+    def users():
+        for i in range(teachers + students):
+            user_id = user_base + i
+            role = 'teacher' if i < teachers else 'student'
+            yield (user_id, f"{role[0].upper()}{user_id:08d}", password_hash, _name(rng), role, _timestamp(rng))
+
+    def courses_master():
+        for c in range(courses):
+            course_id = course_base + c
+            topic = rng.choice(TOPICS)
+            yield (course_id, f"SC{course_id:06d}", f"{topic} {c + 1}",
+                   f"Synthetic course covering {topic.lower()} fundamentals.")
+
+    def course_instances():
+        for c in range(courses):
+            for k in range(INSTANCES_PER_COURSE):
+                start = date(2024, 1, 8) + timedelta(weeks=16 * k)
+                yield (instance_base + c * INSTANCES_PER_COURSE + k, course_base + c,
+                       TERMS[k % len(TERMS)], start, start + timedelta(weeks=15))
+
+    def modules_master():
+        for m in range(modules):
+            course = m // MODULES_PER_COURSE
+            position = m % MODULES_PER_COURSE + 1
+            title = f"Module {position}: {rng.choice(TOPICS)}"
+            description = f"Synthetic module {position} of course {course + 1}."
+            html = f"<h2>{title}</h2><div class=\"module-description\">{description}</div>"
+            yield (module_base + m, course_base + course, position, html, title, description)
+
+    def module_sections():
+        for s in range(sections):
+            module = s // SECTIONS_PER_MODULE
+            position = s % SECTIONS_PER_MODULE + 1
+            paragraphs = ''.join(f"<p>Paragraph {p} of section {position}.</p>" for p in range(1, rng.randint(3, 8)))
+            yield (section_base + s, module_base + module, position, f"Section {position}", paragraphs)
+
+    def module_activities():
+        for a in range(activities):
+            module = a // ACTIVITIES_PER_MODULE
+            position = a % ACTIVITIES_PER_MODULE + 1
+            yield (activity_base + a, module_base + module, position, f"Activity {position}",
+                   f"<p>Complete the practical exercise for module {module % MODULES_PER_COURSE + 1}.</p>",
+                   'practical')
+
+    def exam_items():
+        for s in range(sections):
+            for i in range(1, ITEMS_PER_SECTION + 1):
+                yield (section_base + s, f"Synthetic question {i} for section {s + 1}?",
+                       'Option A', 'Option B', 'Option C', 'Option D', rng.choice('ABCD'))
+
+    # Enrollments drive submissions and progress; build them per student in one
+    # pass so a student never gets two instances of the same course.
+    enrolled = []  # (user_id, course index, seconds after EPOCH)
+
+    def enrollments():
+        per_student = min(COURSES_PER_STUDENT, courses)
+        for i in range(students):
+            user_id = user_base + teachers + i
+            for course in rng.sample(range(courses), per_student):
+                instance_id = instance_base + course * INSTANCES_PER_COURSE + rng.randrange(INSTANCES_PER_COURSE)
+                offset = rng.randrange(365 * 86400)
+                enrolled.append((user_id, course, offset))
+                yield (instance_id, user_id, EPOCH + timedelta(seconds=offset))
+
+    def course_instructors():
+        for c in range(instances):
+            yield (instance_base + c, user_base + rng.randrange(teachers), 'teacher')
+
+    def activity_submissions():
+        per_course = MODULES_PER_COURSE * ACTIVITIES_PER_MODULE
+        for user_id, course, offset in enrolled:
+            enrolled_at = EPOCH + timedelta(seconds=offset)
+            for a in rng.sample(range(per_course), min(SUBMISSIONS_PER_ENROLLMENT, per_course)):
+                graded = rng.random() < 0.6
+                yield (user_id, activity_base + course * per_course + a,
+                       f"<p>Submission by user {user_id}.</p>",
+                       'graded' if graded else 'submitted',
+                       rng.randint(60, 100) if graded else None,
+                       enrolled_at + timedelta(days=rng.randint(1, 90)))
+
+    def student_progress():
+        per_course = MODULES_PER_COURSE * SECTIONS_PER_MODULE
+        for user_id, course, offset in enrolled:
+            enrolled_at = EPOCH + timedelta(seconds=offset)
+            for s in rng.sample(range(per_course), min(PROGRESS_PER_ENROLLMENT, per_course)):
+                yield (user_id, section_base + course * per_course + s,
+                       enrolled_at + timedelta(days=rng.randint(0, 90)), rng.random() < 0.7)
+
+    write('users', ('user_id', 'external_id', 'password_hash', 'full_name', 'role', 'created_at'), users())
+    write('courses_master', ('course_id', 'course_code', 'course_title', 'description'), courses_master())
+    write('course_instances', ('instance_id', 'course_id', 'term_code', 'start_date', 'end_date'),
+          course_instances())
+    write('course_instructors', ('instance_id', 'user_id', 'role'), course_instructors())
+    write('modules_master', ('module_id', 'course_id', 'position', 'content_html', 'module_title', 'module_description'),
+          modules_master())
+    write('module_sections', ('section_id', 'module_id', 'position', 'title', 'content'), module_sections())
+    write('module_activities', ('activity_id', 'module_id', 'position', 'title', 'instructions', 'activity_type'),
+          module_activities())
+    write('exam_items', ('section_id', 'question', 'option_a', 'option_b', 'option_c', 'option_d', 'correct_answer'),
+          exam_items())
+    write('enrollments', ('instance_id', 'user_id', 'created_at'), enrollments())
+    write('activity_submissions', ('user_id', 'activity_id', 'submission_content', 'status', 'grade', 'submitted_at'),
+          activity_submissions())
+    write('student_progress', ('user_id', 'section_id', 'accessed_at', 'is_completed'), student_progress())
+    return counts
+
+
+def open_load_data_connection(connect_kwargs):
+    """Dedicated connection for LOAD DATA LOCAL INFILE; pooled ones do not enable it."""
+    return pymysql.connect(**dict(connect_kwargs, local_infile=True))
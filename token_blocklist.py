@@ -0,0 +1,193 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from utils import logger
+
+
+def _epoch(value):
+    """token_blocklist stores naive UTC datetimes; turn them into epoch seconds."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class TokenBlocklist:
+    """In-memory view of the non-expired rows of ``token_blocklist``.
+
+    The first check loads every revoked JTI that has not expired yet; after
+    that only rows created since the previous sync are fetched, at most once
+    every ``refresh_interval`` seconds. A JTI that is not in the set is
+    therefore known-good without a DB round trip. Logouts in this worker are
+    added immediately; other workers see them on their next sync.
+
+    Until ``flask migrate-db`` adds ``created_at``, every sync is a full
+    reload instead of an incremental one.
+
+    Once the view is older than ``max_staleness``, checks wait up to
+    ``sync_wait`` seconds for the refresh another request is running
+    rather than fail closed just because it holds the lock.
+    """
+
+    def __init__(self, refresh_interval=5, max_staleness=60, sync_wait=5, prune_interval=3600, prune_batch=1000):
+        self.refresh_interval = refresh_interval
+        self.max_staleness = max_staleness
+        self.sync_wait = sync_wait
+        self.prune_interval = prune_interval
+        self.prune_batch = prune_batch
+
+        self._revoked = {}  # jti -> expires_at (epoch seconds)
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._loaded = False
+        self._incremental = False  # token_blocklist.created_at exists
+        self._schema_warned = False
+        self._db_synced_at = None  # DB clock at the last successful sync
+        self._last_sync = 0.0      # local monotonic clock of the last successful sync
+        self._pruner_pid = None
+
+        self.lookups = 0
+        self.syncs = 0
+        self.sync_errors = 0
+        self.pruned_rows = 0
+
+    def add(self, jti, expires_at):
+        with self._lock:
+            self._revoked[jti] = _epoch(expires_at)
+
+    def is_revoked(self, jti, connect):
+        """True if ``jti`` is revoked; fails closed if the view is too stale.
+
+        ``connect`` returns a DB connection (e.g. ``get_db``) and is only
+        called when a sync is due, so most checks never touch the pool.
+        """
+        self._ensure_pruner()
+        age = time.monotonic() - self._last_sync
+        if age >= self.refresh_interval:
+            self.sync(connect, wait=not self._loaded or age > self.max_staleness)
+        if not self._loaded or time.monotonic() - self._last_sync > self.max_staleness:
+            return True
+
+        with self._lock:
+            self.lookups += 1
+            expires_at = self._revoked.get(jti)
+        return expires_at is not None
+
+    def sync(self, connect, wait=False):
+        # Only one request per worker refreshes. The rest keep using the current
+        # view, or wait for that refresh when the view is too stale to use.
+        if wait:
+            acquired = self._sync_lock.acquire(timeout=self.sync_wait)
+        else:
+            acquired = self._sync_lock.acquire(blocking=False)
+        if not acquired:
+            return
+        try:
+            if self._loaded and time.monotonic() - self._last_sync < self.refresh_interval:
+                return
+            db = connect()
+            incremental = self._incremental
+            with db.cursor() as cur:
+                cur.execute("SELECT NOW() AS now")
+                db_now = cur.fetchone()['now']
+                if incremental:
+                    # Small overlap so rows committed during the last sync are not missed
+                    cur.execute(
+                        "SELECT jti, expires_at FROM token_blocklist WHERE created_at >= %s",
+                        (self._db_synced_at - timedelta(seconds=2),)
+                    )
+                    rows = cur.fetchall()
+                else:
+                    cur.execute("SELECT jti, expires_at FROM token_blocklist WHERE expires_at > UTC_TIMESTAMP()")
+                    rows = cur.fetchall()
+                    incremental = self._has_created_at(cur)
+
+            now = time.time()
+            with self._lock:
+                for row in rows:
+                    self._revoked[row['jti']] = _epoch(row['expires_at'])
+                for jti in [jti for jti, exp in self._revoked.items() if exp <= now]:
+                    del self._revoked[jti]
+                self._db_synced_at = db_now
+                self._incremental = incremental
+                self._last_sync = time.monotonic()
+                self._loaded = True
+                self.syncs += 1
+        except Exception as e:
+            self.sync_errors += 1
+            logger.error(f"Token blocklist sync failed: {e}")
+        finally:
+            self._sync_lock.release()
+
+    def _has_created_at(self, cur):
+        from init_db import _column_exists
+        exists = _column_exists(cur, 'token_blocklist', 'created_at')
+        if not exists and not self._schema_warned:
+            self._schema_warned = True
+            logger.error("token_blocklist.created_at is missing (run `flask migrate-db`); "
+                         "reloading the whole blocklist on every sync until it exists")
+        return exists
+
+    def prune(self, db):
+        """Delete expired rows in small batches so the table stops growing."""
+        removed = 0
+        with db.cursor() as cur:
+            while True:
+                cur.execute(
+                    "DELETE FROM token_blocklist WHERE expires_at < UTC_TIMESTAMP() LIMIT %s",
+                    (self.prune_batch,)
+                )
+                db.commit()
+                removed += cur.rowcount
+                if cur.rowcount < self.prune_batch:
+                    break
+        self.pruned_rows += removed
+        return removed
+
+    def _ensure_pruner(self):
+        if not self.prune_interval or self._pruner_pid == os.getpid():
+            return
+        with self._lock:
+            if self._pruner_pid == os.getpid():
+                return
+            self._pruner_pid = os.getpid()
+        threading.Thread(target=self._prune_loop, name='token-blocklist-pruner', daemon=True).start()
+
+    def _prune_loop(self):
+        from init_db import pool
+        while True:
+            time.sleep(self.prune_interval)
+            conn = None
+            try:
+                conn = pool.acquire()
+                removed = self.prune(conn)
+                if removed:
+                    logger.info(f"Pruned {removed} expired token_blocklist rows")
+            except Exception as e:
+                logger.error(f"Token blocklist prune failed: {e}")
+            finally:
+                if conn is not None:
+                    pool.release(conn, discard=not conn.open)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'revoked_in_memory': len(self._revoked),
+                'lookups': self.lookups,
+                'syncs': self.syncs,
+                'sync_errors': self.sync_errors,
+                'incremental_sync': self._incremental,
+                'pruned_rows': self.pruned_rows,
+                'last_sync': datetime.fromtimestamp(
+                    time.time() - (time.monotonic() - self._last_sync), tz=timezone.utc
+                ).isoformat() if self._loaded else None,
+            }
+
+
+blocklist = TokenBlocklist(
+    refresh_interval=int(os.getenv('TOKEN_BLOCKLIST_REFRESH', 5)),
+    max_staleness=int(os.getenv('TOKEN_BLOCKLIST_MAX_STALENESS', 60)),
+    sync_wait=float(os.getenv('TOKEN_BLOCKLIST_SYNC_WAIT', 5)),
+    prune_interval=int(os.getenv('TOKEN_BLOCKLIST_PRUNE_INTERVAL', 3600)),
+)
@@ -1,10 +1,21 @@
 
 import datetime
+import hashlib
+import hmac
+import multiprocessing
+import os
 import re, logging
+import threading
+import time
+import pymysql
+from pymysql.constants import ER
+from concurrent.futures import ProcessPoolExecutor
 from bcrypt import hashpw, gensalt, checkpw
 from functools import wraps
 from flask import g, jsonify, request
 from flask_jwt_extended import decode_token, get_jwt, verify_jwt_in_request
+from cache import TTLCache
+from metrics import BCRYPT_VERIFY
 
 
 
@@ -44,6 +55,32 @@ def validate_status(status: str):
 def hash_password(password: str) -> str:
     return hashpw(password.encode('utf-8'), gensalt()).decode('utf-8')
 
+_hash_executor = None
+
+def get_hash_executor():
+    """Process pool used for bulk bcrypt hashing (created on first use).
+
+    Workers are spawned rather than forked: a fork of a threaded gunicorn
+    worker can inherit a lock held by another thread and deadlock.
+    """
+    global _hash_executor
+    if _hash_executor is None:
+        workers = int(os.getenv('PASSWORD_HASH_WORKERS', 0)) or os.cpu_count() or 1
+        _hash_executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+    return _hash_executor
+
+def hash_passwords(passwords, executor=None, chunksize=8):
+    """Hash a list of passwords in parallel across CPU cores, preserving order.
+
+    Small batches are hashed inline since process hand-off would cost more
+    than it saves.
+    """
+    passwords = list(passwords)
+    if len(passwords) < 2 * chunksize:
+        return [hash_password(p) for p in passwords]
+    executor = executor or get_hash_executor()
+    return list(executor.map(hash_password, passwords, chunksize=chunksize))
+
 def verify_password(password: str, hashed_password: str) -> bool:
     try:
         return checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
@@ -51,6 +88,16 @@ def verify_password(password: str, hashed_password: str) -> bool:
         logger.error(f"Error verifying password: {e}")
         return False
 
+def api_key_digest(api_key: str) -> str:
+    """Keyed SHA-256 digest of an API key, used as its indexed lookup column.
+
+    The bcrypt hash stays the actual credential check; the digest only
+    lets us find the single candidate row without scanning every key. The
+    pepper is its own secret (API_KEY_PEPPER), checked at app start-up.
+    """
+    pepper = os.environ['API_KEY_PEPPER']
+    return hmac.new(pepper.encode('utf-8'), api_key.encode('utf-8'), hashlib.sha256).hexdigest()
+
 def admin_required(fn):
     @wraps(fn)
     def wrapper(*args, **kwargs):
@@ -109,6 +156,160 @@ def sanitize_full_name(name):
 #             return expires_at > datetime.now(datetime.timezone.utc)
 #         return False
 
+# Verified API keys, keyed by digest -> identity. Entries are dropped on key
+# deletion / role change: at once in the worker that made the change, and in
+# every other worker when it next replays api_key_revocations (at most every
+# API_KEY_REVOCATION_SYNC seconds). A worker that cannot sync for longer than
+# API_KEY_REVOCATION_MAX_STALENESS stops trusting the cache altogether.
+api_key_cache = TTLCache(
+    maxsize=int(os.getenv('API_KEY_CACHE_SIZE', 1024)),
+    ttl=int(os.getenv('API_KEY_CACHE_TTL', 60)),
+)
+API_KEY_REVOCATION_SYNC = float(os.getenv('API_KEY_REVOCATION_SYNC', 1))
+API_KEY_REVOCATION_MAX_STALENESS = float(os.getenv('API_KEY_REVOCATION_MAX_STALENESS', 10))
+
+_revocation_sync_lock = threading.Lock()
+_revocation_state = {'db_synced_at': None, 'last_sync': 0.0, 'syncs': 0, 'sync_errors': 0,
+                     'schema_warned': False}
+
+def invalidate_api_key_cache(api_key_id=None, user_id=None):
+    """Forget cached identities for a deleted key or a changed user."""
+    if api_key_id is not None:
+        api_key_cache.discard_where(lambda entry: entry['api_key_id'] == int(api_key_id))
+    if user_id is not None:
+        api_key_cache.discard_where(lambda entry: entry['user_id'] == int(user_id))
+
+def _revocations_missing(error):
+    """True (after logging once) if ``error`` is api_key_revocations not existing yet."""
+    if not (isinstance(error, pymysql.MySQLError) and error.args and error.args[0] == ER.NO_SUCH_TABLE):
+        return False
+    if not _revocation_state['schema_warned']:
+        _revocation_state['schema_warned'] = True
+        logger.error("api_key_revocations is missing (run `flask migrate-db`); "
+                     "verifying every API key against the database until it exists")
+    return True
+
+def record_api_key_revocation(cursor, api_key_id=None, user_id=None):
+    """Log a key deletion or user change for the other workers; call before commit."""
+    try:
+        cursor.execute("INSERT INTO api_key_revocations (api_key_id, user_id) VALUES (%s, %s)",
+                       (api_key_id, user_id))
+    except pymysql.MySQLError as e:
+        # Without the table no worker can sync, so none of them trusts its cache
+        if _revocations_missing(e):
+            return
+        raise
+    # A day-old row has outlived every cached entry it could still match
+    cursor.execute("DELETE FROM api_key_revocations WHERE created_at < NOW() - INTERVAL 1 DAY")
+
+def sync_api_key_revocations(connect):
+    """Replay revocations logged by other workers into this worker's cache.
+
+    Runs at most every API_KEY_REVOCATION_SYNC seconds, so ``connect`` is
+    only called when a sync is due. Returns False once the last successful
+    sync is older than API_KEY_REVOCATION_MAX_STALENESS; callers must then
+    verify the key against the database instead of trusting the cache.
+    """
+    state = _revocation_state
+    if time.monotonic() - state['last_sync'] >= API_KEY_REVOCATION_SYNC \
+            and _revocation_sync_lock.acquire(blocking=False):
+        try:
+            db = connect()
+            with db.cursor() as cur:
+                cur.execute("SELECT NOW() AS now")
+                db_now = cur.fetchone()['now']
+                # Small overlap so rows committed during the last sync are not missed
+                since = (state['db_synced_at'] or db_now) - datetime.timedelta(seconds=2)
+                cur.execute(
+                    "SELECT api_key_id, user_id FROM api_key_revocations WHERE created_at >= %s",
+                    (since,)
+                )
+                rows = cur.fetchall()
+            if state['db_synced_at'] is None:
+                # Entries verified before the first sync may predate revocations it cannot see
+                api_key_cache.clear()
+            for row in rows:
+                invalidate_api_key_cache(api_key_id=row['api_key_id'], user_id=row['user_id'])
+            state['db_synced_at'] = db_now
+            state['last_sync'] = time.monotonic()
+            state['syncs'] += 1
+        except Exception as e:
+            state['sync_errors'] += 1
+            if not _revocations_missing(e):
+                logger.error(f"API key revocation sync failed: {e}")
+        finally:
+            _revocation_sync_lock.release()
+    return (state['db_synced_at'] is not None
+            and time.monotonic() - state['last_sync'] <= API_KEY_REVOCATION_MAX_STALENESS)
+
+def api_key_cache_stats():
+    """Cache counters plus the state of the cross-worker revocation sync."""
+    state = _revocation_state
+    return {
+        **api_key_cache.stats(),
+        'revocation_syncs': state['syncs'],
+        'revocation_sync_errors': state['sync_errors'],
+        'revocation_sync_age': (round(time.monotonic() - state['last_sync'], 3)
+                                if state['db_synced_at'] is not None else None),
+    }
+
+# One legacy bcrypt scan at a time per process, so a stream of invalid keys
+# cannot tie up every worker thread checking the whole NULL-digest backlog.
+_legacy_scan_lock = threading.Lock()
+
+def _lookup_api_key(api_key, digest):
+    from init_db import get_db
+    db = get_db()
+    with db.cursor() as cursor:
+        cursor.execute('''
+            SELECT ak.api_key_id, ak.api_key AS hashed_api_key, ak.user_id, u.role, u.external_id, u.full_name
+            FROM api_keys ak
+            JOIN users u ON ak.user_id = u.user_id
+            WHERE ak.key_digest = %s
+        ''', (digest,))
+        row = cursor.fetchone()
+
+        if row:
+            with BCRYPT_VERIFY.time():
+                verified = verify_password(api_key, row['hashed_api_key'])
+            return row if verified else None
+
+        # Off unless enabled: every unknown key would otherwise pay one bcrypt
+        # check per NULL-digest row.
+        if os.getenv('API_KEY_LEGACY_SCAN', '0') != '1':
+            return None
+        if not _legacy_scan_lock.acquire(blocking=False):
+            logger.warning("Legacy API key scan already running; rejecting key without a digest match")
+            return None
+
+        # Keys issued before key_digest existed: scan only those rows and
+        # backfill the digest on first use so later lookups are direct.
+        try:
+            cursor.execute('''
+                SELECT ak.api_key_id, ak.api_key AS hashed_api_key, ak.user_id, u.role, u.external_id, u.full_name
+                FROM api_keys ak
+                JOIN users u ON ak.user_id = u.user_id
+                WHERE ak.key_digest IS NULL
+            ''')
+            matched = None
+            with BCRYPT_VERIFY.time():
+                for legacy in cursor.fetchall():
+                    stored = legacy.get('hashed_api_key')
+                    try:
+                        if stored and checkpw(api_key.encode('utf-8'), stored.encode('utf-8')):
+                            matched = legacy
+                            break
+                    except Exception:
+                        continue
+        finally:
+            _legacy_scan_lock.release()
+        if matched:
+            cursor.execute("UPDATE api_keys SET key_digest = %s WHERE api_key_id = %s",
+                           (digest, matched['api_key_id']))
+            db.commit()
+            logger.info(f"Backfilled key_digest for API key {matched['api_key_id']}")
+        return matched
+
 def api_key_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
@@ -116,32 +317,25 @@ def api_key_required(f):
         if not api_key:
             return {'success': False, 'message': 'API key is missing'}, 401
 
+        digest = api_key_digest(api_key)
         from init_db import get_db
-        db = get_db()
-        with db.cursor() as cursor:
-            cursor.execute('''
-                SELECT ak.api_key AS hashed_api_key, ak.user_id, u.role, u.external_id, u.full_name
-                FROM api_keys ak
-                JOIN users u ON ak.user_id = u.user_id
-            ''')
-            rows = cursor.fetchall()
-
-            matched = None
-            for row in rows:
-                stored = row.get('hashed_api_key') or row.get('api_key')
-                try:
-                    if stored and checkpw(api_key.encode('utf-8'), stored.encode('utf-8')):
-                        matched = row
-                        break
-                except Exception:
-                    continue
-
+        identity = api_key_cache.get(digest) if sync_api_key_revocations(get_db) else None
+        if identity is None:
+            matched = _lookup_api_key(api_key, digest)
             if not matched:
                 return {'success': False, 'message': 'Invalid API key'}, 403
+            identity = {
+                'api_key_id': matched['api_key_id'],
+                'user_id': matched['user_id'],
+                'role': matched['role'],
+                'external_id': matched['external_id'],
+                'full_name': matched['full_name'],
+            }
+            api_key_cache.set(digest, identity)
 
-            g.user_id = matched['user_id']
-            g.role = matched['role']
-            g.external_id = matched['external_id']
-            g.full_name = matched['full_name']
-            return f(*args, **kwargs)
-    return decorated_function
\ No newline at end of file
+        g.user_id = identity['user_id']
+        g.role = identity['role']
+        g.external_id = identity['external_id']
+        g.full_name = identity['full_name']
+        return f(*args, **kwargs)
+    return decorated_function